@@ -0,0 +1,8 @@
+"""
+Runs the client microbenchmarks, see benchmarks.core
+"""
+
+from benchmarks import bench_format, bench_upload  # noqa: F401, registers the benchmarks
+from benchmarks.core import main
+
+main()
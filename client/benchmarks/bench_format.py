@@ -0,0 +1,66 @@
+"""
+Formatting and rendering of large file listings
+"""
+
+import io
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+from benchmarks.core import Case, benchmark
+from src.models.permission import Permission
+from src.services.file import filter_files, print_file_table
+from src.utils.format_utils import auto_unit, format_iso_string
+
+FILES = 10000
+
+
+def listing(count: int = FILES) -> list:
+    """
+    Returns a file listing shaped like the one the server sends
+    """
+    start = datetime(2022, 1, 1)
+    access_types = list(Permission)
+    return [
+        {
+            "user_id": "user",
+            "file_id": f"file-{index:06d}",
+            "access_type": access_types[index % len(access_types)],
+            "file": {
+                "id": f"file-{index:06d}",
+                "file_name": f"report-{index:06d}.txt",
+                "file_size": index * 7919 % 10**9,
+                "created_at": (start + timedelta(minutes=index)).isoformat(),
+                "updated_at": (start + timedelta(minutes=index, seconds=30)).isoformat(),
+            },
+        }
+        for index in range(count)
+    ]
+
+
+@benchmark("format.auto_unit.10k")
+def format_sizes() -> Case:
+    sizes = [file["file"]["file_size"] for file in listing()]
+    return Case(lambda: [auto_unit(size) for size in sizes])
+
+
+@benchmark("format.format_iso_string.10k")
+def format_times() -> Case:
+    times = [file["file"]["created_at"] for file in listing()]
+    return Case(lambda: [format_iso_string(time) for time in times])
+
+
+@benchmark("format.filter_files.10k")
+def filter_listing() -> Case:
+    files = listing()
+    return Case(lambda: filter_files(files, not_access_type=Permission.read))
+
+
+@benchmark("format.print_file_table.10k")
+def print_table() -> Case:
+    files = listing()
+
+    def run() -> None:
+        with redirect_stdout(io.StringIO()):
+            print_file_table(files)
+
+    return Case(run)
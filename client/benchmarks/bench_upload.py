@@ -0,0 +1,44 @@
+"""
+Throughput of the chunking and compression done by the client before sending files
+"""
+
+import io
+import random
+from functools import partial
+
+from benchmarks.core import Case, benchmark, register
+from src.services.compression import READ_SIZE, gzip_chunks
+from src.utils.chunker import Chunker
+
+FILE_SIZE = 16 * 1024 * 1024
+LEVELS = (1, 6)
+
+
+def text(size: int, seed: int = 0) -> bytes:
+    """
+    Returns text like content, which compresses like typical uploads
+    """
+    rng = random.Random(seed)
+    words = [rng.randbytes(rng.randint(2, 8)).hex() for _ in range(1024)]
+    return " ".join(rng.choices(words, k=size // 8 + 1)).encode()[:size]
+
+
+@benchmark("upload.chunker.16m")
+def chunk() -> Case:
+    data = text(FILE_SIZE)
+
+    def run() -> int:
+        chunker = Chunker()
+        chunks = sum(len(chunker.feed(data[offset : offset + READ_SIZE])) for offset in range(0, len(data), READ_SIZE))
+        return chunks + len(chunker.finish())
+
+    return Case(run, FILE_SIZE)
+
+
+def compress(level: int) -> Case:
+    data = text(FILE_SIZE)
+    return Case(lambda: sum(len(member) for member in gzip_chunks(io.BytesIO(data), level)), FILE_SIZE)
+
+
+for level in LEVELS:
+    register(f"upload.gzip_chunks.level{level}.16m", partial(compress, level))
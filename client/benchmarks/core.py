@@ -0,0 +1,27 @@
+"""
+The benchmark runner of the server, see server/benchmarks/core.py, run against the client baseline
+
+The client and the server are separate projects with a benchmarks package each, so the runner is loaded from the
+server directory by its path.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+SERVER_CORE_PATH = Path(__file__).resolve().parents[2] / "server" / "benchmarks" / "core.py"
+
+_spec = importlib.util.spec_from_file_location("server_benchmarks_core", SERVER_CORE_PATH)
+_core = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _core
+_spec.loader.exec_module(_core)
+
+Case = _core.Case
+BENCHMARKS = _core.BENCHMARKS
+register = _core.register
+benchmark = _core.benchmark
+
+
+def main() -> None:
+    _core.main(BASELINE_PATH)
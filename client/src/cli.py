@@ -1,6 +1,8 @@
+from datetime import datetime
+from time import sleep
 from os import path
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 import typer
 import bcrypt
 
@@ -8,9 +10,16 @@ from src import __app_name__, __version__
 from src.exception import PermissionException, FileNotFoundException
 from src.exception.handler import exception_handler
 from src.models.permission import Permission
-from src.services.file import file_prompt, filter_files, print_file_table, print_file_info
-from src.services.user import user_file_prompt
+from src.models.sort import SortKey
+from src.services.batch import Transfer, timed_transfers
+from src.services.download import download_file, unique_file_names
+from src.services.file import file_prompt, files_prompt, print_file_table, print_file_info, original_size
+from src.services.user import user_file_prompt, access_usernames
 from src.services.token import set_tokens, get_token, set_token
+from src.services.compression import GZIP_LEVEL
+from src.services.delta import delta_edit_file
+from src.services.upload import upload_path
+from src.services.sync import plan_sync, sync_transfers
 from src.models.token import TokenType
 from src.utils.typer_utils import print_success
 from src.webapi.api import (
@@ -20,15 +29,11 @@ from src.webapi.api import (
     logout_all_users,
     get_user_files,
     refresh_user,
-    download_user_file,
     file_access_info,
     rename_user_file,
     change_user_access,
     remove_user_access,
-    get_user_info,
     delete_user_file,
-    stream_upload_user_file,
-    stream_edit_user_file,
 )
 
 app = typer.Typer()
@@ -116,50 +121,175 @@ def logout_all():
 
 @app.command()
 @exception_handler
-def get_files(access: Optional[Permission] = typer.Option(None, show_choices=True, case_sensitive=False)):
+def get_files(
+    access: Optional[Permission] = typer.Option(None, show_choices=True, case_sensitive=False),
+    name: Optional[str] = typer.Option(None, help="Part of the file name"),
+    prefix: Optional[str] = typer.Option(None, help="Start of the file name"),
+    min_size: Optional[int] = typer.Option(None, min=0, help="Minimum size of the original content in bytes"),
+    max_size: Optional[int] = typer.Option(None, min=0, help="Maximum size of the original content in bytes"),
+    created_after: Optional[datetime] = typer.Option(None),
+    created_before: Optional[datetime] = typer.Option(None),
+    updated_after: Optional[datetime] = typer.Option(None),
+    updated_before: Optional[datetime] = typer.Option(None),
+    sort: SortKey = typer.Option(SortKey.name, show_choices=True, case_sensitive=False),
+    desc: bool = typer.Option(False, "--desc", help="Sort in descending order"),
+):
     """
-    List all files
+    List all files, filtered and sorted by the server
     """
     access_token = get_token(TokenType.access_token)
-    files = get_user_files(access_token)
+    filters = {
+        "access_type": access and access.value,
+        "name": name,
+        "name_prefix": prefix,
+        "min_size": min_size,
+        "max_size": max_size,
+        # Dates are entered in local time
+        "created_after": created_after and created_after.astimezone().isoformat(),
+        "created_before": created_before and created_before.astimezone().isoformat(),
+        "updated_after": updated_after and updated_after.astimezone().isoformat(),
+        "updated_before": updated_before and updated_before.astimezone().isoformat(),
+        "sort": sort.value,
+        "order": "desc" if desc else "asc",
+    }
+    files = get_user_files(access_token, {key: value for key, value in filters.items() if value is not None})
     if len(files) == 0:
         raise FileNotFoundException
 
-    files = filter_files(files, access)
     print_file_table(files)
 
 
+def _upload_paths(dir_path: Path, pattern: Optional[str]) -> List[Path]:
+    return sorted(entry for entry in dir_path.glob(pattern or "**/*") if entry.is_file())
+
+
 @app.command()
 @exception_handler
-def upload(file_path: Path = typer.Option(..., exists=True, file_okay=True, dir_okay=False, resolve_path=True)):
+def upload(
+    file_path: Path = typer.Option(..., exists=True, file_okay=True, dir_okay=True, resolve_path=True),
+    pattern: Optional[str] = typer.Option(None, help="Glob of the files to upload from a directory [default: **/*]"),
+    connections: int = typer.Option(4, min=1, max=16, help="Number of parallel connections"),
+    workers: int = typer.Option(8, min=1, max=32, help="Number of files uploaded in parallel from a directory"),
+    retries: int = typer.Option(3, min=0, max=10, help="Attempts per file after connection failures"),
+    compress: bool = typer.Option(True, help="Compress compressible files with gzip before sending them"),
+    level: int = typer.Option(GZIP_LEVEL, min=1, max=9, help="Gzip compression level"),
+):
     """
-    Upload new file
+    Upload new file, or all files of a directory matching a glob
 
-    If --no-stream is used, file will be streamed uploaded
+    Large files are uploaded in parts over several connections, an interrupted upload resumes where it stopped.
+    Files of a directory are named by their path relative to it.
     """
-    input_file = open(file_path, "rb")
     access_token = get_token(TokenType.access_token)
-    file = stream_upload_user_file(access_token, path.basename(file_path), input_file)
-    print_success("File uploaded")
-    print_file_info(file)
+    if file_path.is_file():
+        file = upload_path(
+            access_token,
+            str(file_path),
+            path.basename(file_path),
+            connections=connections,
+            compress=compress,
+            level=level,
+        )
+        print_success("File uploaded")
+        print_file_info(file)
+        return
+
+    upload_paths = _upload_paths(file_path, pattern)
+    if len(upload_paths) == 0:
+        raise FileNotFoundException("No files matching the pattern")
+
+    # Every file is already transferred in parallel with the others, so each uses a single connection
+    transfers = [
+        Transfer(
+            name=entry.relative_to(file_path).as_posix(),
+            size=entry.stat().st_size,
+            run=lambda entry=entry: upload_path(
+                access_token,
+                str(entry),
+                entry.relative_to(file_path).as_posix(),
+                connections=1,
+                compress=compress,
+                level=level,
+            ),
+        )
+        for entry in upload_paths
+    ]
+    timed_transfers(transfers, workers, retries, f"Uploading {len(transfers)} files")
 
 
 @app.command()
 @exception_handler
-def download(dest_path: Path = typer.Option(..., exists=True, file_okay=False, dir_okay=True, resolve_path=True)):
+def sync(
+    dir_path: Path = typer.Option(..., exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    pattern: Optional[str] = typer.Option(None, help="Glob of the files to sync [default: **/*]"),
+    watch: bool = typer.Option(False, "--watch", help="Keep syncing the directory until interrupted"),
+    interval: float = typer.Option(10, min=1, help="Seconds between syncs when watching"),
+    workers: int = typer.Option(8, min=1, max=32, help="Number of files uploaded in parallel"),
+    retries: int = typer.Option(3, min=0, max=10, help="Attempts per file after connection failures"),
+    compress: bool = typer.Option(True, help="Compress compressible files with gzip before sending them"),
+    level: int = typer.Option(GZIP_LEVEL, min=1, max=9, help="Gzip compression level"),
+    delta: bool = typer.Option(True, help="Only send the parts of changed files that changed"),
+):
     """
-    Download file
+    Upload the files of a directory that are new or changed since they were last uploaded
+
+    Files are matched to server files by their path relative to the directory and compared by content hash, files
+    removed locally are left on the server
+    """
+    while True:
+        access_token = get_token(TokenType.access_token)
+        plan = plan_sync(access_token, dir_path, _upload_paths(dir_path, pattern))
+        transfers = sync_transfers(access_token, dir_path, plan, compress, level, delta)
+        if transfers:
+            timed_transfers(transfers, workers, retries, f"Syncing {len(transfers)} files")
+        elif not watch:
+            print_success(f"All {len(plan.unchanged)} files up to date")
+        if not watch:
+            return
+        sleep(interval)
+
+
+@app.command()
+@exception_handler
+def download(
+    dest_path: Path = typer.Option(..., exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    connections: int = typer.Option(4, min=1, max=16, help="Number of parallel connections"),
+    select: bool = typer.Option(False, "--select", help="Download several chosen files"),
+    all_files: bool = typer.Option(False, "--all", help="Download all files"),
+    workers: int = typer.Option(8, min=1, max=32, help="Number of files downloaded in parallel"),
+    retries: int = typer.Option(3, min=0, max=10, help="Attempts per file after connection failures"),
+):
+    """
+    Download file, several chosen files or all files
+
+    Large files are fetched in segments over several connections, an interrupted download resumes where it stopped
     """
     access_token = get_token(TokenType.access_token)
     files = get_user_files(access_token)
-    file_id = file_prompt(files, prompt_message="Enter file index to download")
-    downloaded_file = download_user_file(access_token, file_id)
-
-    with open(str(path.join(dest_path, downloaded_file["file_name"])), "wb") as target_file:
-        for chunk in downloaded_file["content"]:
-            if chunk:
-                target_file.write(chunk)
-    print_success("Download successful")
+    if not select and not all_files:
+        file_id = file_prompt(files, prompt_message="Enter file index to download")
+        download_file(access_token, file_id, str(dest_path), connections)
+        print_success("Download successful")
+        return
+
+    if all_files:
+        if len(files) == 0:
+            raise FileNotFoundException
+    else:
+        files = files_prompt(files, prompt_message="Enter file indices to download, e.g. 0,2,5-7")
+
+    file_names = unique_file_names(files)
+    transfers = [
+        Transfer(
+            name=file_names[file["file_id"]],
+            size=original_size(file["file"]) or 0,
+            run=lambda file_id=file["file_id"]: download_file(
+                access_token, file_id, str(dest_path), connections=1, file_name=file_names[file_id]
+            ),
+        )
+        for file in files
+    ]
+    timed_transfers(transfers, workers, retries, f"Downloading {len(transfers)} files")
 
 
 @app.command()
@@ -172,8 +302,7 @@ def info():
     files = get_user_files(access_token)
     file_id = file_prompt(files, prompt_message="Enter file index for info")
     file = file_access_info(access_token, file_id)
-    user_ids = [user["user_id"] for user in file["users"]]
-    users = {user_id: get_user_info(access_token, user_id)["username"] for user_id in user_ids}
+    users = access_usernames(access_token, file["users"])
     print_file_info(file, users)
 
 
@@ -195,15 +324,30 @@ def rename():
 
 @app.command()
 @exception_handler
-def edit(file_path: Path = typer.Option(..., exists=True, file_okay=True, dir_okay=False, resolve_path=True)):
+def edit(
+    file_path: Path = typer.Option(..., exists=True, file_okay=True, dir_okay=False, resolve_path=True),
+    connections: int = typer.Option(4, min=1, max=16, help="Number of parallel connections"),
+    compress: bool = typer.Option(True, help="Compress compressible files with gzip before sending them"),
+    level: int = typer.Option(GZIP_LEVEL, min=1, max=9, help="Gzip compression level"),
+    delta: bool = typer.Option(True, help="Only send the parts of the file that changed"),
+):
     """
     Edit file
+
+    Only the chunks of the file the server does not have yet are sent, unless it shares no chunk with the current
+    version. Large files are then uploaded in parts over several connections, an interrupted upload resumes where
+    it stopped
     """
-    input_file = open(file_path, "rb")
     access_token = get_token(TokenType.access_token)
     files = get_user_files(access_token)
     file_id = file_prompt(files, prompt_message="Enter file index to edit", not_access_type=Permission.read)
-    file = stream_edit_user_file(access_token, file_id, path.basename(file_path), input_file)
+    file = None
+    if delta:
+        file = delta_edit_file(access_token, file_id, str(file_path), path.basename(file_path), compress, level)
+    if file is None:
+        file = upload_path(
+            access_token, str(file_path), path.basename(file_path), file_id, connections, compress, level
+        )
     print_success("File edited")
     print_file_info(file, file_info_header="Updated File Info:")
 
@@ -218,8 +362,7 @@ def change_access():
     files = get_user_files(access_token)
     file_id = file_prompt(files, prompt_message="Enter file index to change access", access_type=Permission.owner)
     file = file_access_info(access_token, file_id)
-    user_ids = [user["user_id"] for user in file["users"]]
-    users = {user_id: get_user_info(access_token, user_id)["username"] for user_id in user_ids}
+    users = access_usernames(access_token, file["users"])
     user_id = user_file_prompt(file["users"], users, prompt_message="Enter user id to change access")
     access_type = typer.prompt("Enter permission to be provided")
 
@@ -239,8 +382,7 @@ def remove_access():
     files = get_user_files(access_token)
     file_id = file_prompt(files, prompt_message="Enter file index to remove access", access_type=Permission.owner)
     file = file_access_info(access_token, file_id)
-    user_ids = [user["user_id"] for user in file["users"]]
-    users = {user_id: get_user_info(access_token, user_id)["username"] for user_id in user_ids}
+    users = access_usernames(access_token, file["users"])
     user_id = user_file_prompt(file["users"], users, prompt_message="Enter user id to remove access")
 
     remove_user_access(access_token, user_id, file_id)
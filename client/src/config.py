@@ -6,3 +6,12 @@ load_dotenv()
 # API URL
 URL = environ.get("URL")
 TOKEN_FILE_PATH = environ.get("TOKEN_FILE_PATH")
+# Directory of the cached listings and downloads, defaults to .blob-system-cache in the home directory
+CACHE_DIR_PATH = environ.get("CACHE_DIR_PATH")
+
+# HTTP session, timeouts are in seconds
+REQUEST_CONNECT_TIMEOUT = float(environ.get("REQUEST_CONNECT_TIMEOUT") or 5)
+REQUEST_READ_TIMEOUT = float(environ.get("REQUEST_READ_TIMEOUT") or 60)
+REQUEST_RETRIES = int(environ.get("REQUEST_RETRIES") or 3)
+REQUEST_BACKOFF = float(environ.get("REQUEST_BACKOFF") or 0.5)
+REQUEST_POOL_SIZE = int(environ.get("REQUEST_POOL_SIZE") or 10)
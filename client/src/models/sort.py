@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class SortKey(str, Enum):
+    name = "name"
+    size = "size"
+    created_at = "created_at"
+    updated_at = "updated_at"
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic, sleep
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import typer
+from requests.exceptions import RequestException
+from tabulate import tabulate
+
+from src.exception import APIException
+from src.utils.format_utils import auto_unit
+from src.utils.typer_utils import print_header, print_success, print_error
+
+RETRY_BACKOFF = 0.5
+
+
+class Transfer(NamedTuple):
+    name: str
+    size: int
+    run: Callable[[], Any]
+
+
+class TransferResult(NamedTuple):
+    name: str
+    size: int
+    attempts: int
+    error: Optional[str]
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, APIException):
+        return error.detail["error_info"] if type(error.detail) == dict else str(error.detail)
+    if isinstance(error, RequestException):
+        return "Cant connect to host"
+    return str(error) or type(error).__name__
+
+
+def _run_transfer(transfer: Transfer, retries: int) -> TransferResult:
+    """
+    Runs a transfer, retrying it with exponential backoff while it fails on the connection
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            transfer.run()
+            return TransferResult(transfer.name, transfer.size, attempt, None)
+        except RequestException as e:
+            # Invalid responses of failing servers are RequestExceptions as well
+            if attempt > retries:
+                return TransferResult(transfer.name, transfer.size, attempt, _error_message(e))
+            sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        except (APIException, OSError) as e:
+            return TransferResult(transfer.name, transfer.size, attempt, _error_message(e))
+
+
+def run_transfers(transfers: List[Transfer], workers: int, retries: int, label: str) -> List[TransferResult]:
+    """
+    Runs transfers over a bounded pool of workers with an aggregate progress bar, and returns their results
+
+    A failing transfer does not stop the others, its error is part of its result.
+    """
+    results = []
+    with typer.progressbar(length=len(transfers), label=label) as progress:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_transfer, transfer, retries) for transfer in transfers]
+            try:
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    progress.update(1)
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+    return results
+
+
+def print_transfer_summary(results: List[TransferResult], elapsed: float) -> None:
+    succeeded = [result for result in results if result.error is None]
+    failed = [result for result in results if result.error is not None]
+    transferred = sum(result.size for result in succeeded)
+
+    print_header("Summary:")
+    summary_data = [
+        ["Files:", len(results)],
+        ["Succeeded:", len(succeeded)],
+        ["Failed:", len(failed)],
+        ["Retried:", sum(1 for result in results if result.attempts > 1)],
+        ["Transferred:", auto_unit(transferred)],
+        ["Time:", f"{elapsed:.1f}s"],
+        ["Speed:", f"{auto_unit(int(transferred / elapsed)) if elapsed > 0 else '-'}/s"],
+    ]
+    typer.echo(tabulate(summary_data, tablefmt="plain", colalign=("right", "left")))
+
+    if failed:
+        print_header("Failed Files:")
+        typer.echo(tabulate([[result.name, result.error] for result in failed], headers=["Name", "Error"]))
+        print_error(f"{len(failed)} of {len(results)} files failed")
+    else:
+        print_success(f"All {len(results)} files transferred")
+
+
+def timed_transfers(transfers: List[Transfer], workers: int, retries: int, label: str) -> List[TransferResult]:
+    """
+    Runs transfers like run_transfers and prints their summary
+    """
+    start = monotonic()
+    results = run_transfers(transfers, workers, retries, label)
+    print_transfer_summary(results, monotonic() - start)
+    return results
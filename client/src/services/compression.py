@@ -0,0 +1,49 @@
+import gzip
+import zlib
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO, Iterator
+
+from src.utils.chunker import Chunker
+
+GZIP_LEVEL = 6
+READ_SIZE = 1024 * 1024
+SAMPLE_SIZE = 64 * 1024
+
+
+def is_compressible(file_path: str) -> bool:
+    """
+    Checks whether a quick compression of the start of a file shrinks it, which is not the case for content that
+    is already compressed
+    """
+    with open(file_path, "rb") as input_file:
+        sample = input_file.read(SAMPLE_SIZE)
+    return len(sample) > 0 and len(zlib.compress(sample, 1)) < len(sample) * 0.9
+
+
+def gzip_chunks(input_file: BinaryIO, level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """
+    Yields the content of a file as a gzip stream made of one gzip member per chunk
+
+    Chunks are cut exactly like the server cuts them, so the server stores every member as it is received instead
+    of compressing the content again.
+    """
+    chunker = Chunker()
+    while True:
+        data = input_file.read(READ_SIZE)
+        chunks = chunker.feed(data) if data else chunker.finish()
+        for chunk in chunks:
+            yield gzip.compress(chunk, compresslevel=level, mtime=0)
+        if not data:
+            return
+
+
+def gzip_to_file(file_path: str, level: int = GZIP_LEVEL) -> str:
+    """
+    Writes the gzip stream of a file into a temporary file and returns its path, the caller removes it
+
+    The stream is the same for the same content and level, so an interrupted upload of it can be resumed.
+    """
+    with open(file_path, "rb") as input_file, NamedTemporaryFile(suffix=".gz", delete=False) as output_file:
+        for member in gzip_chunks(input_file, level):
+            output_file.write(member)
+    return output_file.name
@@ -0,0 +1,80 @@
+import gzip
+from hashlib import sha256
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.services.compression import GZIP_LEVEL, READ_SIZE, is_compressible
+from src.utils.chunker import Chunker, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+from src.webapi.api import get_file_signature, delta_edit_user_file
+
+# Operations of a delta, as parsed by the server
+OP_COPY = b"C"
+OP_DATA = b"D"
+OP_GZIP = b"G"
+LENGTH_SIZE = 4
+
+
+def file_chunks(file_path: str) -> List[Tuple[str, int, int]]:
+    """
+    Returns the (sha256, offset, length) of the chunks of a file, as the server chunks it
+    """
+    chunks = []
+    offset = 0
+    chunker = Chunker()
+    with open(file_path, "rb") as input_file:
+        while True:
+            data = input_file.read(READ_SIZE)
+            for chunk in chunker.feed(data) if data else chunker.finish():
+                chunks.append((sha256(chunk).hexdigest(), offset, len(chunk)))
+                offset += len(chunk)
+            if not data:
+                return chunks
+
+
+def delta_ops(
+    file_path: str, chunks: List[Tuple[str, int, int]], known: Set[str], compress: bool, level: int = GZIP_LEVEL
+) -> Iterator[bytes]:
+    """
+    Yields the delta building a file from chunks the server has and the data of the chunks it does not have
+    """
+    with open(file_path, "rb") as input_file:
+        for chunk_hash, offset, length in chunks:
+            if chunk_hash in known:
+                yield OP_COPY + bytes.fromhex(chunk_hash)
+                continue
+
+            input_file.seek(offset)
+            data = input_file.read(length)
+            op = OP_DATA
+            if compress:
+                op, data = OP_GZIP, gzip.compress(data, compresslevel=level, mtime=0)
+            yield op + len(data).to_bytes(LENGTH_SIZE, "big") + data
+
+
+def delta_edit_file(
+    access_token: str,
+    file_id: str,
+    file_path: str,
+    file_name: str,
+    compress: bool = True,
+    level: int = GZIP_LEVEL,
+) -> Optional[Dict[str, str]]:
+    """
+    Edits a file by sending only the chunks the current version on the server does not have, and returns the
+    updated file info
+
+    Returns None without sending anything when no chunk of the file is on the server, or when the server splits
+    files differently, so the caller uploads the whole file instead.
+    """
+    signature = get_file_signature(access_token, file_id)
+    if signature["min_chunk_size"] != MIN_CHUNK_SIZE or signature["max_chunk_size"] != MAX_CHUNK_SIZE:
+        return None
+
+    known = {chunk["hash"] for chunk in signature["chunks"]}
+    if not known:
+        return None
+    chunks = file_chunks(file_path)
+    if not any(chunk_hash in known for chunk_hash, _, _ in chunks):
+        return None
+
+    ops = delta_ops(file_path, chunks, known, compress and is_compressible(file_path), level)
+    return delta_edit_user_file(access_token, file_id, file_name, ops)
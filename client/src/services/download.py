@@ -0,0 +1,179 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import makedirs, path, pwrite, remove, replace, stat
+from typing import Dict, List, Optional, Set
+
+from src.config import URL
+from src.exception import APIException
+from src.webapi.cache import get_cached, set_cached
+from src.webapi.api import download_user_file, download_user_file_range
+
+SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+def _load_state(state_path: str, etag: str, size: int) -> Set[int]:
+    """
+    Returns the segments already downloaded by an interrupted download of the same file version
+    """
+    try:
+        with open(state_path, "r") as state_file:
+            state = json.load(state_file)
+    except (IOError, json.decoder.JSONDecodeError):
+        return set()
+
+    if state.get("etag") != etag or state.get("size") != size or state.get("segment_size") != SEGMENT_SIZE:
+        return set()
+    return set(state.get("done", []))
+
+
+def _save_state(state_path: str, etag: str, size: int, done: Set[int]) -> None:
+    with open(state_path + ".tmp", "w") as state_file:
+        json.dump({"etag": etag, "size": size, "segment_size": SEGMENT_SIZE, "done": sorted(done)}, state_file)
+    replace(state_path + ".tmp", state_path)
+
+
+def _fetch_segment(access_token: str, file_id: str, etag: str, file_descriptor: int, start: int, end: int) -> None:
+    downloaded = download_user_file_range(access_token, file_id, start, end, etag)
+    if not downloaded["partial"]:
+        raise APIException({"error_info": "File changed on the server during download"})
+
+    offset = start
+    for chunk in downloaded["content"]:
+        if chunk:
+            pwrite(file_descriptor, chunk, offset)
+            offset += len(chunk)
+
+    if offset != end + 1:
+        raise APIException({"error_info": "Incomplete segment received"})
+
+
+def _stream_to_file(downloaded: Dict, target_path: str) -> None:
+    with open(target_path, "wb") as target_file:
+        for chunk in downloaded["content"]:
+            if chunk:
+                target_file.write(chunk)
+
+
+def _target_path(dest_path: str, file_name: str) -> str:
+    """
+    Returns the path a file is saved to, file names holding a relative path are saved in the same subdirectories
+
+    Names leading outside of dest_path are saved under their base name.
+    """
+    target_path = path.normpath(path.join(dest_path, file_name))
+    if path.commonpath([path.abspath(dest_path), path.abspath(target_path)]) != path.abspath(dest_path):
+        target_path = path.join(dest_path, path.basename(file_name))
+    makedirs(path.dirname(target_path), exist_ok=True)
+    return target_path
+
+
+def unique_file_names(files: List[Dict]) -> Dict[str, str]:
+    """
+    Returns the name each file of a batch is saved under, keyed by file id
+
+    Files sharing a name with a file listed before them get a numbered suffix before the extension, like
+    "notes (1).txt", so a batch downloaded into one directory does not overwrite its own files.
+    """
+    file_names = {}
+    taken = set()
+    for file in files:
+        file_name = file["file"]["file_name"]
+        root, extension = path.splitext(file_name)
+        number = 0
+        while path.normpath(file_name) in taken:
+            number += 1
+            file_name = f"{root} ({number}){extension}"
+        taken.add(path.normpath(file_name))
+        file_names[file["file_id"]] = file_name
+    return file_names
+
+
+def _unchanged_download(cache_key: str) -> Optional[Dict]:
+    """
+    Returns the cached download of a file into a directory, if the downloaded file was not changed or removed since
+    """
+    cached = get_cached("downloads", cache_key)
+    if cached is None:
+        return None
+    try:
+        file_stat = stat(cached["path"])
+    except FileNotFoundError:
+        return None
+    if file_stat.st_size != cached["size"] or file_stat.st_mtime_ns != cached["mtime"]:
+        return None
+    return cached
+
+
+def _cache_download(cache_key: str, target_path: str, etag: Optional[str]) -> None:
+    if etag is None:
+        return
+    file_stat = stat(target_path)
+    set_cached(
+        "downloads",
+        cache_key,
+        {"etag": etag, "path": target_path, "size": file_stat.st_size, "mtime": file_stat.st_mtime_ns},
+    )
+
+
+def download_file(
+    access_token: str, file_id: str, dest_path: str, connections: int = 4, file_name: Optional[str] = None
+) -> str:
+    """
+    Downloads a file in segments over several connections and returns the path it was saved to
+
+    Segments are written into a .part file and tracked in a .part.json file next to it, so an interrupted download
+    of the same file version resumes with the missing segments only. Files that fit in a single segment are
+    downloaded in one compressed stream instead.
+    A file downloaded before into the same directory and left unchanged there is not downloaded again while its
+    content on the server keeps the same ETag.
+    The file is saved under its name on the server, unless file_name is given.
+    """
+    cache_key = f"{URL}|{file_id}|{dest_path}"
+    cached = _unchanged_download(cache_key)
+    probe = download_user_file_range(access_token, file_id, 0, 0, if_none_match=cached and cached["etag"])
+    if probe["not_modified"]:
+        return cached["path"]
+    target_path = _target_path(dest_path, file_name or probe["file_name"])
+
+    if not probe["partial"]:
+        # The server sent the whole file, which happens for empty files and files without range support
+        _stream_to_file(probe, target_path)
+        _cache_download(cache_key, target_path, probe["etag"])
+        return target_path
+
+    etag, size = probe["etag"], probe["size"]
+    if size <= SEGMENT_SIZE or connections <= 1:
+        _stream_to_file(download_user_file(access_token, file_id), target_path)
+        _cache_download(cache_key, target_path, etag)
+        return target_path
+
+    part_path = target_path + ".part"
+    state_path = part_path + ".json"
+
+    done = _load_state(state_path, etag, size) if path.isfile(part_path) else set()
+    segments = {
+        index: (start, min(start + SEGMENT_SIZE, size) - 1)
+        for index, start in enumerate(range(0, size, SEGMENT_SIZE))
+        if index not in done
+    }
+
+    with open(part_path, "r+b" if done else "w+b") as part_file:
+        part_file.truncate(size)
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            futures = {
+                executor.submit(_fetch_segment, access_token, file_id, etag, part_file.fileno(), start, end): index
+                for index, (start, end) in segments.items()
+            }
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    done.add(futures[future])
+                    _save_state(state_path, etag, size, done)
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+
+    replace(part_path, target_path)
+    remove(state_path)
+    _cache_download(cache_key, target_path, etag)
+    return target_path
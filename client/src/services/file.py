@@ -21,12 +21,22 @@ def filter_files(
     return file_list
 
 
+def original_size(file_info: Dict) -> Optional[int]:
+    """
+    Returns the size of the content of a file, files stored before original sizes were recorded fall back to their
+    stored size
+    """
+    if file_info.get("original_size") is not None:
+        return file_info["original_size"]
+    return file_info["file_size"]
+
+
 def print_file_info(
     file_info: Dict, users: Optional[Dict[str, str]] = None, file_info_header: Optional[str] = "File Info:"
 ) -> None:
     file_info_data = [
         ["Name:", file_info["file_name"]],
-        ["Size:", auto_unit(file_info["file_size"])],
+        ["Size:", auto_unit(original_size(file_info))],
         ["Created at:", format_iso_string(file_info["created_at"])],
         ["Updated at:", format_iso_string(file_info["updated_at"])],
     ]
@@ -47,7 +57,7 @@ def print_file_table(files: List[Dict]) -> None:
         [
             i,
             file["file"]["file_name"],
-            auto_unit(file["file"]["file_size"]),
+            auto_unit(original_size(file["file"])),
             format_iso_string(file["file"]["created_at"]),
             format_iso_string(file["file"]["updated_at"]),
         ]
@@ -76,3 +86,28 @@ def file_prompt(
 
     file_id = files[index]["file_id"]
     return file_id
+
+
+def files_prompt(
+    files: List[Dict],
+    prompt_message: Optional[str] = "Enter file indices, e.g. 0,2,5-7",
+    access_type: Optional[Permission] = None,
+    not_access_type: Optional[Permission] = None,
+) -> List[Dict]:
+    """
+    Prompts for several files by comma separated indices and index ranges, and returns the chosen files
+    """
+    files = filter_files(files, access_type, not_access_type)
+    print_file_table(files)
+    indices = set()
+    try:
+        for selection in typer.prompt(prompt_message).split(","):
+            start, _, end = selection.strip().partition("-")
+            indices.update(range(int(start), int(end or start) + 1))
+    except ValueError:
+        raise IndexException
+
+    if len(indices) == 0 or not indices.issubset(range(len(files))):
+        raise IndexException
+
+    return [files[index] for index in sorted(indices)]
@@ -0,0 +1,128 @@
+from hashlib import sha256
+from os import stat
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from src.models.permission import Permission
+from src.services.batch import Transfer
+from src.services.compression import GZIP_LEVEL, READ_SIZE
+from src.services.delta import delta_edit_file
+from src.services.upload import upload_path
+from src.webapi.api import get_user_files
+from src.webapi.cache import get_cached, set_cached_entries
+
+
+class SyncPlan(NamedTuple):
+    new: List[Path]
+    # Local files with the id of the server file they replace
+    changed: List[Tuple[Path, str]]
+    unchanged: List[Path]
+
+
+def _file_hash(file_path: Path) -> str:
+    content_hash = sha256()
+    with open(file_path, "rb") as input_file:
+        while True:
+            data = input_file.read(READ_SIZE)
+            if not data:
+                return content_hash.hexdigest()
+            content_hash.update(data)
+
+
+def local_hashes(file_paths: List[Path]) -> Dict[Path, str]:
+    """
+    Returns the sha256 of the content of files, files not modified since they were last hashed are not read again
+    """
+    hashes = dict()
+    new_entries = dict()
+    for file_path in file_paths:
+        file_stat = stat(file_path)
+        cached = get_cached("hashes", str(file_path))
+        if cached and cached["size"] == file_stat.st_size and cached["mtime_ns"] == file_stat.st_mtime_ns:
+            hashes[file_path] = cached["sha256"]
+            continue
+
+        hashes[file_path] = _file_hash(file_path)
+        new_entries[str(file_path)] = {
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "sha256": hashes[file_path],
+        }
+    if new_entries:
+        set_cached_entries("hashes", new_entries)
+    return hashes
+
+
+def plan_sync(access_token: str, dir_path: Path, file_paths: List[Path]) -> SyncPlan:
+    """
+    Splits the files of a directory into new files, files whose content differs from the server file of the same
+    name, and unchanged files
+
+    The server files are compared by the size and hash of their content from a single listing, files only readable
+    by the user are not considered.
+    """
+    remote_files: Dict[str, List[Dict]] = dict()
+    for file in get_user_files(access_token):
+        if file["access_type"] != Permission.read:
+            remote_files.setdefault(file["file"]["file_name"], []).append(file)
+
+    plan = SyncPlan([], [], [])
+    hashes = local_hashes(file_paths)
+    for file_path in file_paths:
+        matches = remote_files.get(file_path.relative_to(dir_path).as_posix())
+        if not matches:
+            plan.new.append(file_path)
+        elif any(
+            file["file"].get("content_hash") == hashes[file_path]
+            and file["file"].get("original_size") == file_path.stat().st_size
+            for file in matches
+        ):
+            plan.unchanged.append(file_path)
+        else:
+            plan.changed.append((file_path, matches[0]["file_id"]))
+    return plan
+
+
+def _edit_path(
+    access_token: str, file_id: str, file_path: Path, file_name: str, compress: bool, level: int, delta: bool
+) -> Dict[str, str]:
+    file = None
+    if delta:
+        file = delta_edit_file(access_token, file_id, str(file_path), file_name, compress, level)
+    if file is None:
+        file = upload_path(access_token, str(file_path), file_name, file_id, 1, compress, level)
+    return file
+
+
+def sync_transfers(
+    access_token: str,
+    dir_path: Path,
+    plan: SyncPlan,
+    compress: bool = True,
+    level: int = GZIP_LEVEL,
+    delta: bool = True,
+) -> List[Transfer]:
+    """
+    Returns the transfers uploading the new files of a plan and editing the changed ones
+    """
+    transfers = [
+        Transfer(
+            name=entry.relative_to(dir_path).as_posix(),
+            size=entry.stat().st_size,
+            run=lambda entry=entry: upload_path(
+                access_token, str(entry), entry.relative_to(dir_path).as_posix(), None, 1, compress, level
+            ),
+        )
+        for entry in plan.new
+    ]
+    transfers.extend(
+        Transfer(
+            name=entry.relative_to(dir_path).as_posix(),
+            size=entry.stat().st_size,
+            run=lambda entry=entry, file_id=file_id: _edit_path(
+                access_token, file_id, entry, entry.relative_to(dir_path).as_posix(), compress, level, delta
+            ),
+        )
+        for entry, file_id in plan.changed
+    )
+    return transfers
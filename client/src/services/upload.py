@@ -0,0 +1,158 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from math import ceil
+from os import path, stat, replace, remove
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from src.exception import APIException
+from src.services.compression import GZIP_LEVEL, gzip_chunks, gzip_to_file, is_compressible
+from src.webapi.api import (
+    create_upload_session,
+    get_upload_session,
+    upload_session_part,
+    commit_upload_session,
+    stream_upload_user_file,
+    stream_edit_user_file,
+)
+
+PART_SIZE = 8 * 1024 * 1024
+UPLOAD_STATE_PATH = path.join(Path.home(), ".blob-system-uploads.json")
+# Batch uploads update the state file from several threads
+state_lock = Lock()
+
+
+def _load_states() -> Dict:
+    try:
+        with open(UPLOAD_STATE_PATH, "r") as state_file:
+            states = json.load(state_file)
+    except (IOError, json.decoder.JSONDecodeError):
+        return dict()
+    return states if type(states) == dict else dict()
+
+
+def _save_state(key: str, state: Optional[Dict]) -> None:
+    with state_lock:
+        states = _load_states()
+        if state is None:
+            states.pop(key, None)
+        else:
+            states[key] = state
+
+        with open(UPLOAD_STATE_PATH + ".tmp", "w") as state_file:
+            json.dump(states, state_file)
+        replace(UPLOAD_STATE_PATH + ".tmp", UPLOAD_STATE_PATH)
+
+
+def _upload_part(access_token: str, session_id: str, file_path: str, part_number: int) -> None:
+    with open(file_path, "rb") as input_file:
+        input_file.seek(part_number * PART_SIZE)
+        data = input_file.read(PART_SIZE)
+    upload_session_part(access_token, session_id, part_number, data)
+
+
+def _resume_session(
+    access_token: str, state: Optional[Dict], size: int, mtime: float, encoding: Optional[str]
+) -> Optional[Dict]:
+    if state is None or state["size"] != size or state["mtime"] != mtime or state["part_size"] != PART_SIZE:
+        return None
+    if state.get("encoding") != encoding:
+        return None
+    try:
+        return get_upload_session(access_token, state["session_id"])
+    except APIException:
+        # The session expired or was aborted, the upload starts over
+        return None
+
+
+def upload_file(
+    access_token: str,
+    file_path: str,
+    file_name: str,
+    file_id: Optional[str] = None,
+    connections: int = 4,
+    encoding: Optional[str] = None,
+    level: int = GZIP_LEVEL,
+) -> Dict[str, str]:
+    """
+    Uploads a file as parts over several connections, and returns the uploaded file info
+
+    Upload sessions are remembered in the home directory until they are committed, so uploading the same
+    unchanged file again after an interruption only sends the parts the server has not received, and a commit
+    interrupted after the server stored the file returns that file instead of storing it twice.
+    With a gzip encoding the parts are the parts of the gzip stream of the file, which is written to a temporary
+    file first.
+    """
+    file_stat = stat(file_path)
+    state_key = f"{file_path}|{file_id or ''}"
+    upload_path = file_path if encoding is None else gzip_to_file(file_path, level)
+    try:
+        part_count = max(ceil(path.getsize(upload_path) / PART_SIZE), 1)
+
+        session = _resume_session(
+            access_token, _load_states().get(state_key), file_stat.st_size, file_stat.st_mtime, encoding
+        )
+        if session is None:
+            session = create_upload_session(access_token, file_name, file_id, encoding)
+            _save_state(
+                state_key,
+                {
+                    "session_id": session["session_id"],
+                    "size": file_stat.st_size,
+                    "mtime": file_stat.st_mtime,
+                    "part_size": PART_SIZE,
+                    "encoding": encoding,
+                },
+            )
+
+        session_id = session["session_id"]
+        # A session committed by an earlier run, whose response was lost, is only committed again to get its file
+        if session.get("committed_file_id") is None:
+            received = set(session["parts"])
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                futures = [
+                    executor.submit(_upload_part, access_token, session_id, upload_path, part_number)
+                    for part_number in range(part_count)
+                    if part_number not in received
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+
+        file = commit_upload_session(access_token, session_id, part_count)
+    finally:
+        if upload_path != file_path:
+            remove(upload_path)
+    _save_state(state_key, None)
+    return file
+
+
+def upload_path(
+    access_token: str,
+    file_path: str,
+    file_name: str,
+    file_id: Optional[str] = None,
+    connections: int = 4,
+    compress: bool = True,
+    level: int = GZIP_LEVEL,
+) -> Dict[str, str]:
+    """
+    Uploads a new file, or a new version of file_id, and returns the uploaded file info
+
+    Files larger than a part are uploaded in parts, smaller ones in a single stream. Compressible files are gzip
+    compressed on the way when compress is set, and stored by the server as sent.
+    """
+    encoding = "gzip" if compress and is_compressible(file_path) else None
+    if path.getsize(file_path) > PART_SIZE:
+        return upload_file(access_token, file_path, file_name, file_id, connections, encoding, level)
+
+    with open(file_path, "rb") as input_file:
+        # Small files are compressed in memory, which keeps the body replayable
+        data = input_file if encoding is None else b"".join(gzip_chunks(input_file, level))
+        if file_id is None:
+            return stream_upload_user_file(access_token, file_name, data, encoding)
+        return stream_edit_user_file(access_token, file_id, file_name, data, encoding)
@@ -4,9 +4,21 @@ import typer
 from tabulate import tabulate
 
 from src.exception import InvalidUserException
+from src.webapi.api import get_users_info
 from src.utils.typer_utils import print_header
 
 
+def access_usernames(access_token: str, access_entries: List[Dict]) -> Dict[str, str]:
+    """
+    Returns the usernames of the users in a file access list, which the server sends along with the list
+    """
+    users = {entry["user_id"]: entry.get("username") for entry in access_entries}
+    missing = [user_id for user_id, username in users.items() if username is None]
+    if missing:
+        users.update({user["id"]: user["username"] for user in get_users_info(access_token, missing)})
+    return users
+
+
 def print_user_access_info(access_entries: List[Dict], users: Dict[str, str]) -> None:
     user_data = [[users[entry["user_id"]], entry["user_id"], entry["access_type"]] for entry in access_entries]
     user_table = tabulate(user_data, headers=["Username", "User ID", "Access"])
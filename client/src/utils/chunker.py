@@ -0,0 +1,93 @@
+import re
+from hashlib import sha256
+from typing import List, Optional
+
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+WINDOW_BITS = 4
+WINDOW_SIZE = 1 << WINDOW_BITS
+
+# Cut where the window hashes of three consecutive positions are 0x00, 0x00, 0x0?, about once every 1 MiB
+CUT_PATTERN = re.compile(b"\x00\x00[\x00-\x0f]")
+
+
+def _permutation(level: int) -> bytes:
+    return bytes(sorted(range(256), key=lambda value: sha256(bytes([level, value])).digest()))
+
+
+# Derived from sha256 exactly as on the server, which splits content the same way
+PERMUTATIONS = tuple(_permutation(level) for level in range(WINDOW_BITS + 1))
+
+
+def window_hashes(region: bytes) -> bytes:
+    """
+    Returns one hash byte per position of region, covering the WINDOW_SIZE bytes ending at that position
+
+    The window is built by doubling: h(i) = h(i) ^ P[h(i - span)] for span = 1, 2, 4, 8, each step being a
+    bytes.translate and a big integer xor over the whole region, so no python code runs per byte.
+    Only positions from WINDOW_SIZE - 1 onwards cover a full window.
+    """
+    hashes = region.translate(PERMUTATIONS[0])
+    length = len(hashes)
+    for level in range(WINDOW_BITS):
+        span = 1 << level
+        mixed = int.from_bytes(hashes, "little") ^ (
+            int.from_bytes(hashes.translate(PERMUTATIONS[level + 1]), "little") << (8 * span)
+        )
+        hashes = mixed.to_bytes(length + span, "little")[:length]
+    return hashes
+
+
+class Chunker:
+    """
+    Content defined chunker, a copy of the server chunker which must produce the exact same chunks
+
+    Bytes are fed incrementally and complete chunks are returned as soon as a cut point is found. A cut
+    depends only on the last few bytes before it, so the same content produces the same chunks regardless
+    of how the stream was split, and an insertion only changes the chunks around it.
+    """
+
+    def __init__(self, min_size: int = MIN_CHUNK_SIZE, max_size: int = MAX_CHUNK_SIZE) -> None:
+        self.min_size = min_size
+        self.max_size = max_size
+        self.buffer = bytearray()
+        self.scan_pos = min_size
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self.buffer += data
+        chunks = []
+        cut = self._cut_point()
+        while cut is not None:
+            chunks.append(self._take(cut))
+            cut = self._cut_point()
+        return chunks
+
+    def finish(self) -> List[bytes]:
+        if not self.buffer:
+            return []
+        return [self._take(len(self.buffer))]
+
+    def _take(self, cut: int) -> bytes:
+        chunk = bytes(self.buffer[:cut])
+        del self.buffer[:cut]
+        self.scan_pos = self.min_size
+        return chunk
+
+    def _cut_point(self) -> Optional[int]:
+        end = min(len(self.buffer), self.max_size)
+        if end <= self.scan_pos:
+            return None
+
+        start = self.scan_pos - (WINDOW_SIZE - 1)
+        hashes = window_hashes(bytes(self.buffer[start:end]))
+        match = CUT_PATTERN.search(hashes, WINDOW_SIZE - 1)
+        if match:
+            return start + match.end()
+
+        if end >= self.max_size:
+            return self.max_size
+
+        # The cut pattern spans three positions, so rescan the last two with the next data
+        self.scan_pos = max(self.scan_pos, end - 2)
+        return None
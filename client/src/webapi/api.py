@@ -1,17 +1,19 @@
-from urllib.parse import unquote
-from typing import Optional, Dict, BinaryIO, List
+from urllib.parse import unquote, urlencode
+from typing import Optional, Dict, BinaryIO, Iterator, List, Tuple, Union
 import re
 
-import requests
 from requests import Response
 
-from src.config import URL
+from src.config import URL, REQUEST_CONNECT_TIMEOUT
 from src.exception import APIException
+from src.webapi.cache import get_cached, set_cached
+from src.webapi.client import client
 from src.webapi.response_validator import response_validator
 
 
 RE_FILENAME = re.compile(r'filename="(.+)"')
 RE_ENCODED_FILENAME = re.compile(r"filename\*=utf-8''(.+)")
+RE_CONTENT_RANGE = re.compile(r"bytes \d+-\d+/(\d+)")
 
 
 def get_request(
@@ -19,8 +21,9 @@ def get_request(
     query_params: Optional[Dict[str, str]] = None,
     cookies: Optional[Dict[str, str]] = None,
     stream: Optional[bool] = False,
+    headers: Optional[Dict[str, str]] = None,
 ) -> Response:
-    response_body = requests.get(URL + path, cookies=cookies, params=query_params, stream=stream)
+    response_body = client.request("GET", path, cookies=cookies, params=query_params, stream=stream, headers=headers)
     return response_validator(response_body)
 
 
@@ -31,8 +34,13 @@ def post_request(
     file: Optional[Dict[str, BinaryIO]] = None,
     query_params: Optional[Dict[str, str]] = None,
     cookies: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[Tuple[float, Optional[float]]] = None,
 ) -> Response:
-    response_body = requests.post(URL + path, data=data, params=query_params, cookies=cookies, json=body, files=file)
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    response_body = client.request(
+        "POST", path, data=data, params=query_params, cookies=cookies, json=body, files=file, headers=headers, **kwargs
+    )
     return response_validator(response_body)
 
 
@@ -42,7 +50,7 @@ def patch_request(
     query_params: Optional[Dict[str, str]] = None,
     cookies: Optional[Dict[str, str]] = None,
 ) -> Response:
-    response_body = requests.patch(URL + path, cookies=cookies, json=body, params=query_params)
+    response_body = client.request("PATCH", path, cookies=cookies, json=body, params=query_params)
     return response_validator(response_body)
 
 
@@ -53,8 +61,11 @@ def put_request(
     query_params: Optional[Dict[str, str]] = None,
     file: Optional[Dict[str, BinaryIO]] = None,
     cookies: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
 ) -> Response:
-    response_body = requests.put(URL + path, data=data, params=query_params, cookies=cookies, json=body, files=file)
+    response_body = client.request(
+        "PUT", path, data=data, params=query_params, cookies=cookies, json=body, files=file, headers=headers
+    )
     return response_validator(response_body)
 
 
@@ -64,7 +75,7 @@ def delete_request(
     query_params: Optional[Dict[str, str]] = None,
     cookies: Optional[Dict[str, str]] = None,
 ) -> Response:
-    response_body = requests.delete(URL + path, cookies=cookies, json=body, params=query_params)
+    response_body = client.request("DELETE", path, cookies=cookies, json=body, params=query_params)
     return response_validator(response_body)
 
 
@@ -100,28 +111,143 @@ def get_user_info(access_token: str, user_id) -> Dict[str, str]:
     return response.json()
 
 
-def get_user_files(access_token: str) -> List:
-    response = get_request("/file/", cookies={"access_token": access_token})
+def get_users_info(access_token: str, user_ids: List[str]) -> List[Dict[str, str]]:
+    response = get_request("/user/", query_params={"ids": user_ids}, cookies={"access_token": access_token})
     return response.json()
 
 
-def stream_upload_user_file(access_token: str, file_name: str, input_file: BinaryIO) -> Dict[str, str]:
+def get_user_files(access_token: str, filters: Optional[Dict[str, str]] = None) -> List:
+    """
+    Returns the whole file listing, pages which did not change since they were cached are not sent again
+    """
+    files = []
+    query_params = dict(filters or {})
+    while True:
+        cache_key = f"{URL}/file/?{urlencode(sorted(query_params.items()))}"
+        cached = get_cached("listings", cache_key)
+        response = get_request(
+            "/file/",
+            query_params=query_params,
+            cookies={"access_token": access_token},
+            headers={"If-None-Match": cached["etag"]} if cached else None,
+        )
+        if response.status_code == 304:
+            page, cursor = cached["files"], cached["cursor"]
+        else:
+            # The listing is paginated, the server sends the cursor of the next page while there is one
+            page, cursor = response.json(), response.headers.get("x-next-cursor")
+            if response.headers.get("etag"):
+                set_cached("listings", cache_key, {"etag": response.headers["etag"], "files": page, "cursor": cursor})
+
+        files.extend(page)
+        if cursor is None:
+            return files
+        query_params["cursor"] = cursor
+
+
+def stream_upload_user_file(
+    access_token: str, file_name: str, input_file: Union[BinaryIO, bytes], encoding: Optional[str] = None
+) -> Dict[str, str]:
     response = post_request(
-        "/file/stream", data=input_file, query_params={"file_name": file_name}, cookies={"access_token": access_token}
+        "/file/stream",
+        data=input_file,
+        query_params={"file_name": file_name},
+        cookies={"access_token": access_token},
+        headers={"Content-Encoding": encoding} if encoding else None,
     )
     return response.json()
 
 
-def download_user_file(access_token: str, file_id: str) -> dict:
-    response = get_request(f"/file/download/{file_id}", cookies={"access_token": access_token}, stream=True)
+def get_file_name(response: Response) -> str:
     content_disposition = response.headers.get("content-disposition")
     matches = re.findall(RE_ENCODED_FILENAME, content_disposition)
     if len(matches) == 0:
         matches = re.findall(RE_FILENAME, content_disposition)
         if len(matches) == 0:
             raise APIException
-    file_name = unquote(matches[0])
-    return {"file_name": file_name, "content": response.iter_content(chunk_size=1024)}
+    return unquote(matches[0])
+
+
+def create_upload_session(
+    access_token: str, file_name: str, file_id: Optional[str] = None, encoding: Optional[str] = None
+) -> Dict:
+    query_params = {"file_name": file_name}
+    if file_id is not None:
+        query_params["file_id"] = file_id
+    if encoding is not None:
+        query_params["encoding"] = encoding
+    response = post_request("/file/upload/", query_params=query_params, cookies={"access_token": access_token})
+    return response.json()
+
+
+def get_upload_session(access_token: str, session_id: str) -> Dict:
+    response = get_request(f"/file/upload/{session_id}", cookies={"access_token": access_token})
+    return response.json()
+
+
+def upload_session_part(access_token: str, session_id: str, part_number: int, data: bytes) -> Dict:
+    response = put_request(
+        f"/file/upload/{session_id}/{part_number}", data=data, cookies={"access_token": access_token}
+    )
+    return response.json()
+
+
+def commit_upload_session(access_token: str, session_id: str, part_count: int) -> Dict[str, str]:
+    # The server stores the whole file before answering, which takes longer than the read timeout for large files
+    response = post_request(
+        f"/file/upload/{session_id}/commit",
+        query_params={"part_count": part_count},
+        cookies={"access_token": access_token},
+        timeout=(REQUEST_CONNECT_TIMEOUT, None),
+    )
+    return response.json()
+
+
+def download_user_file(access_token: str, file_id: str) -> dict:
+    # The server sends its stored gzip data as is when gzip is accepted, requests decodes it while streaming
+    response = get_request(
+        f"/file/download/{file_id}",
+        cookies={"access_token": access_token},
+        stream=True,
+        headers={"Accept-Encoding": "gzip"},
+    )
+    return {"file_name": get_file_name(response), "content": response.iter_content(chunk_size=65536)}
+
+
+def download_user_file_range(
+    access_token: str,
+    file_id: str,
+    start: int,
+    end: Optional[int] = None,
+    etag: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> dict:
+    headers = {"Range": f"bytes={start}-{'' if end is None else end}"}
+    if etag:
+        headers["If-Range"] = etag
+    if if_none_match:
+        headers["If-None-Match"] = if_none_match
+    response = get_request(
+        f"/file/download/{file_id}", cookies={"access_token": access_token}, stream=True, headers=headers
+    )
+    if response.status_code == 304:
+        return {"not_modified": True, "etag": response.headers.get("etag")}
+
+    partial = response.status_code == 206
+    if partial:
+        size = int(re.findall(RE_CONTENT_RANGE, response.headers.get("content-range"))[0])
+    else:
+        size = response.headers.get("content-length")
+        size = int(size) if size is not None else None
+
+    return {
+        "file_name": get_file_name(response),
+        "content": response.iter_content(chunk_size=65536),
+        "etag": response.headers.get("etag"),
+        "size": size,
+        "partial": partial,
+        "not_modified": False,
+    }
 
 
 def file_access_info(access_token: str, file_id: str) -> Dict:
@@ -136,12 +262,30 @@ def rename_user_file(access_token: str, file_id: str, new_file_name: str) -> Dic
     return response.json()
 
 
-def stream_edit_user_file(access_token: str, file_id: str, file_name: str, input_file: BinaryIO) -> Dict[str, str]:
+def stream_edit_user_file(
+    access_token: str, file_id: str, file_name: str, input_file: Union[BinaryIO, bytes], encoding: Optional[str] = None
+) -> Dict[str, str]:
     response = put_request(
         f"/file/stream/{file_id}",
         data=input_file,
         query_params={"file_name": file_name},
         cookies={"access_token": access_token},
+        headers={"Content-Encoding": encoding} if encoding else None,
+    )
+    return response.json()
+
+
+def get_file_signature(access_token: str, file_id: str) -> Dict:
+    response = get_request(f"/file/signature/{file_id}", cookies={"access_token": access_token})
+    return response.json()
+
+
+def delta_edit_user_file(access_token: str, file_id: str, file_name: str, delta: Iterator[bytes]) -> Dict[str, str]:
+    response = put_request(
+        f"/file/delta/{file_id}",
+        data=delta,
+        query_params={"file_name": file_name},
+        cookies={"access_token": access_token},
     )
     return response.json()
 
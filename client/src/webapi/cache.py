@@ -0,0 +1,59 @@
+import json
+from os import path, makedirs, replace
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from src.config import CACHE_DIR_PATH
+
+CACHE_PATH = CACHE_DIR_PATH or path.join(Path.home(), ".blob-system-cache")
+# Entries kept per section, the least recently stored ones are dropped first
+MAX_ENTRIES = {"listings": 200, "downloads": 10000, "hashes": 100000}
+
+cache_lock = Lock()
+sections: Dict[str, Dict[str, Dict]] = {}
+
+
+def _section_path(section: str) -> str:
+    return path.join(CACHE_PATH, f"{section}.json")
+
+
+def _load_section(section: str) -> Dict[str, Dict]:
+    if section not in sections:
+        try:
+            with open(_section_path(section), "r") as cache_file:
+                entries = json.load(cache_file)
+        except (IOError, json.decoder.JSONDecodeError):
+            entries = dict()
+        sections[section] = entries if type(entries) == dict else dict()
+    return sections[section]
+
+
+def get_cached(section: str, key: str) -> Optional[Dict]:
+    """
+    Returns an entry of the on-disk cache, which is loaded once per process
+    """
+    with cache_lock:
+        return _load_section(section).get(key)
+
+
+def set_cached(section: str, key: str, entry: Dict) -> None:
+    set_cached_entries(section, {key: entry})
+
+
+def set_cached_entries(section: str, new_entries: Dict[str, Dict]) -> None:
+    """
+    Stores several entries of a section with a single write of its file
+    """
+    with cache_lock:
+        entries = _load_section(section)
+        for key, entry in new_entries.items():
+            entries.pop(key, None)
+            entries[key] = entry
+        for old_key in list(entries)[: max(len(entries) - MAX_ENTRIES[section], 0)]:
+            del entries[old_key]
+
+        makedirs(CACHE_PATH, exist_ok=True)
+        with open(_section_path(section) + ".tmp", "w") as cache_file:
+            json.dump(entries, cache_file)
+        replace(_section_path(section) + ".tmp", _section_path(section))
@@ -0,0 +1,117 @@
+from http.cookiejar import DefaultCookiePolicy
+from threading import Lock
+from typing import Dict, Optional
+
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import (
+    URL,
+    REQUEST_CONNECT_TIMEOUT,
+    REQUEST_READ_TIMEOUT,
+    REQUEST_RETRIES,
+    REQUEST_BACKOFF,
+    REQUEST_POOL_SIZE,
+)
+from src.exception import TokenFileNotFound
+from src.models.token import TokenType
+from src.services.token import get_token, set_token
+
+TOKEN_EXPIRED_ERROR_CODE = 4001
+
+
+class APIClient:
+    """
+    Sends every request of the client over one pooled keep-alive session
+
+    Idempotent requests are retried with exponential backoff on connection errors and on 502, 503 and 504
+    responses. Requests failing with an expired access token are sent again once with a refreshed access token.
+    """
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.timeout = (REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT)
+        self.session = requests.Session()
+        # Tokens are passed explicitly with every request, cookies set by responses are not kept in the session
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        retry = Retry(
+            total=REQUEST_RETRIES,
+            backoff_factor=REQUEST_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "DELETE"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=REQUEST_POOL_SIZE, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.refresh_lock = Lock()
+        # Access tokens replaced by a refresh, callers keep passing the token they started with
+        self.refreshed_tokens: Dict[str, str] = {}
+
+    def request(self, method: str, path: str, cookies: Optional[Dict[str, str]] = None, **kwargs) -> Response:
+        access_token = (cookies or {}).get("access_token")
+        if access_token in self.refreshed_tokens:
+            cookies = {**cookies, "access_token": self.refreshed_tokens[access_token]}
+
+        timeout = kwargs.pop("timeout", self.timeout)
+        data = kwargs.get("data")
+        position = data.tell() if hasattr(data, "seek") else None
+        response = self.session.request(method, self.base_url + path, cookies=cookies, timeout=timeout, **kwargs)
+        if access_token is None or not self._token_expired(response):
+            return response
+
+        # Only bodies which can be sent again are retried, streamed bodies and multipart files are already consumed
+        replayable = kwargs.get("files") is None and (
+            data is None or isinstance(data, (bytes, str)) or position is not None
+        )
+        new_access_token = self._refresh_access_token(cookies["access_token"]) if replayable else None
+        if new_access_token is None:
+            return response
+
+        if position is not None:
+            data.seek(position)
+        cookies = {**cookies, "access_token": new_access_token}
+        return self.session.request(method, self.base_url + path, cookies=cookies, timeout=timeout, **kwargs)
+
+    @staticmethod
+    def _token_expired(response: Response) -> bool:
+        if response.status_code != 401:
+            return False
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            return False
+        return type(detail) == dict and detail.get("error_code") == TOKEN_EXPIRED_ERROR_CODE
+
+    def _refresh_access_token(self, access_token: str) -> Optional[str]:
+        """
+        Returns a new access token for an expired one, or None if the refresh token is missing or expired as well
+        """
+        with self.refresh_lock:
+            # Another thread may have refreshed the same token meanwhile
+            if access_token in self.refreshed_tokens:
+                return self.refreshed_tokens[access_token]
+
+            try:
+                refresh_token = get_token(TokenType.refresh_token)
+            except TokenFileNotFound:
+                return None
+
+            response = self.session.get(
+                self.base_url + "/auth/refresh", cookies={"refresh_token": refresh_token}, timeout=self.timeout
+            )
+            if response.status_code != 200 or "access_token" not in response.cookies:
+                return None
+
+            set_token(TokenType.access_token, response.cookies)
+            new_token = response.cookies["access_token"]
+            for expired_token in [token for token, value in self.refreshed_tokens.items() if value == access_token]:
+                self.refreshed_tokens[expired_token] = new_token
+            self.refreshed_tokens[access_token] = new_token
+            return new_token
+
+
+client = APIClient(URL)
@@ -3,7 +3,8 @@ from src.exception import APIException
 
 
 def response_validator(response: Response) -> Response:
-    if response.status_code == 200:
+    # 304 is only sent for conditional requests, whose callers handle it
+    if response.status_code in (200, 206, 304):
         return response
 
     else:
@@ -0,0 +1,61 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2022-02-06 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("latest_time", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_username", "users", ["username"])
+
+    op.create_table(
+        "files",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("file_path", sa.String(), nullable=True),
+        sa.Column("created_at", sa.String(), nullable=True),
+        sa.Column("updated_at", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_files_file_name", "files", ["file_name"])
+    op.create_index("ix_files_file_path", "files", ["file_path"])
+
+    op.create_table(
+        "userfile",
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.Column("access_type", sa.Enum("owner", "read", "edit", name="permissions"), nullable=True),
+        sa.ForeignKeyConstraint(["file_id"], ["files.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "file_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("userfile")
+    op.drop_index("ix_files_file_path", table_name="files")
+    op.drop_index("ix_files_file_name", table_name="files")
+    op.drop_table("files")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_table("users")
+    sa.Enum(name="permissions").drop(op.get_bind())
@@ -0,0 +1,54 @@
+"""chunk store
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2022-02-20 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chunks",
+        sa.Column("hash", sa.String(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column("codec", sa.String(), nullable=True),
+        sa.Column("ref_count", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    op.create_table(
+        "filechunks",
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("chunk_hash", sa.String(), nullable=True),
+        sa.Column("offset", sa.BigInteger(), nullable=True),
+        sa.Column("length", sa.BigInteger(), nullable=True),
+        sa.ForeignKeyConstraint(["chunk_hash"], ["chunks.hash"]),
+        sa.ForeignKeyConstraint(["file_id"], ["files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("file_id", "position"),
+    )
+    op.create_index("ix_filechunks_chunk_hash", "filechunks", ["chunk_hash"])
+
+    op.add_column("files", sa.Column("original_size", sa.BigInteger(), nullable=True))
+    op.add_column("files", sa.Column("codec", sa.String(), nullable=True))
+    op.add_column("files", sa.Column("codec_level", sa.Integer(), nullable=True))
+    op.add_column("files", sa.Column("manifest_hash", sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("files", "manifest_hash")
+    op.drop_column("files", "codec_level")
+    op.drop_column("files", "codec")
+    op.drop_column("files", "original_size")
+    op.drop_index("ix_filechunks_chunk_hash", table_name="filechunks")
+    op.drop_table("filechunks")
+    op.drop_table("chunks")
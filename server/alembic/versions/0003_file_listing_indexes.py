@@ -0,0 +1,45 @@
+"""file listing indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2022-03-06 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ISO_FORMAT = 'YYYY-MM-DD"T"HH24:MI:SS.US'
+
+
+def upgrade():
+    # Timestamps were stored as ISO strings, which can not be compared as dates
+    for column in ("created_at", "updated_at"):
+        op.alter_column("files", column, type_=sa.DateTime(), postgresql_using=f"{column}::timestamp")
+    op.create_index("ix_files_created_at", "files", ["created_at"])
+    op.create_index("ix_files_updated_at", "files", ["updated_at"])
+    op.create_index("ix_files_file_size", "files", ["file_size"])
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_files_file_name_trgm",
+        "files",
+        ["file_name"],
+        postgresql_using="gin",
+        postgresql_ops={"file_name": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("ix_files_file_name_trgm", table_name="files")
+    op.drop_index("ix_files_file_size", table_name="files")
+    op.drop_index("ix_files_updated_at", table_name="files")
+    op.drop_index("ix_files_created_at", table_name="files")
+    for column in ("created_at", "updated_at"):
+        op.alter_column("files", column, type_=sa.String(), postgresql_using=f"to_char({column}, '{ISO_FORMAT}')")
@@ -0,0 +1,44 @@
+"""metadata indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2022-03-13 00:00:00.000000
+
+Indexes are built concurrently so the tables stay writable while they are built, which can not happen inside
+a transaction. A failed concurrent build leaves an invalid index behind, which has to be dropped before running
+the migration again. Duplicate usernames have to be resolved before usernames can be made unique.
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_userfile_file_id",
+            "userfile",
+            ["file_id", "user_id"],
+            postgresql_include=["access_type"],
+            postgresql_concurrently=True,
+        )
+
+        # The unique index replaces the plain username index under the same name
+        op.create_index("ix_users_username_unique", "users", ["username"], unique=True, postgresql_concurrently=True)
+        op.drop_index("ix_users_username", table_name="users", postgresql_concurrently=True)
+        op.execute("ALTER INDEX ix_users_username_unique RENAME TO ix_users_username")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_users_username_plain", "users", ["username"], postgresql_concurrently=True)
+        op.drop_index("ix_users_username", table_name="users", postgresql_concurrently=True)
+        op.execute("ALTER INDEX ix_users_username_plain RENAME TO ix_users_username")
+
+        op.drop_index("ix_userfile_file_id", table_name="userfile", postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""content hash
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2022-03-20 00:00:00.000000
+
+Files stored before the content hash was recorded keep a null hash until their next upload or edit.
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("files", sa.Column("content_hash", sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("files", "content_hash")
@@ -0,0 +1,34 @@
+"""content size index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2022-03-27 00:00:00.000000
+
+Listings are filtered and sorted by the size of the original content, file_size being the stored size. The
+index is built concurrently like the ones of 0004.
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_files_content_size",
+            "files",
+            [sa.text("coalesce(original_size, file_size, 0)")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_files_content_size", table_name="files", postgresql_concurrently=True)
@@ -0,0 +1,36 @@
+"""
+Runs the server microbenchmarks, see benchmarks.core
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# The configuration is read on import. Benchmarks use neither PostgreSQL nor Redis, and only write to a temporary
+# file storage.
+FILE_BASE_PATH = tempfile.mkdtemp(prefix="blob-bench-")
+atexit.register(shutil.rmtree, FILE_BASE_PATH, ignore_errors=True)
+os.environ.update(
+    {"FILE_BASE_PATH": FILE_BASE_PATH, "DATABASE_URL": "sqlite://", "ASYNC_DATABASE_URL": "sqlite+aiosqlite://"}
+)
+for key, value in {
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_DB": "0",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_NAME": "benchmark",
+    "DATABASE_USER": "benchmark",
+    "DATABASE_PASSWORD": "benchmark",
+    "ACCESS_TOKEN_SECRET": "benchmark-access",
+    "REFRESH_TOKEN_SECRET": "benchmark-refresh",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_MINUTES": "600",
+}.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks import bench_jwt, bench_services, bench_storage  # noqa: E402, F401, registers the benchmarks
+from benchmarks.core import main  # noqa: E402
+
+main()
@@ -0,0 +1,35 @@
+"""
+Costs of creating and verifying the tokens sent with every request
+"""
+
+from jose import jwt
+
+from benchmarks.core import Case, benchmark
+from src.config import ACCESS_TOKEN_SECRET
+from src.middleware.auth import decode_access_token
+from src.middleware.jwt import create_access_token, create_refresh_token
+
+PAYLOAD = {"username": "benchmark", "user_id": "3f1c1c9e-8d4b-4a59-9a4c-6b1f0f1f2a10"}
+
+
+@benchmark("jwt.create_access_token")
+def create_access() -> Case:
+    return Case(lambda: create_access_token(PAYLOAD))
+
+
+@benchmark("jwt.create_refresh_token")
+def create_refresh() -> Case:
+    return Case(lambda: create_refresh_token(PAYLOAD))
+
+
+@benchmark("jwt.decode")
+def decode() -> Case:
+    token = create_access_token(PAYLOAD)
+    return Case(lambda: jwt.decode(token, ACCESS_TOKEN_SECRET, algorithms=["HS256"]))
+
+
+@benchmark("jwt.decode_access_token.cached")
+def decode_cached() -> Case:
+    token = create_access_token(PAYLOAD)
+    decode_access_token(token)
+    return Case(lambda: decode_access_token(token))
@@ -0,0 +1,154 @@
+"""
+Query costs of the file services against seeded tables, in an in-memory SQLite database
+
+The number of queries of every run is kept as a counter, so relationships that stop being loaded with their query
+show up as regressions whatever the timings.
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.core import Case, benchmark
+from src.db.database import Base
+from src.db.models import FileModel, Permissions, UserFileModel, UserModel
+from src.schemas.listing import FileListing, SortKey, SortOrder
+from src.services.file import get_file_access_info, get_user_files, get_user_files_page
+from src.services.user import get_users
+
+FILES = 20000
+USERS = 200
+# Users every file of the main user is shared with
+SHARES = 2
+PAGE_SIZE = 100
+MAIN_USER = "user-0"
+
+
+class QueryCounter:
+    def __init__(self, engine) -> None:
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *_) -> None:
+        self.count += 1
+
+    def counters(self, run: Callable[[], object]) -> Callable[[], Dict[str, int]]:
+        def count_queries() -> Dict[str, int]:
+            start = self.count
+            run()
+            return {"queries": self.count - start}
+
+        return count_queries
+
+
+@lru_cache()
+def seeded() -> Tuple[Session, QueryCounter]:
+    """
+    Returns a session on a database where the main user owns FILES files, each shared with SHARES other users
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    start = datetime(2022, 1, 1)
+    db.bulk_insert_mappings(
+        UserModel,
+        [{"id": f"user-{index}", "username": f"user-{index}", "hashed_password": ""} for index in range(USERS)],
+    )
+    db.bulk_insert_mappings(
+        FileModel,
+        [
+            {
+                "id": f"file-{index:06d}",
+                "file_name": f"report-{index * 7919 % FILES:06d}.txt",
+                "file_size": index * 7919 % 1000003,
+                "created_at": start + timedelta(minutes=index),
+                "updated_at": start + timedelta(minutes=index),
+            }
+            for index in range(FILES)
+        ],
+    )
+    db.bulk_insert_mappings(
+        UserFileModel,
+        [
+            {"user_id": MAIN_USER, "file_id": f"file-{index:06d}", "access_type": Permissions.owner}
+            for index in range(FILES)
+        ]
+        + [
+            {
+                "user_id": f"user-{1 + (index + share) % (USERS - 1)}",
+                "file_id": f"file-{index:06d}",
+                "access_type": Permissions.read,
+            }
+            for index in range(FILES)
+            for share in range(SHARES)
+        ],
+    )
+    db.commit()
+    return db, QueryCounter(engine)
+
+
+def _page_case(listing: FileListing, after=None) -> Case:
+    db, counter = seeded()
+
+    def run() -> list:
+        # Objects loaded by the previous run are loaded again, and the file of every entry is read like the
+        # listing route does
+        db.expire_all()
+        page = get_user_files_page(db, MAIN_USER, listing, PAGE_SIZE, after)
+        return [user_file.file.file_name for user_file in page]
+
+    return Case(run, counters=counter.counters(run))
+
+
+@benchmark("services.get_user_files_page.first")
+def first_page() -> Case:
+    return _page_case(FileListing())
+
+
+@benchmark("services.get_user_files_page.name_filter")
+def name_filter_page() -> Case:
+    return _page_case(FileListing(name="12"))
+
+
+@benchmark("services.get_user_files_page.size_desc_deep")
+def deep_page() -> Case:
+    return _page_case(FileListing(sort=SortKey.size, order=SortOrder.desc), after=(500000, "file-010000"))
+
+
+@benchmark("services.get_user_files.all")
+def all_files() -> Case:
+    db, counter = seeded()
+
+    def run() -> list:
+        db.expire_all()
+        return get_user_files(db, MAIN_USER)
+
+    return Case(run, counters=counter.counters(run))
+
+
+@benchmark("services.get_file_access_info")
+def access_info() -> Case:
+    db, counter = seeded()
+
+    def run() -> list:
+        db.expire_all()
+        file = get_file_access_info(db, "file-000042")
+        return [user_file.user.username for user_file in file.users]
+
+    return Case(run, counters=counter.counters(run))
+
+
+@benchmark("services.get_users.100")
+def users_batch() -> Case:
+    db, counter = seeded()
+    user_ids = [f"user-{index}" for index in range(100)]
+
+    def run() -> list:
+        db.expire_all()
+        return get_users(db, user_ids)
+
+    return Case(run, counters=counter.counters(run))
@@ -0,0 +1,94 @@
+"""
+Throughput of the chunking, compression and read paths of uploads and downloads
+"""
+
+import gzip
+import random
+from functools import partial
+from hashlib import sha256
+from os import path
+from types import SimpleNamespace
+
+from benchmarks.core import Case, register
+from src.config import FILE_BASE_PATH
+from src.storage.blob import iter_blob, iter_legacy_blob
+from src.storage.chunk_store import write_chunk
+from src.storage.chunker import Chunker, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+from src.storage.codecs import CODECS
+
+CHUNK_SIZES = {"256k": MIN_CHUNK_SIZE, "1m": 1024 * 1024, "4m": MAX_CHUNK_SIZE}
+FILE_SIZE = 16 * 1024 * 1024
+# Size of the pieces request bodies are streamed in, which the chunker is fed with
+STREAM_READ_SIZE = 64 * 1024
+LEGACY_READ_SIZES = {"4k": 4096, "64k": 64 * 1024, "1m": 1024 * 1024}
+
+
+def text(size: int, seed: int = 0) -> bytes:
+    """
+    Returns text like content, which compresses like typical uploads
+    """
+    rng = random.Random(seed)
+    words = [rng.randbytes(rng.randint(2, 8)).hex() for _ in range(1024)]
+    return " ".join(rng.choices(words, k=size // 8 + 1)).encode()[:size]
+
+
+def compress(codec_name: str, size: int) -> Case:
+    codec, data = CODECS[codec_name], text(size)
+    return Case(lambda: codec.compress(data, codec.default_level), size)
+
+
+def decompress(codec_name: str, size: int) -> Case:
+    codec = CODECS[codec_name]
+    stored = codec.compress(text(size), codec.default_level)
+    return Case(lambda: codec.decompress(stored), size)
+
+
+def chunk() -> Case:
+    data = text(FILE_SIZE)
+
+    def run() -> int:
+        chunker = Chunker()
+        chunks = sum(
+            len(chunker.feed(data[offset : offset + STREAM_READ_SIZE]))
+            for offset in range(0, len(data), STREAM_READ_SIZE)
+        )
+        return chunks + len(chunker.finish())
+
+    return Case(run, FILE_SIZE)
+
+
+def read_blob(codec_name: str) -> Case:
+    """
+    Reads a file from the chunk store the way downloads do
+    """
+    codec, data = CODECS[codec_name], text(FILE_SIZE, seed=1)
+    chunker = Chunker()
+    chunks, offset = [], 0
+    for content in chunker.feed(data) + chunker.finish():
+        chunk_hash = sha256(codec.name.encode() + content).hexdigest()
+        write_chunk(chunk_hash, codec.compress(content, codec.default_level))
+        chunks.append(
+            SimpleNamespace(
+                chunk_hash=chunk_hash, offset=offset, length=len(content), chunk=SimpleNamespace(codec=codec.name)
+            )
+        )
+        offset += len(content)
+    return Case(lambda: sum(len(part) for part in iter_blob(chunks)), FILE_SIZE)
+
+
+def read_legacy_blob(read_size: int) -> Case:
+    file_path = path.join(FILE_BASE_PATH, f"legacy-{read_size}.gz")
+    with gzip.open(file_path, "wb") as legacy_file:
+        legacy_file.write(text(FILE_SIZE, seed=2))
+    return Case(lambda: sum(len(part) for part in iter_legacy_blob(file_path, read_size)), FILE_SIZE)
+
+
+for codec_name in CODECS:
+    # Chunks stored raw are only read and written
+    for label, size in CHUNK_SIZES.items() if codec_name != "none" else ():
+        register(f"storage.compress.{codec_name}.{label}", partial(compress, codec_name, size))
+        register(f"storage.decompress.{codec_name}.{label}", partial(decompress, codec_name, size))
+    register(f"storage.read_blob.{codec_name}", partial(read_blob, codec_name))
+register("storage.chunker.16m", chunk)
+for label, read_size in LEGACY_READ_SIZES.items():
+    register(f"storage.read_legacy_blob.{label}", partial(read_legacy_blob, read_size))
@@ -0,0 +1,157 @@
+"""
+Runs registered microbenchmarks and compares them with a stored baseline
+
+A benchmark is a setup function returning a Case, whose run function is timed with timeit. The best time per run
+over several repeats is compared with the baseline, and runs slower than the baseline by more than the threshold are
+regressions. Counters, like the number of queries a run sends, are compared exactly and may never grow.
+The client benchmarks run with this module as well, against their own baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+THRESHOLD = 0.25
+
+
+class Case(NamedTuple):
+    run: Callable[[], Any]
+    # Bytes processed by a run, reported as throughput
+    size: int = 0
+    # Counts taken from a single run, which must not grow from the baseline
+    counters: Optional[Callable[[], Dict[str, int]]] = None
+
+
+BENCHMARKS: Dict[str, Callable[[], Case]] = {}
+
+
+def register(name: str, setup: Callable[[], Case]) -> None:
+    if name in BENCHMARKS:
+        raise ValueError(f"Benchmark {name} is already registered")
+    BENCHMARKS[name] = setup
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Case]], Callable[[], Case]]:
+    def decorator(setup: Callable[[], Case]) -> Callable[[], Case]:
+        register(name, setup)
+        return setup
+
+    return decorator
+
+
+def measure(case: Case, repeat: int, min_time: float) -> Dict:
+    timer = timeit.Timer(case.run)
+    number, elapsed = timer.autorange()
+    # autorange stops at 0.2 seconds, runs are scaled up to min_time
+    number = max(number, int(number * min_time / elapsed)) if elapsed else number
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+    result = {"seconds": seconds, "runs": number}
+    if case.size:
+        result["mb_per_second"] = case.size / seconds / 1e6
+    if case.counters:
+        result["counters"] = case.counters()
+    return result
+
+
+def machine() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> Dict[str, str]:
+    """
+    Returns the regressions of the results against the baseline, by benchmark name
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"]
+        if ratio > 1 + threshold:
+            regressions[name] = f"{ratio:.2f}x the baseline time"
+        for counter, value in result.get("counters", {}).items():
+            expected = baseline[name].get("counters", {}).get(counter)
+            if expected is not None and value > expected:
+                regressions[name] = f"{counter} grew from {expected} to {value}"
+    return regressions
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def main(baseline_path: Path = BASELINE_PATH) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", default=str(baseline_path), help="Baseline file [default: %(default)s]")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.environ.get("BENCHMARK_THRESHOLD") or THRESHOLD),
+        help="Slowdown over the baseline counted as a regression, 0.25 is 25%% slower [default: %(default)s]",
+    )
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline instead of comparing")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repeats, the best one is kept [default: 5]")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds of a repeat [default: 0.2]")
+    parser.add_argument("--output", help="File the JSON results are written to")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.filter is None or args.filter in name]
+    baseline = {"machine": None, "results": {}}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    if not args.save and baseline["machine"] is not None and baseline["machine"] != machine():
+        print(f"Baseline taken on another machine: {baseline['machine']}", file=sys.stderr)
+
+    results = {}
+    for name in names:
+        results[name] = measure(BENCHMARKS[name](), args.repeat, args.min_time)
+        previous = baseline["results"].get(name)
+        change = f"{results[name]['seconds'] / previous['seconds'] - 1:+.1%}" if previous else "new"
+        throughput = f"{results[name]['mb_per_second']:.1f} MB/s" if "mb_per_second" in results[name] else ""
+        counters = " ".join(f"{key}={value}" for key, value in results[name].get("counters", {}).items())
+        print(f"{name:<48} {_format_seconds(results[name]['seconds']):>10} {throughput:>14} {change:>8} {counters}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"machine": machine(), "results": results}, output_file, indent=2, sort_keys=True)
+    if args.save:
+        # Benchmarks which were not run keep their previous baseline
+        baseline = {"machine": machine(), "results": {**baseline["results"], **results}}
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline["results"], args.threshold)
+    # Slowdowns are measured again before failing, so a single noisy measurement is not a regression
+    for name in regressions:
+        retry = measure(BENCHMARKS[name](), args.repeat, args.min_time)
+        if retry["seconds"] < results[name]["seconds"]:
+            results[name] = retry
+    regressions = compare(results, baseline["results"], args.threshold)
+    for name, reason in regressions.items():
+        print(f"Regression in {name}: {reason}", file=sys.stderr)
+    # Baseline benchmarks which are not registered, like the ones of a codec whose package is not installed, would
+    # otherwise go unchecked
+    missing = [
+        name for name in baseline["results"] if name not in BENCHMARKS and (not args.filter or args.filter in name)
+    ]
+    for name in missing:
+        print(f"Missing benchmark {name}, which is in the baseline but could not run", file=sys.stderr)
+    if regressions or missing:
+        sys.exit(1)
@@ -0,0 +1,114 @@
+"""
+Operations of the virtual users of a load test, each sends one request to the server
+"""
+
+import random
+from itertools import count
+from threading import Lock
+from typing import Callable, Dict, List
+
+import requests
+
+PASSWORD = "load-test-password"
+
+
+class LoadContext:
+    """
+    State shared by the virtual users of a scenario
+    """
+
+    def __init__(self, base_url: str, prefix: str, payload: bytes) -> None:
+        self.base_url = base_url
+        self.prefix = prefix
+        self.payload = payload
+        self.user_ids: List[str] = []
+        self.lock = Lock()
+        self.counter = count()
+
+    def username(self) -> str:
+        with self.lock:
+            return f"{self.prefix}-{next(self.counter)}"
+
+
+class VirtualUser:
+    """
+    A registered user with its own connection pool and cookies, and the files it can download
+    """
+
+    def __init__(self, context: LoadContext) -> None:
+        self.context = context
+        self.session = requests.Session()
+        self.username = context.username()
+        self.file_ids: List[str] = []
+        response = self.post("/auth/register", json={"username": self.username, "password": PASSWORD})
+        self.user_id = response.json()["user_id"]
+        with context.lock:
+            context.user_ids.append(self.user_id)
+
+    def url(self, path: str) -> str:
+        return self.context.base_url + path
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        response = self.session.post(self.url(path), **kwargs)
+        response.raise_for_status()
+        return response
+
+
+def register(user: VirtualUser, rng: random.Random) -> int:
+    username = user.context.username()
+    response = requests.post(user.url("/auth/register"), json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return len(response.content)
+
+
+def login(user: VirtualUser, rng: random.Random) -> int:
+    response = user.post("/auth/login", json={"username": user.username, "password": PASSWORD})
+    return len(response.content)
+
+
+def upload(user: VirtualUser, rng: random.Random) -> int:
+    response = user.post("/file/", files={"input_file": (f"upload-{rng.getrandbits(32)}", user.context.payload)})
+    user.file_ids.append(response.json()["id"])
+    return len(user.context.payload)
+
+
+def stream_upload(user: VirtualUser, rng: random.Random) -> int:
+    response = user.post(
+        "/file/stream", params={"file_name": f"stream-{rng.getrandbits(32)}"}, data=user.context.payload
+    )
+    user.file_ids.append(response.json()["id"])
+    return len(user.context.payload)
+
+
+def download(user: VirtualUser, rng: random.Random) -> int:
+    response = user.session.get(user.url(f"/file/download/{rng.choice(user.file_ids)}"))
+    response.raise_for_status()
+    return len(response.content)
+
+
+def list_files(user: VirtualUser, rng: random.Random) -> int:
+    response = user.session.get(user.url("/file/"))
+    response.raise_for_status()
+    return len(response.content)
+
+
+def share(user: VirtualUser, rng: random.Random) -> int:
+    with user.context.lock:
+        others = [user_id for user_id in user.context.user_ids if user_id != user.user_id]
+    response = user.session.patch(
+        user.url(f"/file/access/{rng.choice(user.file_ids)}"),
+        params={"user_id": rng.choice(others), "access_type": "read"},
+    )
+    response.raise_for_status()
+    return len(response.content)
+
+
+OPERATIONS: Dict[str, Callable[[VirtualUser, random.Random], int]] = {
+    "register": register,
+    "login": login,
+    "upload": upload,
+    "stream_upload": stream_upload,
+    "download": download,
+    "list": list_files,
+    "share": share,
+}
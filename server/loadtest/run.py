@@ -0,0 +1,371 @@
+"""
+Runs load test scenarios against the server started with local stand-ins, and writes their results as JSON
+
+Every scenario starts its own server with an empty database and file storage, registers one virtual user per
+concurrent worker, which uploads a file, and then has the workers send requests picked from the scenario's weighted
+mix of operations for the given duration. Results hold the throughput and latency percentiles of every operation
+and the CPU time and peak memory of the server processes, so runs of different commits can be compared.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Thread
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from loadtest.operations import OPERATIONS, LoadContext, VirtualUser
+
+SERVER_PATH = Path(__file__).resolve().parent.parent
+
+# Operation weights of the built in scenarios
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "mixed": {"register": 1, "login": 2, "upload": 2, "stream_upload": 2, "download": 6, "list": 6, "share": 1},
+    "auth": {"register": 1, "login": 3},
+    "upload": {"upload": 1, "stream_upload": 3},
+    "download": {"download": 4, "list": 1},
+}
+PERCENTILES = (50, 90, 95, 99)
+# Seconds between samples of the server memory
+SAMPLE_INTERVAL = 0.25
+STARTUP_TIMEOUT = 30
+
+
+def _payload(size: int, kind: str, seed: int) -> bytes:
+    rng = random.Random(seed)
+    if kind == "random":
+        return rng.randbytes(size)
+    # Text like content, which compresses and deduplicates like typical uploads
+    words = [rng.randbytes(rng.randint(2, 8)).hex() for _ in range(1024)]
+    text = " ".join(rng.choice(words) for _ in range(size // 8 + 1)).encode()
+    return text[:size]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree(pid: int) -> List[int]:
+    """
+    Returns the pid and the pids of the descendants of a process, like the password hashing workers of the server
+    """
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as stat_file:
+                    parents[int(entry)] = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree = [pid]
+    for current in tree:
+        tree.extend(child for child, parent in parents.items() if parent == current)
+    return tree
+
+
+def _cpu_seconds(pids: List[int]) -> float:
+    ticks = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            # utime and stime, fields 14 and 15 of the stat file
+            ticks += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            continue
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_bytes(pids: List[int]) -> int:
+    rss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss
+
+
+class ResourceMonitor:
+    """
+    Measures the CPU time and samples the memory of a process and its descendants, read from /proc
+    """
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.stopped = Event()
+        self.peak_rss = 0
+        self.thread = Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self.stopped.is_set():
+            self.peak_rss = max(self.peak_rss, _rss_bytes(_process_tree(self.pid)))
+            self.stopped.wait(SAMPLE_INTERVAL)
+
+    def __enter__(self) -> "ResourceMonitor":
+        self.start_cpu = _cpu_seconds(_process_tree(self.pid))
+        self.start_time = time.monotonic()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        # Children which exited are no longer counted, the server keeps its workers alive while it runs
+        self.cpu_seconds = _cpu_seconds(_process_tree(self.pid)) - self.start_cpu
+        self.elapsed = time.monotonic() - self.start_time
+        self.stopped.set()
+        self.thread.join()
+
+    def result(self) -> Dict[str, float]:
+        return {
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "cpu_percent": round(100 * self.cpu_seconds / self.elapsed, 1),
+            "peak_rss_bytes": self.peak_rss,
+        }
+
+
+class Server:
+    """
+    Starts the server with loadtest.serve in a temporary directory holding its files, and its SQLite database
+    unless a database URL is given
+    """
+
+    def __init__(self, database_url: Optional[str], async_database_url: Optional[str], redis: str) -> None:
+        self.directory = tempfile.TemporaryDirectory(prefix="blob-load-")
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        if database_url is None:
+            database_path = Path(self.directory.name) / "load.db"
+            database_url, async_database_url = f"sqlite:///{database_path}", f"sqlite+aiosqlite:///{database_path}"
+        elif async_database_url is None:
+            async_database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+        redis_host, _, redis_port = ("localhost:6379" if redis == "fake" else redis).partition(":")
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "ASYNC_DATABASE_URL": async_database_url,
+            # Required by the configuration, but unused as the URLs above are set
+            "DATABASE_HOST": "localhost",
+            "DATABASE_PORT": "5432",
+            "DATABASE_NAME": "load",
+            "DATABASE_USER": "load",
+            "DATABASE_PASSWORD": "load",
+            "REDIS_HOST": redis_host,
+            "REDIS_PORT": redis_port or "6379",
+            "REDIS_DB": os.environ.get("REDIS_DB") or "0",
+            "ACCESS_TOKEN_SECRET": "load-access",
+            "REFRESH_TOKEN_SECRET": "load-refresh",
+            # Long enough for tokens not to expire during a run
+            "ACCESS_TOKEN_EXPIRE_MINUTES": "600",
+            "REFRESH_TOKEN_EXPIRE_MINUTES": "600",
+            "FILE_BASE_PATH": str(Path(self.directory.name) / "files"),
+        }
+        self.command = [sys.executable, "-m", "loadtest.serve", "--port", str(self.port)]
+        if redis == "fake":
+            self.command.append("--fake-redis")
+
+    def __enter__(self) -> "Server":
+        os.makedirs(self.env["FILE_BASE_PATH"])
+        self.process = subprocess.Popen(self.command, cwd=SERVER_PATH, env=self.env)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {self.process.returncode}")
+            try:
+                requests.get(self.base_url + "/metrics", timeout=1)
+                return self
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("Server did not start in time")
+
+    def __exit__(self, *_) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.directory.cleanup()
+
+
+def _percentile(latencies: List[float], percentile: int) -> float:
+    # Nearest rank, the latencies are sorted
+    index = max(0, -(-percentile * len(latencies) // 100) - 1)
+    return latencies[index]
+
+
+def _summary(samples: List[Tuple[float, bool, int]], elapsed: float) -> Dict:
+    latencies = sorted(latency for latency, ok, _ in samples if ok)
+    summary = {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok, _ in samples if not ok),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "bytes_per_second": round(sum(size for _, ok, size in samples if ok) / elapsed),
+        "latency_ms": {},
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            **{f"p{percentile}": round(_percentile(latencies, percentile) * 1000, 2) for percentile in PERCENTILES},
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        }
+    return summary
+
+
+def _worker(user: VirtualUser, weights: Dict[str, int], seed: int, deadline: float) -> Dict[str, List]:
+    rng = random.Random(seed)
+    names, counts = list(weights), list(weights.values())
+    samples: Dict[str, List] = {name: [] for name in names}
+    errors = []
+    while time.monotonic() < deadline:
+        name = rng.choices(names, counts)[0]
+        start = time.perf_counter()
+        try:
+            size, ok = OPERATIONS[name](user, rng), True
+        except (requests.RequestException, ValueError) as error:
+            size, ok = 0, False
+            errors.append(f"{name}: {error}")
+        samples[name].append((time.perf_counter() - start, ok, size))
+    return {"samples": samples, "errors": errors}
+
+
+def run_scenario(name: str, weights: Dict[str, int], args: argparse.Namespace) -> Dict:
+    payload = _payload(args.payload_size, args.payload, args.seed)
+    with Server(args.database_url, args.async_database_url, args.redis) as server:
+        context = LoadContext(server.base_url, f"load-{name}-{random.Random().getrandbits(32):08x}", payload)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            users = list(executor.map(lambda _: VirtualUser(context), range(args.concurrency)))
+            # Every user has a file to download and share, and someone to share it with
+            for user in users:
+                user.file_ids.append(user.post("/file/stream", params={"file_name": "seed"}, data=payload).json()["id"])
+            if len(users) == 1:
+                VirtualUser(context)
+
+            with ResourceMonitor(server.process.pid) as monitor:
+                start = time.monotonic()
+                deadline = start + args.duration
+                results = list(
+                    executor.map(
+                        lambda index: _worker(users[index], weights, args.seed + index, deadline),
+                        range(args.concurrency),
+                    )
+                )
+                elapsed = time.monotonic() - start
+
+    operations = {
+        operation: _summary([sample for result in results for sample in result["samples"][operation]], elapsed)
+        for operation in weights
+    }
+    errors = [error for result in results for error in result["errors"]]
+    return {
+        "weights": weights,
+        "duration_seconds": round(elapsed, 3),
+        "total": _summary(
+            [sample for result in results for samples in result["samples"].values() for sample in samples], elapsed
+        ),
+        "operations": operations,
+        "server": monitor.result(),
+        # A few errors are kept to tell why requests failed
+        "error_samples": errors[:10],
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=SERVER_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results: Dict) -> None:
+    row = "{:<14} {:<14} {:>9} {:>7} {:>10} {:>10} {:>10} {:>10}"
+    print(row.format("scenario", "operation", "requests", "errors", "rps", "p50 ms", "p95 ms", "p99 ms"))
+    for name, scenario in results["scenarios"].items():
+        for operation, summary in [("total", scenario["total"]), *scenario["operations"].items()]:
+            latency = summary["latency_ms"]
+            print(
+                row.format(
+                    name,
+                    operation,
+                    summary["requests"],
+                    summary["errors"],
+                    summary["throughput_rps"],
+                    latency.get("p50", "-"),
+                    latency.get("p95", "-"),
+                    latency.get("p99", "-"),
+                )
+            )
+        server = scenario["server"]
+        print(f"{name}: server cpu {server['cpu_percent']}%, peak rss {server['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--scenario", action="append", help=f"Scenario to run, may be repeated [default: all of {', '.join(SCENARIOS)}]"
+    )
+    parser.add_argument("--scenario-file", help="JSON file of additional scenarios, as names mapped to weights")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent virtual users [default: 8]")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds every scenario runs [default: 30]")
+    parser.add_argument("--payload-size", type=int, default=1024 * 1024, help="Bytes per upload [default: 1 MiB]")
+    parser.add_argument("--payload", choices=("text", "random"), default="text", help="Uploaded content")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the payload and operation choices")
+    parser.add_argument("--database-url", help="Throwaway database to use instead of a temporary SQLite file")
+    parser.add_argument("--async-database-url", help="Async URL of the database, derived for PostgreSQL URLs")
+    parser.add_argument("--redis", default="fake", help="host:port of a local Redis, or fake for fakeredis")
+    parser.add_argument("--output", help="File the JSON results are written to [default: stdout only]")
+    args = parser.parse_args()
+
+    scenarios = dict(SCENARIOS)
+    if args.scenario_file:
+        with open(args.scenario_file) as scenario_file:
+            scenarios.update(json.load(scenario_file))
+    names = args.scenario or list(scenarios)
+    for name in names:
+        if name not in scenarios:
+            parser.error(f"Unknown scenario {name}")
+        unknown = set(scenarios[name]) - set(OPERATIONS)
+        if unknown:
+            parser.error(f"Unknown operations in {name}: {', '.join(sorted(unknown))}")
+
+    results = {
+        "commit": _commit(),
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "database_url", "async_database_url")
+        },
+        "database": "sqlite" if args.database_url is None else args.database_url.split(":", 1)[0],
+        "scenarios": {},
+    }
+    for name in names:
+        print(f"Running {name} for {args.duration}s with {args.concurrency} users", file=sys.stderr)
+        results["scenarios"][name] = run_scenario(name, scenarios[name], args)
+
+    _print_results(results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
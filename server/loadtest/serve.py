@@ -0,0 +1,50 @@
+"""
+Runs the server for a load test, with the stand-ins chosen by loadtest.run
+
+The database and file storage are configured through the environment set by loadtest.run, this only creates the
+tables and replaces Redis with fakeredis when asked to.
+"""
+
+import argparse
+
+import uvicorn
+from redis import ConnectionPool
+from sqlalchemy import event
+
+
+def _sqlite_pragmas(dbapi_connection, _) -> None:
+    # Both engines write to the same file, WAL and a busy timeout let them wait on each other instead of failing.
+    # SQLite leaves foreign keys unchecked by default, the cascades and restrictions PostgreSQL applies need them.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--fake-redis", action="store_true", help="Use an in-process fakeredis server")
+    args = parser.parse_args()
+
+    from src.cache import cache_client
+    from src.db.database import Base, engine, async_engine
+    from src.db import models  # noqa: F401, registers the tables
+
+    if args.fake_redis:
+        import fakeredis
+
+        cache_client.pool = ConnectionPool(connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer())
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+    Base.metadata.create_all(engine)
+
+    from src.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
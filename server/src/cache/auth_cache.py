@@ -0,0 +1,58 @@
+from typing import Optional
+
+from redis import Redis
+
+from src.cache.lru_cache import LRUCache
+from src.config import AUTH_CACHE_SIZE, AUTH_CACHE_LOCAL_TTL_SECONDS, AUTH_CACHE_TTL_SECONDS
+from src.schemas.token import PayloadSchema
+from src.schemas.user import UserSchema
+
+# Decoded access tokens are only kept in process, checking a token signature is cheaper than a Redis round trip
+token_cache = LRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+# User records are kept in process for a short time, and in Redis where invalidations are seen by every worker
+user_cache = LRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_LOCAL_TTL_SECONDS)
+
+
+def _user_key(user_id: str) -> str:
+    return f"auth_user:{user_id}"
+
+
+def get_cached_token(access_token: str) -> Optional[PayloadSchema]:
+    return token_cache.get(access_token)
+
+
+def cache_token(access_token: str, payload: PayloadSchema, expires_in: float) -> None:
+    token_cache.set(access_token, payload, expires_in)
+
+
+def get_local_user(user_id: str) -> Optional[UserSchema]:
+    return user_cache.get(user_id)
+
+
+def get_redis_user(key_store: Redis, user_id: str) -> Optional[UserSchema]:
+    cached = key_store.get(_user_key(user_id))
+    if cached is None:
+        return None
+    user = UserSchema.parse_raw(cached)
+    user_cache.set(user_id, user)
+    return user
+
+
+def get_cached_user(key_store: Redis, user_id: str) -> Optional[UserSchema]:
+    return get_local_user(user_id) or get_redis_user(key_store, user_id)
+
+
+def cache_user(key_store: Redis, user: UserSchema) -> UserSchema:
+    user = UserSchema.from_orm(user)
+    user_cache.set(user.id, user)
+    key_store.set(_user_key(user.id), user.json(), ex=AUTH_CACHE_TTL_SECONDS)
+    return user
+
+
+def invalidate_user(key_store: Redis, user_id: str) -> None:
+    """
+    Drops a user record from the caches, workers other than the current one may keep serving their in-process
+    copy for up to AUTH_CACHE_LOCAL_TTL_SECONDS
+    """
+    user_cache.delete(user_id)
+    key_store.delete(_user_key(user_id))
@@ -1,8 +1,24 @@
+from time import perf_counter
+
 from redis import Redis, ConnectionPool
 from src.config import REDIS_HOST, REDIS_PORT, REDIS_DB
+from src.middleware.metrics import REDIS_LATENCY
 
 pool = ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
 
 
+class TimedRedis(Redis):
+    """
+    Records the latency of every command it sends
+    """
+
+    def execute_command(self, *args, **options):
+        start = perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(perf_counter() - start)
+
+
 def get_connection() -> Redis:
-    return Redis(connection_pool=pool)
+    return TimedRedis(connection_pool=pool)
@@ -0,0 +1,37 @@
+from typing import Iterable
+from uuid import uuid4
+
+from redis import Redis
+
+from src.config import LISTING_VERSION_TTL_SECONDS
+
+
+def _listing_key(user_id: str) -> str:
+    return f"listing_version:{user_id}"
+
+
+def get_listing_version(key_store: Redis, user_id: str) -> str:
+    """
+    Returns the current version of the file listing of a user, which changes whenever the listing may have changed
+
+    Versions are random rather than counted, so a version created again after its key expired never matches an
+    ETag handed out for an older one. The version has to be read before the listing, so a listing read while it
+    changes is tagged with the version that is replaced by the change.
+    """
+    key = _listing_key(user_id)
+    version = key_store.get(key)
+    if version is None:
+        new_version = uuid4().hex
+        if key_store.set(key, new_version, nx=True, ex=LISTING_VERSION_TTL_SECONDS):
+            return new_version
+        version = key_store.get(key) or new_version.encode("utf-8")
+    return version.decode("utf-8")
+
+
+def invalidate_listings(key_store: Redis, user_ids: Iterable[str]) -> None:
+    """
+    Moves the listings of users to a new version, called once the change to their files is committed
+    """
+    keys = [_listing_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        key_store.delete(*keys)
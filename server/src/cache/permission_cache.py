@@ -0,0 +1,118 @@
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+from redis import Redis, WatchError
+
+from src.cache.lru_cache import LRUCache
+from src.config import PERMISSION_CACHE_SIZE, PERMISSION_CACHE_TTL_SECONDS, PERMISSION_CACHE_LOCAL_TTL_SECONDS
+
+# Cached for users without access to a file, so repeated lookups of foreign files are cached as well
+NO_ACCESS = ""
+
+# Entries are the version of a file's permissions and the access types of every looked up user of the file, so a
+# file is invalidated as a whole
+permission_cache = LRUCache(PERMISSION_CACHE_SIZE, PERMISSION_CACHE_LOCAL_TTL_SECONDS)
+# Versions files were moved to by invalidations in this worker, which lookups at an older version can not cache over
+invalidated_versions = LRUCache(PERMISSION_CACHE_SIZE, PERMISSION_CACHE_LOCAL_TTL_SECONDS)
+
+
+def _file_key(file_id: str) -> str:
+    return f"file_access:{file_id}"
+
+
+def _version_key(file_id: str) -> str:
+    return f"file_access_version:{file_id}"
+
+
+def get_local_access(user_id: str, file_id: str) -> Optional[str]:
+    entry: Optional[Tuple[str, Dict[str, str]]] = permission_cache.get(file_id)
+    if entry is None:
+        return None
+    return entry[1].get(user_id)
+
+
+def _set_local_access(user_id: str, file_id: str, access_type: str, version: str) -> None:
+    invalidated_version = invalidated_versions.get(file_id)
+    if invalidated_version is not None and invalidated_version != version:
+        return
+    entry = permission_cache.get(file_id)
+    if entry is None:
+        entry = (version, dict())
+        permission_cache.set(file_id, entry)
+    # An entry of another version is either newer, or the one this lookup started from was invalidated since
+    if entry[0] == version:
+        entry[1][user_id] = access_type
+
+
+def get_redis_access(key_store: Redis, user_id: str, file_id: str) -> Tuple[Optional[str], str]:
+    """
+    Returns the access type of a user to a file cached in Redis, or None when not cached, along with the version of
+    the file's permissions it was read at
+
+    Versions are random like the listing versions, and are created on the first lookup of a file. The version has
+    to be read before the permissions are read from the database, so cache_access can tell if they changed since.
+    """
+    pipeline = key_store.pipeline()
+    pipeline.hget(_file_key(file_id), user_id)
+    pipeline.get(_version_key(file_id))
+    access_type, version = pipeline.execute()
+    if version is None:
+        new_version = uuid4().hex
+        if key_store.set(_version_key(file_id), new_version, nx=True, ex=PERMISSION_CACHE_TTL_SECONDS):
+            return None, new_version
+        # Permissions cached without a version can not be trusted
+        return None, (key_store.get(_version_key(file_id)) or new_version.encode("utf-8")).decode("utf-8")
+
+    version = version.decode("utf-8")
+    if access_type is None:
+        return None, version
+    access_type = access_type.decode("utf-8")
+    _set_local_access(user_id, file_id, access_type, version)
+    return access_type, version
+
+
+def get_cached_access(key_store: Redis, user_id: str, file_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the cached access type of a user to a file, NO_ACCESS if the user has none, or None when not cached,
+    along with the version to cache it at, which is None when served from the worker's own cache
+    """
+    access_type = get_local_access(user_id, file_id)
+    if access_type is not None:
+        return access_type, None
+    return get_redis_access(key_store, user_id, file_id)
+
+
+def cache_access(key_store: Redis, user_id: str, file_id: str, access_type: str, version: str) -> None:
+    """
+    Caches an access type read from the database after version was read, unless the file's permissions were
+    invalidated since, which would cache the access from before the change
+    """
+    with key_store.pipeline() as pipeline:
+        try:
+            pipeline.watch(_version_key(file_id))
+            current_version = pipeline.get(_version_key(file_id))
+            if current_version is None or current_version.decode("utf-8") != version:
+                return
+            pipeline.multi()
+            pipeline.hset(_file_key(file_id), user_id, access_type)
+            pipeline.expire(_file_key(file_id), PERMISSION_CACHE_TTL_SECONDS)
+            pipeline.expire(_version_key(file_id), PERMISSION_CACHE_TTL_SECONDS)
+            pipeline.execute()
+        except WatchError:
+            return
+    _set_local_access(user_id, file_id, access_type, version)
+
+
+def invalidate_file_access(key_store: Redis, file_id: str) -> None:
+    """
+    Drops the cached access of every user to a file and moves its permissions to a new version, so lookups which
+    started before can not cache what they read. Workers other than the current one may keep using their
+    in-process copy for up to PERMISSION_CACHE_LOCAL_TTL_SECONDS
+    """
+    version = uuid4().hex
+    invalidated_versions.set(file_id, version)
+    permission_cache.delete(file_id)
+    pipeline = key_store.pipeline()
+    pipeline.delete(_file_key(file_id))
+    pipeline.set(_version_key(file_id), version, ex=PERMISSION_CACHE_TTL_SECONDS)
+    pipeline.execute()
@@ -1,4 +1,4 @@
-from os import environ
+from os import environ, cpu_count
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +14,9 @@ DATABASE_PORT = int(environ.get("DATABASE_PORT"))
 DATABASE_NAME = environ.get("DATABASE_NAME")
 DATABASE_USER = environ.get("DATABASE_USER")
 DATABASE_PASSWORD = environ.get("DATABASE_PASSWORD")
+# Full URLs of the sync and async engines, which replace the PostgreSQL settings above when set
+DATABASE_URL = environ.get("DATABASE_URL")
+ASYNC_DATABASE_URL = environ.get("ASYNC_DATABASE_URL")
 
 # Secret Tokens
 ACCESS_TOKEN_SECRET = environ.get("ACCESS_TOKEN_SECRET")
@@ -23,5 +26,41 @@ REFRESH_TOKEN_SECRET = environ.get("REFRESH_TOKEN_SECRET")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(environ.get("ACCESS_TOKEN_EXPIRE_MINUTES"))
 REFRESH_TOKEN_EXPIRE_MINUTES = int(environ.get("REFRESH_TOKEN_EXPIRE_MINUTES"))
 
+# Password Hashing
+PASSWORD_HASH_WORKERS = int(environ.get("PASSWORD_HASH_WORKERS") or 2)
+PASSWORD_HASH_QUEUE_SIZE = int(environ.get("PASSWORD_HASH_QUEUE_SIZE") or 32)
+
+# Authentication Cache
+AUTH_CACHE_SIZE = int(environ.get("AUTH_CACHE_SIZE") or 10000)
+AUTH_CACHE_TTL_SECONDS = int(environ.get("AUTH_CACHE_TTL_SECONDS") or 300)
+AUTH_CACHE_LOCAL_TTL_SECONDS = int(environ.get("AUTH_CACHE_LOCAL_TTL_SECONDS") or 5)
+
+# Permission Cache
+PERMISSION_CACHE_SIZE = int(environ.get("PERMISSION_CACHE_SIZE") or 10000)
+PERMISSION_CACHE_TTL_SECONDS = int(environ.get("PERMISSION_CACHE_TTL_SECONDS") or 300)
+PERMISSION_CACHE_LOCAL_TTL_SECONDS = int(environ.get("PERMISSION_CACHE_LOCAL_TTL_SECONDS") or 5)
+
+# File Listing Versions
+LISTING_VERSION_TTL_SECONDS = int(environ.get("LISTING_VERSION_TTL_SECONDS") or 86400)
+
 # File Storage
 FILE_BASE_PATH = environ.get("FILE_BASE_PATH")
+
+# Compression
+COMPRESSION_CODEC = environ.get("COMPRESSION_CODEC") or "gzip"
+COMPRESSION_LEVEL = int(environ.get("COMPRESSION_LEVEL") or 6)
+COMPRESSION_WORKERS = int(environ.get("COMPRESSION_WORKERS") or cpu_count())
+
+# Upload Sessions
+UPLOAD_SESSION_EXPIRE_MINUTES = int(environ.get("UPLOAD_SESSION_EXPIRE_MINUTES") or 1440)
+UPLOAD_MAX_PARTS = int(environ.get("UPLOAD_MAX_PARTS") or 10000)
+
+# Upload Writers
+UPLOAD_WRITER_THREADS = int(environ.get("UPLOAD_WRITER_THREADS") or 8)
+UPLOAD_QUEUE_SIZE = int(environ.get("UPLOAD_QUEUE_SIZE") or 32)
+
+# Request Profiling
+PROFILE_SECRET = environ.get("PROFILE_SECRET")
+PROFILE_SAMPLE_RATE = float(environ.get("PROFILE_SAMPLE_RATE") or 0)
+PROFILE_INTERVAL_MS = float(environ.get("PROFILE_INTERVAL_MS") or 5)
+PROFILE_KEEP = int(environ.get("PROFILE_KEEP") or 200)
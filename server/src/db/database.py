@@ -1,14 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from src.config import DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT, DATABASE_NAME
+from src.config import (
+    DATABASE_USER,
+    DATABASE_PASSWORD,
+    DATABASE_HOST,
+    DATABASE_PORT,
+    DATABASE_NAME,
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+)
 
 SQLALCHEMY_DATABASE_URL = (
-    f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+    DATABASE_URL or f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+)
+# SQLite connections are used in turn by the threads of the threadpool and of the writer pool
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {},
 )
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the async routes, so waiting on the database never blocks the event loop
+SQLALCHEMY_ASYNC_DATABASE_URL = ASYNC_DATABASE_URL or (
+    f"postgresql+asyncpg://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+)
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+# Objects stay readable after commit, as attributes can not be lazily refreshed outside of an awaited call
+AsyncSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession
+)
+
 Base = declarative_base()
 
 
@@ -18,3 +41,8 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
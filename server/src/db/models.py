@@ -1,6 +1,7 @@
 import uuid
 
-from sqlalchemy import Column, BigInteger, ForeignKey, String, Enum
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, Index, Integer, String, Enum, func
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 import enum
 
@@ -22,16 +23,22 @@ class UserFileModel(Base):
     access_type = Column(Enum(Permissions))
     file = relationship("FileModel", back_populates="users")
     user = relationship("UserModel", back_populates="files")
+    username = association_proxy("user", "username")
+
+    __table_args__ = (
+        # The primary key only serves lookups by user, this one serves lookups of the users of a file
+        Index("ix_userfile_file_id", "file_id", "user_id", postgresql_include=["access_type"]),
+    )
 
 
 class UserModel(Base):
     __tablename__ = "users"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    username = Column(String, index=True)
+    username = Column(String, index=True, unique=True)
     hashed_password = Column(String)
     latest_time = Column(String, default=lambda: datetime.utcnow().isoformat())
-    files = relationship("UserFileModel", back_populates="user")
+    files = relationship("UserFileModel", back_populates="user", passive_deletes=True)
 
 
 class FileModel(Base):
@@ -39,8 +46,50 @@ class FileModel(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     file_name = Column(String, index=True)
-    file_size = Column(BigInteger)
+    file_size = Column(BigInteger, index=True)
     file_path = Column(String, index=True)
-    users = relationship("UserFileModel", back_populates="file")
-    created_at = Column(String, default=lambda: datetime.utcnow().isoformat())
-    updated_at = Column(String, default=lambda: datetime.utcnow().isoformat())
+    original_size = Column(BigInteger)
+    codec = Column(String)
+    codec_level = Column(Integer)
+    manifest_hash = Column(String)
+    # SHA-256 of the original content
+    content_hash = Column(String)
+    users = relationship("UserFileModel", back_populates="file", passive_deletes=True)
+    chunks = relationship(
+        "FileChunkModel", back_populates="file", order_by="FileChunkModel.position", passive_deletes=True
+    )
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Substring and prefix searches on file names
+        Index(
+            "ix_files_file_name_trgm",
+            "file_name",
+            postgresql_using="gin",
+            postgresql_ops={"file_name": "gin_trgm_ops"},
+        ),
+        # Size filters and sorting of listings, by the size of the original content
+        Index("ix_files_content_size", func.coalesce(original_size, file_size, 0)),
+    )
+
+
+class ChunkModel(Base):
+    __tablename__ = "chunks"
+
+    hash = Column(String, primary_key=True)
+    size = Column(BigInteger)
+    codec = Column(String, default="gzip")
+    ref_count = Column(BigInteger, default=0)
+
+
+class FileChunkModel(Base):
+    __tablename__ = "filechunks"
+
+    file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    chunk_hash = Column(String, ForeignKey("chunks.hash"), index=True)
+    offset = Column(BigInteger)
+    length = Column(BigInteger)
+    file = relationship("FileModel", back_populates="chunks")
+    chunk = relationship("ChunkModel")
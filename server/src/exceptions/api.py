@@ -67,3 +67,25 @@ class ForbiddenException(APIException):
         super(ForbiddenException, self).__init__(
             status_code=status.HTTP_403_FORBIDDEN, detail={"error_code": 4005, "error_info": detail}
         )
+
+
+class RangeNotSatisfiableException(APIException):
+    """Exception for a download range outside of the file"""
+
+    def __init__(self, size: int, detail: Optional[str] = "Requested range not satisfiable"):
+        super(RangeNotSatisfiableException, self).__init__(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail={"error_code": 4006, "error_info": detail},
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+
+class ServiceUnavailableException(APIException):
+    """Exception for requests shed while the server is overloaded"""
+
+    def __init__(self, detail: Optional[str] = "Service busy, retry later", retry_after: int = 1):
+        super(ServiceUnavailableException, self).__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error_code": 4007, "error_info": detail},
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.routers import file, auth, user
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.profiling import ProfilingMiddleware
+from src.routers import file, auth, user, upload, metrics, profile
 
 app = FastAPI()
 
 app.add_middleware(CORSMiddleware, allow_origins="*", allow_methods="*")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(file.router, prefix="/file", tags=["file"])
+app.include_router(upload.router, prefix="/file/upload", tags=["file"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(user.router, prefix="/user", tags=["user"])
+app.include_router(metrics.router)
+app.include_router(profile.router, prefix="/profile", tags=["profile"])
@@ -1,20 +1,31 @@
 from typing import Optional
 from datetime import datetime
+from time import time
 
 from fastapi import Depends
 from fastapi.params import Cookie
+from starlette.concurrency import run_in_threadpool
 from jose import jwt, JWTError
 from redis import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from src.cache.auth_cache import (
+    get_cached_token,
+    cache_token,
+    get_local_user,
+    get_redis_user,
+    get_cached_user,
+    cache_user,
+)
 from src.cache.cache_client import get_connection
 from src.config import REFRESH_TOKEN_SECRET, ACCESS_TOKEN_SECRET
-from src.db.database import get_db
+from src.db.database import get_db, get_async_db
 from src.exceptions.api import InvalidCredentialsException, TokenExpiredException
 from src.schemas.token import PayloadSchema
 from src.schemas.user import UserSchema
 from src.services.token import check_refresh_token
-from src.services.user import get_user
+from src.services.user import get_user, get_user_async
 
 
 def verify_refresh_token(
@@ -41,10 +52,14 @@ def verify_refresh_token(
     return user
 
 
-def verify_access_token(db: Session = Depends(get_db), access_token: Optional[str] = Cookie(None)) -> UserSchema:
+def decode_access_token(access_token: Optional[str]) -> PayloadSchema:
     if access_token is None:
         raise TokenExpiredException
 
+    token_data = get_cached_token(access_token)
+    if token_data is not None:
+        return token_data
+
     try:
         payload = jwt.decode(access_token, ACCESS_TOKEN_SECRET, algorithms=["HS256"])
         user_name: str = payload.get("username")
@@ -54,7 +69,44 @@ def verify_access_token(db: Session = Depends(get_db), access_token: Optional[st
         token_data = PayloadSchema(username=user_name, user_id=user_id)
     except JWTError:
         raise TokenExpiredException
+
+    # Cached tokens must still expire on time
+    cache_token(access_token, token_data, payload["exp"] - time() if "exp" in payload else 0)
+    return token_data
+
+
+def verify_access_token(
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    access_token: Optional[str] = Cookie(None),
+) -> UserSchema:
+    token_data = decode_access_token(access_token)
+    user = get_cached_user(key_store, token_data.user_id)
+    if user is not None:
+        return user
+
     user = get_user(db, user_id=token_data.user_id)
     if user is None:
         raise InvalidCredentialsException
-    return user
+    return cache_user(key_store, user)
+
+
+async def verify_access_token_async(
+    db: AsyncSession = Depends(get_async_db),
+    key_store: Redis = Depends(get_connection),
+    access_token: Optional[str] = Cookie(None),
+) -> UserSchema:
+    token_data = decode_access_token(access_token)
+    user = get_local_user(token_data.user_id)
+    if user is not None:
+        return user
+
+    # The Redis client is blocking, so it is only used from the threadpool here
+    user = await run_in_threadpool(get_redis_user, key_store, token_data.user_id)
+    if user is not None:
+        return user
+
+    user = await get_user_async(db, user_id=token_data.user_id)
+    if user is None:
+        raise InvalidCredentialsException
+    return await run_in_threadpool(cache_user, key_store, user)
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import Header
+
+from src.config import COMPRESSION_CODEC, COMPRESSION_LEVEL
+from src.exceptions.api import InvalidRequestException
+from src.storage.codecs import CODECS, Compression
+from src.storage.encoding import CONTENT_ENCODINGS
+
+if COMPRESSION_CODEC not in CODECS:
+    raise RuntimeError(f"Compression codec {COMPRESSION_CODEC} is not available")
+
+
+def compression_options(codec: Optional[str] = None, level: Optional[int] = None) -> Compression:
+    if codec is None:
+        codec = COMPRESSION_CODEC
+    if codec not in CODECS:
+        raise InvalidRequestException(detail=f"Unsupported codec, available codecs: {', '.join(CODECS)}")
+
+    selected_codec = CODECS[codec]
+    if level is None:
+        level = COMPRESSION_LEVEL if codec == COMPRESSION_CODEC else selected_codec.default_level
+    if selected_codec.levels and level not in selected_codec.levels:
+        raise InvalidRequestException(detail=f"Invalid compression level for {codec}")
+    if not selected_codec.levels:
+        level = None
+
+    return Compression(selected_codec, level)
+
+
+def content_encoding_option(content_encoding: Optional[str] = Header(None)) -> Optional[str]:
+    """
+    Returns the content coding an upload is sent with, None when it is sent as is
+    """
+    if content_encoding is None or content_encoding.strip().lower() == "identity":
+        return None
+    content_encoding = content_encoding.strip().lower()
+    if content_encoding not in CONTENT_ENCODINGS:
+        raise InvalidRequestException(
+            detail=f"Unsupported content encoding, available encodings: {', '.join(CONTENT_ENCODINGS)}"
+        )
+    return content_encoding
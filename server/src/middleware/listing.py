@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+
+from fastapi import Query
+
+from src.db.models import Permissions, UserFileModel
+from src.exceptions.api import InvalidRequestException
+from src.schemas.listing import FileListing, SortKey, SortOrder
+from src.utils.cursor_utils import encode_cursor, decode_cursor
+
+
+def _to_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """
+    Timestamps are stored as naive UTC, so aware query values are converted to it
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def listing_options(
+    access_type: Optional[Permissions] = None,
+    name: Optional[str] = Query(None, min_length=1, description="Part of the file name"),
+    name_prefix: Optional[str] = Query(None, min_length=1, description="Start of the file name"),
+    min_size: Optional[int] = Query(None, ge=0),
+    max_size: Optional[int] = Query(None, ge=0),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    sort: SortKey = SortKey.name,
+    order: SortOrder = SortOrder.asc,
+) -> FileListing:
+    if min_size is not None and max_size is not None and min_size > max_size:
+        raise InvalidRequestException(detail="min_size is larger than max_size")
+
+    return FileListing(
+        access_type,
+        name,
+        name_prefix,
+        min_size,
+        max_size,
+        _to_utc(created_after),
+        _to_utc(created_before),
+        _to_utc(updated_after),
+        _to_utc(updated_before),
+        sort,
+        order,
+    )
+
+
+def _sort_value(user_file: UserFileModel, sort: SortKey) -> Any:
+    if sort == SortKey.name:
+        return user_file.file.file_name
+    if sort == SortKey.size:
+        # Matches the CONTENT_SIZE the listing is sorted by
+        file = user_file.file
+        return file.original_size if file.original_size is not None else file.file_size or 0
+    return getattr(user_file.file, sort.value).isoformat()
+
+
+def listing_cursor(user_file: UserFileModel, listing: FileListing) -> str:
+    """
+    Returns the cursor of the page following user_file, which only continues a listing in the same order
+    """
+    return encode_cursor([listing.sort, listing.order, _sort_value(user_file, listing.sort), user_file.file_id])
+
+
+def parse_listing_cursor(cursor: str, listing: FileListing) -> Tuple[Any, str]:
+    """
+    Returns the (sort value, file id) a cursor continues after, raising InvalidRequestException for invalid cursors
+    """
+    try:
+        sort, order, value, file_id = decode_cursor(cursor, 4)
+        if sort != listing.sort or order != listing.order:
+            raise ValueError("Cursor of a different order")
+        if listing.sort in (SortKey.created_at, SortKey.updated_at):
+            value = datetime.fromisoformat(value)
+        elif listing.sort == SortKey.size and type(value) != int:
+            raise ValueError("Invalid size")
+        return value, file_id
+    except (ValueError, TypeError):
+        raise InvalidRequestException(detail="Invalid cursor")
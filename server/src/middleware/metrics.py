@@ -0,0 +1,120 @@
+from time import perf_counter
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.pool import QueuePool
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.db.database import engine, async_engine
+
+# Uploads and downloads of large files take minutes, so latencies are bucketed up to 5 minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATIO_BUCKETS = (1, 1.1, 1.25, 1.5, 2, 3, 5, 10, 20)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is sent, by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled, by route", ["method", "route"])
+REQUEST_BYTES = Counter("http_request_body_bytes", "Bytes received in request bodies, by route", ["route"])
+RESPONSE_BYTES = Counter("http_response_body_bytes", "Bytes sent in response bodies, by route", ["route"])
+
+UPLOAD_COMPRESSION_RATIO = Histogram(
+    "upload_compression_ratio", "Original size over stored size of uploaded content", ["codec"], buckets=RATIO_BUCKETS
+)
+UPLOAD_COMPRESSION_TIME = Histogram(
+    "upload_compression_seconds",
+    "Time spent compressing the chunks of an upload, summed over the compression threads",
+    ["codec"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Time until a Redis command is answered",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+# Requests matching no route are counted together, so unknown paths do not each create a label
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def observe_upload(codec: str, size: int, stored_size: int, compression_time: float) -> None:
+    if size and stored_size:
+        UPLOAD_COMPRESSION_RATIO.labels(codec).observe(size / stored_size)
+    UPLOAD_COMPRESSION_TIME.labels(codec).observe(compression_time)
+
+
+class DatabasePoolCollector:
+    """
+    Reports the connections of the database pools when metrics are collected
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        size = GaugeMetricFamily("db_pool_size", "Connections the pool keeps open", labels=["engine"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections used by sessions", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections opened over the pool size", labels=["engine"])
+        for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+            # Only queue pools have a size, which is the default for both engines
+            if isinstance(pool, QueuePool):
+                size.add_metric([name], pool.size())
+                checked_out.add_metric([name], pool.checkedout())
+                # Negative while connections of the pool itself are still unopened
+                overflow.add_metric([name], max(pool.overflow(), 0))
+        yield from (size, checked_out, overflow)
+
+
+REGISTRY.register(DatabasePoolCollector())
+
+
+def route_name(scope: Scope) -> str:
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, the body sizes and the number of requests in progress of every HTTP request, labelled
+    with the path of its route rather than the requested path
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], route_name(scope)
+        status = 500
+        start = perf_counter()
+
+        async def receive_counted() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                REQUEST_BYTES.labels(route).inc(len(message.get("body", b"")))
+            return message
+
+        async def send_counted(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                RESPONSE_BYTES.labels(route).inc(len(message.get("body", b"")))
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method, route).inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method, route).dec()
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(perf_counter() - start)
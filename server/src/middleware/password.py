@@ -0,0 +1,31 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from src.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+from src.exceptions.api import ServiceUnavailableException
+
+# bcrypt holds a core for each hash, running it in separate processes keeps login bursts away from file requests.
+# The server runs threads, which a forked worker could inherit mid lock, so workers are spawned instead.
+hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+pending_hashes = 0
+
+
+async def hash_password(password: str, salt: bytes) -> str:
+    """
+    Hashes a password in the hash pool, rejecting the request once too many hashes are already waiting
+    """
+    global pending_hashes
+    if pending_hashes >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE:
+        raise ServiceUnavailableException(detail="Too many login requests, retry later")
+
+    pending_hashes += 1
+    try:
+        hashed_password = await asyncio.get_running_loop().run_in_executor(
+            hash_pool, bcrypt.hashpw, password.encode("utf-8"), salt
+        )
+    finally:
+        pending_hashes -= 1
+    return hashed_password.decode("utf-8")
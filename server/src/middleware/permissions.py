@@ -0,0 +1,71 @@
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends
+from redis import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.cache.cache_client import get_connection
+from src.cache.permission_cache import (
+    NO_ACCESS,
+    get_local_access,
+    get_cached_access,
+    get_redis_access,
+    cache_access,
+    invalidate_file_access,
+)
+from src.db.database import get_db
+from src.db.models import Permissions
+from src.services.file import get_user_file, get_user_file_async
+
+
+class FilePermissions:
+    """
+    Access checks of a request, going through the permission cache and remembered until the request ends
+
+    Used as a dependency, so every route and dependency of a request shares the same instance.
+    """
+
+    def __init__(self, db: Session = Depends(get_db), key_store: Redis = Depends(get_connection)) -> None:
+        self.db = db
+        self.key_store = key_store
+        self.memo: Dict[Tuple[str, str], Optional[Permissions]] = {}
+
+    def access_type(self, user_id: str, file_id: str) -> Optional[Permissions]:
+        """
+        Returns the access type of a user to a file, or None if the user has no access
+        """
+        key = (user_id, file_id)
+        if key not in self.memo:
+            access_type, version = get_cached_access(self.key_store, user_id, file_id)
+            if access_type is None:
+                user_file = get_user_file(self.db, user_id, file_id)
+                access_type = NO_ACCESS if user_file is None else user_file.access_type.value
+                cache_access(self.key_store, user_id, file_id, access_type, version)
+            self.memo[key] = Permissions(access_type) if access_type else None
+        return self.memo[key]
+
+    async def access_type_async(self, db: AsyncSession, user_id: str, file_id: str) -> Optional[Permissions]:
+        """
+        Same as access_type for async routes, the blocking Redis client is only used from the threadpool
+        """
+        key = (user_id, file_id)
+        if key not in self.memo:
+            access_type = get_local_access(user_id, file_id)
+            if access_type is None:
+                access_type, version = await run_in_threadpool(get_redis_access, self.key_store, user_id, file_id)
+                if access_type is None:
+                    user_file = await get_user_file_async(db, user_id, file_id)
+                    access_type = NO_ACCESS if user_file is None else user_file.access_type.value
+                    await run_in_threadpool(cache_access, self.key_store, user_id, file_id, access_type, version)
+            self.memo[key] = Permissions(access_type) if access_type else None
+        return self.memo[key]
+
+    def invalidate(self, file_id: str) -> None:
+        """
+        Forgets the access of every user to a file, called after its permissions changed or it was deleted
+        """
+        for key in [key for key in self.memo if key[1] == file_id]:
+            del self.memo[key]
+        invalidate_file_access(self.key_store, file_id)
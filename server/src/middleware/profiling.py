@@ -0,0 +1,166 @@
+import hmac
+import logging
+import random
+import sys
+from collections import Counter
+from datetime import datetime
+from hashlib import sha256
+from os import getcwd, path
+from threading import Event, Thread, enumerate as enumerate_threads, get_ident
+from time import perf_counter, time
+from typing import Optional
+from uuid import uuid4
+
+from fastapi import Header
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import PROFILE_SECRET, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS
+from src.exceptions.api import ForbiddenException
+from src.middleware.metrics import route_name
+from src.storage.profiles import save_profile
+
+logger = logging.getLogger()
+
+PROFILE_HEADER = "x-profile"
+# The profile endpoints are read with the same header, and are never profiled themselves
+PROFILE_ROUTES_PREFIX = "/profile"
+# Innermost frames of threads waiting for work, which are left out of the profiles
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("thread.py", "_worker")}
+
+
+def sign_profile_token(expires_in: int) -> str:
+    """
+    Returns a token valid for expires_in seconds, which gets requests sent with it profiled and allows reading the
+    stored profiles
+    """
+    expires_at = str(int(time()) + expires_in)
+    signature = hmac.new(PROFILE_SECRET.encode(), expires_at.encode(), sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+
+def verify_profile_token(token: Optional[str]) -> bool:
+    if not PROFILE_SECRET or not token:
+        return False
+    expires_at, _, signature = token.partition(".")
+    expected = hmac.new(PROFILE_SECRET.encode(), expires_at.encode(), sha256).hexdigest()
+    return hmac.compare_digest(signature, expected) and expires_at.isdigit() and int(expires_at) > time()
+
+
+def profile_access(x_profile: Optional[str] = Header(None)) -> None:
+    if not verify_profile_token(x_profile):
+        raise ForbiddenException(detail="Invalid profile token")
+
+
+def _frame_name(frame) -> str:
+    file_name = frame.f_code.co_filename
+    if "site-packages" + path.sep in file_name:
+        file_name = file_name.rsplit("site-packages" + path.sep, 1)[1]
+    elif file_name.startswith(getcwd()):
+        file_name = path.relpath(file_name)
+    return f"{frame.f_code.co_name} ({file_name}:{frame.f_code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of all the threads of the process at a fixed interval
+
+    The work of a request is spread over the event loop, the threadpool and the compression and writer pools, so
+    every thread is sampled, and the stacks of concurrent requests show up as well. Threads waiting for work are left
+    out. Stacks are kept in the collapsed format read by flamegraph tools, rooted at the thread name.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = Event()
+        self.thread = Thread(target=self._sample, name="profiler", daemon=True)
+
+    def _sample(self) -> None:
+        own_id = get_ident()
+        while not self.stopped.wait(self.interval):
+            self.samples += 1
+            names = {thread.ident: thread.name for thread in enumerate_threads()}
+            for thread_id, frame in sys._current_frames().items():
+                if (
+                    thread_id == own_id
+                    or (path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+                ):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests sent with a valid profile token in the X-Profile header, and a PROFILE_SAMPLE_RATE fraction
+    of all requests, and stores their profiles
+
+    The id of the profile is sent back in the X-Profile-Id header, profiles are read from the profile routes.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(PROFILE_ROUTES_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        token = headers.get(PROFILE_HEADER.encode())
+        if token is not None and verify_profile_token(token.decode("latin-1")):
+            trigger = "header"
+        elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            trigger = "sample"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid4().hex
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            with StackSampler(PROFILE_INTERVAL_MS / 1000) as sampler:
+                await self.app(scope, receive, send_with_id)
+        finally:
+            info = {
+                "id": profile_id,
+                "request_id": headers.get(b"x-request-id", profile_id.encode()).decode("latin-1"),
+                "method": scope["method"],
+                "route": route_name(scope),
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((perf_counter() - start) * 1000, 3),
+                "samples": sampler.samples,
+                "trigger": trigger,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            try:
+                await run_in_threadpool(save_profile, info, sampler.collapsed())
+            except OSError:
+                logger.exception("Profile could not be stored")
@@ -3,18 +3,22 @@ import logging
 
 from fastapi import APIRouter, Depends, Response, Cookie
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from redis import Redis
-import bcrypt
+from starlette.concurrency import run_in_threadpool
 
+from src.cache.auth_cache import invalidate_user
 from src.cache.cache_client import get_connection
-from src.db.database import get_db
+from src.db.database import get_db, get_async_db
 from src.exceptions.api import InvalidCredentialsException, ForbiddenException
 from src.middleware.auth import verify_refresh_token
 from src.middleware.jwt import create_access_token, create_refresh_token
+from src.middleware.password import hash_password
 from src.schemas.user import UserCreateSchema, UserSchema
 from src.services.token import remove_refresh_token, set_refresh_token
-from src.services.user import get_user_by_username, create_user, logout_all_users
+from src.services.user import get_user_by_username_async, create_user_async, logout_all_users
 
 router = APIRouter(default_response_class=JSONResponse)
 logger = logging.getLogger()
@@ -23,15 +27,15 @@ SALT = b"$2b$12$4ct/tWTnhf4oXmfA/4Fun."
 
 
 @router.post("/login")
-def login(
+async def login(
     response: Response,
     form_data: UserCreateSchema,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     key_store: Redis = Depends(get_connection),
 ):
 
-    hashed_password = bcrypt.hashpw(form_data.password.encode("utf-8"), SALT).decode("utf-8")
-    user = get_user_by_username(db, form_data.username, hashed_password)
+    hashed_password = await hash_password(form_data.password, SALT)
+    user = await get_user_by_username_async(db, form_data.username, hashed_password)
 
     if not user:
         logging.error("Invalid Login")
@@ -39,7 +43,7 @@ def login(
     access_token = create_access_token(data={"username": user.username, "user_id": user.id})
     refresh_token = create_refresh_token(data={"username": user.username, "user_id": user.id})
 
-    set_refresh_token(key_store, user.id, refresh_token)
+    await run_in_threadpool(set_refresh_token, key_store, user.id, refresh_token)
 
     response.set_cookie(key="access_token", value=access_token)
     response.set_cookie(key="refresh_token", value=refresh_token)
@@ -48,23 +52,28 @@ def login(
 
 
 @router.post("/register")
-def register(
+async def register(
     response: Response,
     form_data: UserCreateSchema,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     key_store: Redis = Depends(get_connection),
 ):
-    hashed_password = bcrypt.hashpw(form_data.password.encode("utf-8"), SALT).decode("utf-8")
-    user = get_user_by_username(db, form_data.username, hashed_password)
+    hashed_password = await hash_password(form_data.password, SALT)
+    user = await get_user_by_username_async(db, form_data.username, hashed_password)
 
     if user:
         logging.error("User already exists")
         raise ForbiddenException("User already exists")
-    user = create_user(db, form_data)
+    try:
+        user = await create_user_async(db, form_data)
+    except IntegrityError:
+        # Registered concurrently with the same username
+        logging.error("User already exists")
+        raise ForbiddenException("User already exists")
     access_token = create_access_token(data={"username": user.username, "user_id": user.id})
     refresh_token = create_refresh_token(data={"username": user.username, "user_id": user.id})
 
-    set_refresh_token(key_store, user.id, refresh_token)
+    await run_in_threadpool(set_refresh_token, key_store, user.id, refresh_token)
     response.set_cookie(key="access_token", value=access_token)
     response.set_cookie(key="refresh_token", value=refresh_token)
     return {"user_id": user.id}
@@ -88,5 +97,11 @@ def logout(
 
 
 @router.get("/logout_all")
-def logout_all(user: UserSchema = Depends(verify_refresh_token), db: Session = Depends(get_db)):
-    return logout_all_users(db, user.id)
+def logout_all(
+    user: UserSchema = Depends(verify_refresh_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+):
+    user = logout_all_users(db, user.id)
+    invalidate_user(key_store, user.id)
+    return user
@@ -1,157 +1,268 @@
-import gzip
 import logging
 from datetime import datetime
-from os import path, remove
+from hashlib import sha256
+from os import path
 import shutil
-from typing import List
+from typing import List, Optional
 from urllib import parse
 
-from fastapi import APIRouter, UploadFile, Depends
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, UploadFile, Depends, Header, Query, Response, status
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis import Redis
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.responses import StreamingResponse
 
-from src.db.database import get_db
-from src.middleware.auth import verify_access_token
-from src.schemas.file import FileSchema, FileAccessSchema
+from src.cache.cache_client import get_connection
+from src.cache.listing_cache import get_listing_version, invalidate_listings
+from src.db.database import get_db, get_async_db
+from src.middleware.auth import verify_access_token, verify_access_token_async
+from src.middleware.compression import compression_options, content_encoding_option
+from src.middleware.listing import listing_options, listing_cursor, parse_listing_cursor
+from src.middleware.permissions import FilePermissions
+from src.schemas.file import FileSchema, FileAccessSchema, UserFileEntrySchema
+from src.schemas.listing import FileListing
+from src.schemas.signature import FileSignatureSchema, ChunkSignatureSchema
 from src.schemas.user import UserSchema
-from src.schemas.userfile import UserFileInfoSchema, UserFileSchema
+from src.schemas.userfile import UserFileSchema
 from src.services.file import (
     create_user_file,
     edit_user_file,
-    get_user_file,
     change_file_access,
     add_file_access,
     remove_file_access,
     delete_user_file,
-    get_user_files,
+    get_user_files_page,
     get_file_info,
+    get_file_access_info,
+    get_file_user_ids,
+    create_user_file_async,
+    get_file_user_ids_async,
 )
-from src.config import FILE_BASE_PATH
 from src.db.models import Permissions
+from src.services.chunk import get_file_chunks
 from src.services.user import get_user
-from src.exceptions.api import NotFoundException, UnauthorizedException, ForbiddenException
+from src.exceptions.api import (
+    NotFoundException,
+    UnauthorizedException,
+    ForbiddenException,
+    RangeNotSatisfiableException,
+    InvalidRequestException,
+)
+from src.storage.blob import (
+    BlobWriter,
+    ChunkNotFoundError,
+    iter_blob,
+    iter_stored_blob,
+    stored_blob_size,
+    iter_legacy_blob,
+    iter_stored_legacy_blob,
+    remove_legacy_blob,
+)
+from src.storage.chunker import MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+from src.storage.codecs import Compression
+from src.storage.delta import DeltaWriter, InvalidDeltaError
+from src.storage.encoding import InvalidEncodingError
+from src.storage.pipeline import BackgroundWriter, run_in_writer_pool
+from src.utils.encoding_utils import accepts_encoding
+from src.utils.range_utils import parse_range, http_date, if_range_matches, etag_matches
 
 router = APIRouter(default_response_class=JSONResponse, dependencies=[Depends(get_db)])
 logger = logging.getLogger()
 
+MAX_PAGE_SIZE = 1000
+
 
 @router.post("/", response_model=FileSchema)
-def upload_file(input_file: UploadFile, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
+def upload_file(
+    input_file: UploadFile,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+):
     file = create_user_file(db, user.id, input_file.filename)
 
-    shutil.copyfileobj(input_file.file, gzip.open(FILE_BASE_PATH + file.id, "wb"))
+    with BlobWriter(db, file.id, compression, new_file=True) as writer:
+        shutil.copyfileobj(input_file.file, writer)
+        file = writer.close()
+    invalidate_listings(key_store, [user.id])
 
-    file = edit_user_file(
-        db, file.id, file_size=path.getsize(FILE_BASE_PATH + file.id), file_path=FILE_BASE_PATH + file.id
-    )
     logger.info("New file uploaded")
     return file
 
 
 @router.post("/stream", response_model=FileSchema)
 async def stream_upload_file(
-    file_name: str, request: Request, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)
+    file_name: str,
+    request: Request,
+    user: UserSchema = Depends(verify_access_token_async),
+    async_db: AsyncSession = Depends(get_async_db),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+    content_encoding: Optional[str] = Depends(content_encoding_option),
 ):
+    file = await create_user_file_async(async_db, user.id, file_name)
 
-    file = create_user_file(db, user.id, file_name)
-
-    compressed_file = gzip.open(FILE_BASE_PATH + file.id, "wb")
-
-    async for chunk in request.stream():
-        compressed_file.write(chunk)
+    try:
+        async with BlobWriter(db, file.id, compression, content_encoding, new_file=True) as writer:
+            async with BackgroundWriter(writer.write) as background_writer:
+                async for chunk in request.stream():
+                    await background_writer.write(chunk)
+            file = await run_in_writer_pool(writer.close)
+    except InvalidEncodingError:
+        logger.error("User uploaded invalid encoded content")
+        raise InvalidRequestException(detail=f"Invalid {content_encoding} content")
+    await run_in_threadpool(invalidate_listings, key_store, [user.id])
 
-    file = edit_user_file(
-        db, file.id, file_size=path.getsize(FILE_BASE_PATH + file.id), file_path=FILE_BASE_PATH + file.id
-    )
     logger.info("New file uploaded(streamed)")
     return file
 
 
-@router.get("/", response_model=List[UserFileInfoSchema])
-def get_files(user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
-    return get_user_files(db, user.id)
-
-
 @router.get("/download/{file_id}", response_class=FileResponse)
-def download_file(file_id: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+def download_file(
+    file_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    permissions: FilePermissions = Depends(),
+):
+    if permissions.access_type(user.id, file_id) is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="Requested file not found")
 
-    encoded = parse.quote(user_file.file.file_name)
-    if encoded == user_file.file.file_name:
-        content_disposition = {"Content-Disposition": f'attachment; filename="{encoded}"'}
+    file = get_file_info(db, file_id)
+    if file is None:
+        # Access cached by another worker may outlive the file for a few seconds
+        logger.error("User requested a deleted file")
+        raise NotFoundException(detail="Requested file not found")
+    encoded = parse.quote(file.file_name)
+    if encoded == file.file_name:
+        headers = {"Content-Disposition": f'attachment; filename="{encoded}"'}
     else:
-        content_disposition = {"Content-Disposition": f"attachment; filename*=utf-8''{encoded}"}
-
-    def iter_file():
-        file_like = gzip.open(FILE_BASE_PATH + file_id, mode="rb")
-        while True:
-            chunk = file_like.read(size=4096)
-            if not chunk:
-                break
-            yield chunk
-
-    try:
-        return StreamingResponse(iter_file(), headers=content_disposition)
-    except IOError:
-        logger.error("File exists in database but missing in storage")
-        raise NotFoundException(detail="File not found")
+        headers = {"Content-Disposition": f"attachment; filename*=utf-8''{encoded}"}
+    headers["Vary"] = "Accept-Encoding"
+    gzip_accepted = accepts_encoding(accept_encoding, "gzip")
+
+    if file.file_path:
+        # Single gzip files can only be read from the start
+        headers["Accept-Ranges"] = "none"
+        if gzip_accepted:
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(path.getsize(file.file_path))
+            return StreamingResponse(iter_stored_legacy_blob(file.file_path), headers=headers)
+        return StreamingResponse(iter_legacy_blob(file.file_path), headers=headers)
+
+    size = file.original_size or 0
+    etag = f'"{file.manifest_hash}"'
+    last_modified = http_date(file.updated_at)
+    headers.update({"Accept-Ranges": "bytes", "ETag": etag, "Last-Modified": last_modified})
+    # The gzip encoded form of the content is tagged separately, and matches the same content
+    if etag_matches(if_none_match, etag, f'"{file.manifest_hash}-gzip"'):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    # Ranges of empty files can never be satisfied, so they are answered with the whole (empty) file
+    if size > 0 and range_header is not None and (if_range is None or if_range_matches(if_range, etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            logger.error("User requested a range outside of the file")
+            raise RangeNotSatisfiableException(size)
+
+    if byte_range is None:
+        chunks = get_file_chunks(db, file_id)
+        if gzip_accepted and chunks and all(file_chunk.chunk.codec == "gzip" for file_chunk in chunks):
+            # The stored gzip chunks are sent without decompressing them, the client decodes them instead
+            headers["Content-Encoding"] = "gzip"
+            headers["ETag"] = f'"{file.manifest_hash}-gzip"'
+            headers["Content-Length"] = str(stored_blob_size(chunks))
+            return StreamingResponse(iter_stored_blob(chunks), headers=headers)
+
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_blob(chunks), headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_blob(get_file_chunks(db, file_id, start, end), start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        headers=headers,
+    )
 
 
 @router.get("/access/{file_id}", response_model=FileAccessSchema)
-def file_access_info(file_id: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+def file_access_info(
+    file_id: str,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    permissions: FilePermissions = Depends(),
+):
+    if permissions.access_type(user.id, file_id) is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="Requested file not found")
 
-    file = get_file_info(db, file_id)
+    file = get_file_access_info(db, file_id)
+    if file is None:
+        logger.error("User requested a deleted file")
+        raise NotFoundException(detail="Requested file not found")
     return file
 
 
 @router.patch("/{file_id}", response_model=FileSchema)
 def rename_file(
-    file_id: str, file_name: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)
+    file_id: str,
+    file_name: str,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    permissions: FilePermissions = Depends(),
 ):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+    user_access = permissions.access_type(user.id, file_id)
+    if user_access is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="Requested file not found")
 
-    if user_file.access_type == Permissions.read:
+    if user_access == Permissions.read:
         logger.error("User requested to rename file with read permission")
         raise UnauthorizedException(detail="No rename permissions")
 
-    return edit_user_file(db, user_file.file_id, file_name=file_name, updated_at=datetime.utcnow().isoformat())
+    file = edit_user_file(db, file_id, file_name=file_name, updated_at=datetime.utcnow())
+    invalidate_listings(key_store, get_file_user_ids(db, file_id))
+    return file
 
 
 @router.put("/{file_id}", response_model=FileSchema)
 def edit_file(
-    file_id: str, input_file: UploadFile, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)
+    file_id: str,
+    input_file: UploadFile,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+    permissions: FilePermissions = Depends(),
 ):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+    user_access = permissions.access_type(user.id, file_id)
+    if user_access is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="Requested file not found")
 
-    if user_file.access_type == Permissions.read:
+    if user_access == Permissions.read:
         logger.error("User requested to edit file without edit permission")
         raise UnauthorizedException(detail="No edit permissions")
 
-    shutil.copyfileobj(input_file.file, gzip.open(FILE_BASE_PATH + file_id, "wb"))
+    with BlobWriter(db, file_id, compression) as writer:
+        shutil.copyfileobj(input_file.file, writer)
+        file = writer.close(file_name=input_file.filename, updated_at=datetime.utcnow())
+    invalidate_listings(key_store, get_file_user_ids(db, file_id))
 
-    file = edit_user_file(
-        db,
-        file_id,
-        file_name=input_file.filename,
-        file_size=path.getsize(FILE_BASE_PATH + file_id),
-        file_path=FILE_BASE_PATH + file_id,
-        updated_at=datetime.utcnow().isoformat(),
-    )
     logger.info("Existing file edited")
     return file
 
@@ -161,38 +272,150 @@ async def stream_edit_file(
     file_id: str,
     file_name: str,
     request: Request,
-    user: UserSchema = Depends(verify_access_token),
+    user: UserSchema = Depends(verify_access_token_async),
+    async_db: AsyncSession = Depends(get_async_db),
     db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+    content_encoding: Optional[str] = Depends(content_encoding_option),
+    permissions: FilePermissions = Depends(),
 ):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+    user_access = await permissions.access_type_async(async_db, user.id, file_id)
+    if user_access is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="Requested file not found")
 
-    if user_file.access_type == Permissions.read:
+    if user_access == Permissions.read:
         logger.error("User requested to edit file without edit permission")
         raise UnauthorizedException(detail="No edit permissions")
 
-    compressed_file = gzip.open(FILE_BASE_PATH + file_id, "wb")
+    try:
+        async with BlobWriter(db, file_id, compression, content_encoding) as writer:
+            async with BackgroundWriter(writer.write) as background_writer:
+                async for chunk in request.stream():
+                    await background_writer.write(chunk)
+            file = await run_in_writer_pool(writer.close, file_name=file_name, updated_at=datetime.utcnow())
+    except InvalidEncodingError:
+        logger.error("User uploaded invalid encoded content")
+        raise InvalidRequestException(detail=f"Invalid {content_encoding} content")
+    await run_in_threadpool(invalidate_listings, key_store, await get_file_user_ids_async(async_db, file_id))
+
+    logger.info("Existing file edited(streamed)")
+    return file
 
-    async for chunk in request.stream():
-        compressed_file.write(chunk)
 
-    file = edit_user_file(
-        db,
-        file_id,
-        file_name=file_name,
-        file_size=path.getsize(FILE_BASE_PATH + file_id),
-        file_path=FILE_BASE_PATH + file_id,
-        updated_at=datetime.utcnow().isoformat(),
+@router.get("/signature/{file_id}", response_model=FileSignatureSchema)
+def file_signature(
+    file_id: str,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    permissions: FilePermissions = Depends(),
+):
+    """
+    Returns the chunks of the current version of a file, which a delta edit can copy instead of sending them again
+    """
+    if permissions.access_type(user.id, file_id) is None:
+        logger.error("User requested invalid file")
+        raise NotFoundException(detail="Requested file not found")
+
+    file = get_file_info(db, file_id)
+    if file is None:
+        logger.error("User requested a deleted file")
+        raise NotFoundException(detail="Requested file not found")
+    # Files stored as a single gzip file have no chunks to copy
+    chunks = [] if file.file_path else get_file_chunks(db, file_id)
+    return FileSignatureSchema(
+        file_id=file_id,
+        manifest_hash=file.manifest_hash,
+        size=file.original_size or 0,
+        min_chunk_size=MIN_CHUNK_SIZE,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        chunks=[
+            ChunkSignatureSchema(hash=file_chunk.chunk_hash, offset=file_chunk.offset, length=file_chunk.length)
+            for file_chunk in chunks
+        ],
     )
-    logger.info("Existing file edited(streamed)")
+
+
+@router.put("/delta/{file_id}", response_model=FileSchema)
+async def delta_edit_file(
+    file_id: str,
+    file_name: str,
+    request: Request,
+    user: UserSchema = Depends(verify_access_token_async),
+    async_db: AsyncSession = Depends(get_async_db),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+    permissions: FilePermissions = Depends(),
+):
+    """
+    Replaces the content of a file with the result of a delta against its current version, see storage.delta
+    """
+    user_access = await permissions.access_type_async(async_db, user.id, file_id)
+    if user_access is None:
+        logger.error("User requested invalid file")
+        raise NotFoundException(detail="Requested file not found")
+
+    if user_access == Permissions.read:
+        logger.error("User requested to edit file without edit permission")
+        raise UnauthorizedException(detail="No edit permissions")
+
+    base_chunks = {
+        file_chunk.chunk_hash: (file_chunk.length, file_chunk.chunk.codec)
+        for file_chunk in await run_in_writer_pool(get_file_chunks, db, file_id)
+    }
+    try:
+        async with BlobWriter(db, file_id, compression) as writer:
+            delta = DeltaWriter(writer, base_chunks)
+            async with BackgroundWriter(delta.write) as background_writer:
+                async for chunk in request.stream():
+                    await background_writer.write(chunk)
+            await run_in_writer_pool(delta.finish)
+            file = await run_in_writer_pool(writer.close, file_name=file_name, updated_at=datetime.utcnow())
+    except (InvalidDeltaError, ChunkNotFoundError) as error:
+        logger.error("User sent an invalid delta")
+        raise InvalidRequestException(detail=f"Invalid delta: {error}")
+    await run_in_threadpool(invalidate_listings, key_store, await get_file_user_ids_async(async_db, file_id))
+
+    logger.info("Existing file edited(delta)")
     return file
 
 
-@router.get("/", response_model=List[UserFileInfoSchema])
-def get_files(user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
-    return get_user_files(db, user.id)
+@router.get("/", response_model=List[UserFileEntrySchema])
+def get_files(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    listing: FileListing = Depends(listing_options),
+    if_none_match: Optional[str] = Header(None),
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+):
+    """
+    Lists the files of the user matching the filters a page at a time, the cursor of the next page is sent in the
+    X-Next-Cursor header
+
+    Pages are tagged with the listing version of the user and the query, and answered with 304 Not Modified when
+    the tag sent in If-None-Match is still current.
+    """
+    after = None if cursor is None else parse_listing_cursor(cursor, listing)
+
+    version = get_listing_version(key_store, user.id)
+    etag = '"' + sha256(f"{user.id}|{version}|{request.url.query}".encode("utf-8")).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # One extra row tells whether there is a next page
+    user_files = get_user_files_page(db, user.id, listing, limit + 1, after)
+    if len(user_files) > limit:
+        user_files = user_files[:limit]
+        headers["X-Next-Cursor"] = listing_cursor(user_files[-1], listing)
+
+    content = [UserFileEntrySchema.from_orm(user_file).dict() for user_file in user_files]
+    return ORJSONResponse(content, headers=headers)
 
 
 @router.patch("/access/{file_id}", response_model=UserFileSchema)
@@ -202,17 +425,19 @@ def change_access(
     access_type: Permissions,
     user: UserSchema = Depends(verify_access_token),
     db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    permissions: FilePermissions = Depends(),
 ):
     if user_id == user.id:
         logger.error("User trying to change their own permission")
         raise ForbiddenException(detail="Trying to change your own permission")
 
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+    user_access = permissions.access_type(user.id, file_id)
+    if user_access is None:
         logger.error("User requested file not found")
         raise NotFoundException(detail="File not found")
 
-    if user_file.access_type != Permissions.owner:
+    if user_access != Permissions.owner:
         logger.error("User requested to change file access without owner permission")
         raise UnauthorizedException(detail="Only owners can change file permission")
 
@@ -221,31 +446,38 @@ def change_access(
         logger.error("User requested access user not found")
         raise NotFoundException(detail="Access user not found")
 
+    has_access = permissions.access_type(user_id, file_id) is not None
     if access_type == Permissions.owner:
         change_file_access(db, user.id, file_id, Permissions.edit)
 
-    access_file = get_user_file(db, user_id, file_id)
-
-    if access_file is None:
-        return add_file_access(db, user_id, file_id, access_type)
-
-    return change_file_access(db, user_id, file_id, access_type)
+    if has_access:
+        user_file = change_file_access(db, user_id, file_id, access_type)
+    else:
+        user_file = add_file_access(db, user_id, file_id, access_type)
+    permissions.invalidate(file_id)
+    invalidate_listings(key_store, [user.id, user_id] if access_type == Permissions.owner else [user_id])
+    return user_file
 
 
 @router.delete("/access/{file_id}", response_model=UserFileSchema)
 def remove_access(
-    user_id: str, file_id: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)
+    user_id: str,
+    file_id: str,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    permissions: FilePermissions = Depends(),
 ):
     if user_id == user.id:
         logger.error("User trying to remove their own permission")
         raise ForbiddenException(detail="Trying to remove your own permission")
 
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+    user_access = permissions.access_type(user.id, file_id)
+    if user_access is None:
         logger.error("User requested file not found")
         raise NotFoundException(detail="File not found")
 
-    if user_file.access_type != Permissions.owner:
+    if user_access != Permissions.owner:
         logger.error("User requested to remove file access without owner permission")
         raise UnauthorizedException(detail="Owner permission required")
 
@@ -254,32 +486,42 @@ def remove_access(
         logger.error("User requested access user not found")
         raise NotFoundException(detail="User not found")
 
-    access_file = get_user_file(db, user_id, file_id)
-
-    if not access_file:
+    if permissions.access_type(user_id, file_id) is None:
         logger.error("User requested access user already doesn't have permission")
         raise NotFoundException(detail="Requested user already doesn't have permission")
-    return remove_file_access(db, user_id, file_id)
+
+    user_file = remove_file_access(db, user_id, file_id)
+    permissions.invalidate(file_id)
+    invalidate_listings(key_store, [user_id])
+    return user_file
 
 
 @router.delete("/{file_id}", response_model=FileSchema)
-def delete_file(file_id: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file is None:
+def delete_file(
+    file_id: str,
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    permissions: FilePermissions = Depends(),
+):
+    user_access = permissions.access_type(user.id, file_id)
+    if user_access is None:
         logger.error("User requested invalid file")
         raise NotFoundException(detail="File not found")
 
-    user_file = get_user_file(db, user.id, file_id)
-    if user_file.access_type != Permissions.owner:
+    if user_access != Permissions.owner:
         logger.error("User requested to delete file access without owner permission")
         raise UnauthorizedException(detail="Owner permission required")
 
-    deleted_file = delete_user_file(db, user_file.file_id)
-    try:
-        remove(deleted_file.file_path)
-    except IOError:
-        logger.error("File exists in database but missing in storage")
+    user_ids = get_file_user_ids(db, file_id)
+    deleted_file = delete_user_file(db, file_id)
+    permissions.invalidate(file_id)
+    invalidate_listings(key_store, user_ids)
+    if deleted_file is None:
+        logger.error("User requested to delete a deleted file")
         raise NotFoundException(detail="File not found")
+    if deleted_file.file_path:
+        remove_legacy_blob(deleted_file.file_path)
 
     logger.info("User deleted a file from storage")
     return deleted_file
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Exposes the metrics of this process in the Prometheus text format
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,35 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.exceptions.api import NotFoundException
+from src.middleware.profiling import profile_access
+from src.schemas.profile import ProfileSchema
+from src.storage.profiles import list_profiles, profile_stacks_path
+
+router = APIRouter(default_response_class=JSONResponse, dependencies=[Depends(profile_access)])
+
+
+@router.get("/", response_model=List[ProfileSchema])
+async def get_profiles(route: str = None, limit: int = Query(50, ge=1, le=1000)):
+    """
+    Lists the stored request profiles, newest first, optionally only the ones of a route path
+    """
+    profiles = await run_in_threadpool(list_profiles)
+    if route is not None:
+        profiles = [profile for profile in profiles if profile["route"] == route]
+    return profiles[:limit]
+
+
+@router.get("/{profile_id}", response_class=FileResponse)
+def get_profile(profile_id: str):
+    """
+    Returns the sampled stacks of a profile in the collapsed format, one stack and its sample count per line, as read
+    by flamegraph.pl, inferno or speedscope
+    """
+    stacks_path = profile_stacks_path(profile_id)
+    if stacks_path is None:
+        raise NotFoundException(detail="Profile not found")
+    return FileResponse(stacks_path, media_type="text/plain", filename=f"{profile_id}.folded")
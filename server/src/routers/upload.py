@@ -0,0 +1,193 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import JSONResponse
+from redis import Redis
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from src.cache.cache_client import get_connection
+from src.cache.listing_cache import invalidate_listings
+from src.config import UPLOAD_SESSION_EXPIRE_MINUTES, UPLOAD_MAX_PARTS
+from src.db.database import get_db
+from src.db.models import Permissions
+from src.exceptions.api import NotFoundException, UnauthorizedException, InvalidRequestException
+from src.middleware.auth import verify_access_token
+from src.middleware.compression import compression_options
+from src.middleware.permissions import FilePermissions
+from src.schemas.file import FileSchema
+from src.schemas.upload import UploadSessionSchema
+from src.schemas.user import UserSchema
+from src.services.file import create_user_file, get_file_info, get_file_user_ids
+from src.services.upload import (
+    create_upload_session,
+    get_upload_session,
+    touch_upload_session,
+    remove_upload_session,
+    lock_upload_session_commit,
+    unlock_upload_session_commit,
+    set_upload_session_committed,
+)
+from src.storage.blob import BlobWriter
+from src.storage.codecs import Compression
+from src.storage.encoding import CONTENT_ENCODINGS, InvalidEncodingError
+from src.storage.pipeline import BackgroundWriter, run_in_writer_pool
+from src.storage.staging import (
+    create_staging,
+    open_part,
+    sync_part,
+    publish_part,
+    discard_part,
+    list_parts,
+    iter_parts,
+    remove_staging,
+    remove_stale_staging,
+)
+
+router = APIRouter(default_response_class=JSONResponse)
+logger = logging.getLogger()
+
+
+def check_edit_access(permissions: FilePermissions, user_id: str, file_id: str) -> None:
+    user_access = permissions.access_type(user_id, file_id)
+    if user_access is None:
+        logger.error("User requested invalid file")
+        raise NotFoundException(detail="Requested file not found")
+
+    if user_access == Permissions.read:
+        logger.error("User requested to edit file without edit permission")
+        raise UnauthorizedException(detail="No edit permissions")
+
+
+def verify_upload_session(
+    session_id: str, user: UserSchema = Depends(verify_access_token), key_store: Redis = Depends(get_connection)
+) -> dict:
+    session = get_upload_session(key_store, session_id)
+    if session is None or session["user_id"] != user.id:
+        logger.error("User requested invalid upload session")
+        raise NotFoundException(detail="Upload session not found")
+    session["session_id"] = session_id
+    return session
+
+
+@router.post("/", response_model=UploadSessionSchema)
+def create_session(
+    file_name: str,
+    file_id: Optional[str] = None,
+    encoding: Optional[str] = Query(None, regex=f"^({'|'.join(CONTENT_ENCODINGS)})$"),
+    user: UserSchema = Depends(verify_access_token),
+    key_store: Redis = Depends(get_connection),
+    permissions: FilePermissions = Depends(),
+):
+    if file_id is not None:
+        check_edit_access(permissions, user.id, file_id)
+
+    remove_stale_staging(UPLOAD_SESSION_EXPIRE_MINUTES * 60)
+    session_id = create_upload_session(key_store, user.id, file_name, file_id, encoding)
+    create_staging(session_id)
+    logger.info("Upload session created")
+    return UploadSessionSchema(session_id=session_id, file_name=file_name, file_id=file_id, encoding=encoding)
+
+
+@router.get("/{session_id}", response_model=UploadSessionSchema)
+def session_info(session: dict = Depends(verify_upload_session)):
+    return UploadSessionSchema(**session, parts=list_parts(session["session_id"]))
+
+
+@router.put("/{session_id}/{part_number}")
+async def upload_part(
+    request: Request,
+    part_number: int = Path(..., ge=0, lt=UPLOAD_MAX_PARTS),
+    session: dict = Depends(verify_upload_session),
+    key_store: Redis = Depends(get_connection),
+):
+    session_id = session["session_id"]
+    if session["committed_file_id"] is not None:
+        logger.error("User uploaded a part to a committed upload session")
+        raise InvalidRequestException(detail="Upload session already committed")
+    create_staging(session_id)
+
+    # Parts are written to a temporary file first, so an interrupted part is never taken as received
+    part_file = open_part(session_id)
+    try:
+        with part_file:
+            async with BackgroundWriter(part_file.write) as writer:
+                async for chunk in request.stream():
+                    await writer.write(chunk)
+            await run_in_writer_pool(sync_part, part_file)
+    except Exception:
+        discard_part(part_file.name)
+        raise
+    publish_part(session_id, part_number, part_file.name)
+
+    touch_upload_session(key_store, session_id)
+    return {"part_number": part_number}
+
+
+@router.post("/{session_id}/commit", response_model=FileSchema)
+def commit_session(
+    part_count: int = Query(..., ge=0, le=UPLOAD_MAX_PARTS),
+    session: dict = Depends(verify_upload_session),
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+    key_store: Redis = Depends(get_connection),
+    compression: Compression = Depends(compression_options),
+    permissions: FilePermissions = Depends(),
+):
+    """
+    Stores the parts of a session as the file, a commit sent again once committed returns the same file
+    """
+    session_id = session["session_id"]
+    if session["committed_file_id"] is not None:
+        # The response to the first commit was lost, the file is not stored a second time
+        file = get_file_info(db, session["committed_file_id"])
+        if file is None or permissions.access_type(user.id, file.id) is None:
+            logger.error("User committed an upload session whose file was deleted")
+            raise NotFoundException(detail="Committed file not found")
+        return file
+
+    missing = sorted(set(range(part_count)) - set(list_parts(session_id)))
+    if missing:
+        logger.error("User committed an upload session with missing parts")
+        raise InvalidRequestException(detail=f"Missing parts: {', '.join(str(part) for part in missing[:20])}")
+
+    if not lock_upload_session_commit(key_store, session_id):
+        logger.error("User committed an upload session which is being committed")
+        raise InvalidRequestException(detail="Upload session is already being committed")
+    try:
+        if session["file_id"] is None:
+            file_id = create_user_file(db, user.id, session["file_name"]).id
+            file_fields = {}
+        else:
+            file_id = session["file_id"]
+            check_edit_access(permissions, user.id, file_id)
+            file_fields = {"file_name": session["file_name"], "updated_at": datetime.utcnow()}
+
+        try:
+            with BlobWriter(
+                db, file_id, compression, session["encoding"], new_file=session["file_id"] is None
+            ) as writer:
+                for data in iter_parts(session_id, part_count):
+                    writer.write(data)
+                file = writer.close(**file_fields)
+        except InvalidEncodingError:
+            logger.error("User committed invalid encoded content")
+            raise InvalidRequestException(detail=f"Invalid {session['encoding']} content")
+
+        set_upload_session_committed(key_store, session_id, file_id)
+    finally:
+        unlock_upload_session_commit(key_store, session_id)
+
+    invalidate_listings(key_store, [user.id] if session["file_id"] is None else get_file_user_ids(db, file_id))
+    remove_staging(session_id)
+    logger.info("Upload session committed")
+    return file
+
+
+@router.delete("/{session_id}")
+def abort_session(session: dict = Depends(verify_upload_session), key_store: Redis = Depends(get_connection)):
+    remove_upload_session(key_store, session["session_id"])
+    remove_staging(session["session_id"])
+    logger.info("Upload session aborted")
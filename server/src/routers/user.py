@@ -1,6 +1,7 @@
 import logging
+from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
@@ -8,11 +9,25 @@ from src.db.database import get_db
 from src.exceptions.api import NotFoundException
 from src.middleware.auth import verify_access_token
 from src.schemas.user import UserSchema
-from src.services.user import get_user
+from src.services.user import get_user, get_users
 
 router = APIRouter(default_response_class=JSONResponse)
 logger = logging.getLogger()
 
+MAX_BATCH_SIZE = 1000
+
+
+@router.get("/", response_model=List[UserSchema])
+def get_users_info(
+    ids: List[str] = Query(..., min_items=1, max_items=MAX_BATCH_SIZE),
+    user: UserSchema = Depends(verify_access_token),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns the users of the given ids which exist, in a single query
+    """
+    return get_users(db, list(set(ids)))
+
 
 @router.get("/{user_id}", response_model=UserSchema)
 def get_user_info(user_id: str, user: UserSchema = Depends(verify_access_token), db: Session = Depends(get_db)):
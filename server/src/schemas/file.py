@@ -1,7 +1,8 @@
+from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel
 
-from src.schemas.userfile import UserFileBaseSchema
+from src.schemas.userfile import UserFileAccessSchema, UserFileSchema
 
 
 class FileBase(BaseModel):
@@ -16,12 +17,20 @@ class FileSchema(FileCreateSchema):
     id: str
     file_size: Optional[int] = None
     file_path: Optional[str] = None
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    original_size: Optional[int] = None
+    codec: Optional[str] = None
+    codec_level: Optional[int] = None
+    content_hash: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
 
 class FileAccessSchema(FileSchema):
-    users: Optional[List[UserFileBaseSchema]]
+    users: Optional[List[UserFileAccessSchema]]
+
+
+class UserFileEntrySchema(UserFileSchema):
+    file: FileSchema
@@ -0,0 +1,33 @@
+import enum
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from src.db.models import Permissions
+
+
+class SortKey(str, enum.Enum):
+    name = "name"
+    size = "size"
+    created_at = "created_at"
+    updated_at = "updated_at"
+
+
+class SortOrder(str, enum.Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+class FileListing(NamedTuple):
+    """Filters and order of a file listing"""
+
+    access_type: Optional[Permissions] = None
+    name: Optional[str] = None
+    name_prefix: Optional[str] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_after: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+    sort: SortKey = SortKey.name
+    order: SortOrder = SortOrder.asc
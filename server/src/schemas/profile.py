@@ -0,0 +1,16 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class ProfileSchema(BaseModel):
+    id: str
+    request_id: str
+    method: str
+    route: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    # header when requested with a profile token, sample when picked by the sampling rate
+    trigger: str
+    created_at: datetime
@@ -0,0 +1,17 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class ChunkSignatureSchema(BaseModel):
+    hash: str
+    offset: int
+    length: int
+
+
+class FileSignatureSchema(BaseModel):
+    file_id: str
+    manifest_hash: Optional[str] = None
+    size: int
+    min_chunk_size: int
+    max_chunk_size: int
+    chunks: List[ChunkSignatureSchema] = []
@@ -0,0 +1,12 @@
+from typing import Optional, List
+from pydantic import BaseModel
+
+
+class UploadSessionSchema(BaseModel):
+    session_id: str
+    file_name: str
+    file_id: Optional[str] = None
+    encoding: Optional[str] = None
+    parts: List[int] = []
+    # The file a committed session was stored as
+    committed_file_id: Optional[str] = None
@@ -12,6 +12,10 @@ class UserFileBaseSchema(BaseModel):
         orm_mode = True
 
 
+class UserFileAccessSchema(UserFileBaseSchema):
+    username: Optional[str]
+
+
 class UserFileSchema(UserFileBaseSchema):
     file_id: str
 
@@ -0,0 +1,136 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+
+from src.db.models import ChunkModel, FileChunkModel
+from src.storage.chunk_store import remove_chunk
+
+
+def _insert(db: Session, model):
+    """
+    Returns an insert of the database dialect, SQLite is only used by the load tests and shares the upsert syntax
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def acquire_chunks(db: Session, chunks: List[Tuple[str, int]], codec: str) -> Dict[str, str]:
+    """
+    Adds a reference to every (hash, size) chunk, creating the chunk rows that do not exist yet with codec
+
+    Commits immediately so that a concurrent release can not drop a chunk this upload is about to reuse.
+    Returns the codec every chunk is stored with, which differs from codec for chunks that already existed.
+    """
+    counts = Counter(chunk_hash for chunk_hash, _ in chunks)
+    sizes = dict(chunks)
+    statement = _insert(db, ChunkModel).values(
+        [
+            {"hash": chunk_hash, "size": sizes[chunk_hash], "codec": codec, "ref_count": counts[chunk_hash]}
+            for chunk_hash in sorted(counts)
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ChunkModel.hash], set_={"ref_count": ChunkModel.ref_count + statement.excluded.ref_count}
+    )
+    db.execute(statement)
+    codecs = dict(db.query(ChunkModel.hash, ChunkModel.codec).filter(ChunkModel.hash.in_(counts.keys())))
+    db.commit()
+    return codecs
+
+
+def release_chunks(db: Session, counts: Dict[str, int]) -> List[str]:
+    """
+    Drops references to chunks, without committing
+
+    Returns the hashes of the chunks which are no longer referenced, to be removed with remove_orphaned_chunks once
+    the caller has committed. Their rows are kept until then, so a rolled back release never loses a chunk.
+    """
+    if not counts:
+        return []
+
+    chunks = (
+        db.query(ChunkModel)
+        .filter(ChunkModel.hash.in_(counts.keys()))
+        .order_by(ChunkModel.hash)
+        .with_for_update()
+        .all()
+    )
+    orphans = []
+    for chunk in chunks:
+        chunk.ref_count -= counts[chunk.hash]
+        if chunk.ref_count <= 0:
+            orphans.append(chunk.hash)
+    db.flush()
+    return orphans
+
+
+def remove_orphaned_chunks(db: Session, chunk_hashes: List[str]) -> None:
+    """
+    Removes chunks released by a committed transaction, unless they were acquired again meanwhile, and commits
+
+    Chunk rows are locked while their files are removed, so a concurrent upload reusing a removed chunk waits and
+    then finds it missing on disk, and stores it again.
+    """
+    if not chunk_hashes:
+        return
+
+    chunks = (
+        db.query(ChunkModel)
+        .filter(ChunkModel.hash.in_(chunk_hashes), ChunkModel.ref_count <= 0)
+        .order_by(ChunkModel.hash)
+        .with_for_update()
+        .all()
+    )
+    for chunk in chunks:
+        remove_chunk(chunk.hash)
+        db.delete(chunk)
+    db.commit()
+
+
+def get_file_chunk_counts(db: Session, file_id: str) -> Counter:
+    """
+    Returns how many times each chunk is referenced by a file
+    """
+    return Counter(
+        row.chunk_hash for row in db.query(FileChunkModel.chunk_hash).filter(FileChunkModel.file_id == file_id)
+    )
+
+
+def release_file_chunks(db: Session, file_id: str) -> List[str]:
+    counts = get_file_chunk_counts(db, file_id)
+    db.query(FileChunkModel).filter(FileChunkModel.file_id == file_id).delete(synchronize_session=False)
+    return release_chunks(db, counts)
+
+
+def set_file_chunks(db: Session, file_id: str, manifest: List[Tuple[str, int, int]]) -> List[str]:
+    """
+    Replaces the chunk list of a file with the (hash, offset, length) entries of manifest, without committing
+
+    Returns the hashes of the previous chunks which are no longer referenced, as release_chunks does.
+    """
+    orphans = release_file_chunks(db, file_id)
+    db.bulk_insert_mappings(
+        FileChunkModel,
+        [
+            {"file_id": file_id, "position": position, "chunk_hash": chunk_hash, "offset": offset, "length": length}
+            for position, (chunk_hash, offset, length) in enumerate(manifest)
+        ],
+    )
+    return orphans
+
+
+def get_file_chunks(
+    db: Session, file_id: str, start: Optional[int] = None, end: Optional[int] = None
+) -> List[FileChunkModel]:
+    """
+    Returns the chunks of a file in order, limited to the chunks overlapping the inclusive start and end positions
+    """
+    query = db.query(FileChunkModel).options(joinedload(FileChunkModel.chunk)).filter(FileChunkModel.file_id == file_id)
+    if start is not None:
+        query = query.filter(FileChunkModel.offset + FileChunkModel.length > start)
+    if end is not None:
+        query = query.filter(FileChunkModel.offset <= end)
+    return query.order_by(FileChunkModel.position).all()
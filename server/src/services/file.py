@@ -1,9 +1,14 @@
-from typing import Optional
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
 
 from src.db.models import FileModel, UserFileModel, Permissions
 from src.schemas.file import FileSchema
+from src.schemas.listing import FileListing, SortKey, SortOrder
 from src.schemas.userfile import UserFileSchema
+from src.services.chunk import get_file_chunk_counts, release_chunks, remove_orphaned_chunks
 
 
 def create_user_file(db: Session, user_id: str, file_name: str) -> FileSchema:
@@ -25,11 +30,25 @@ def edit_user_file(
     file_size: Optional[float] = None,
     file_name: Optional[str] = None,
     file_path: Optional[str] = None,
-    updated_at: Optional[str] = None,
+    updated_at: Optional[datetime] = None,
+    original_size: Optional[int] = None,
+    codec: Optional[str] = None,
+    codec_level: Optional[int] = None,
+    manifest_hash: Optional[str] = None,
+    content_hash: Optional[str] = None,
 ) -> FileSchema:
     file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if file_size:
+    if file_size is not None:
         file.file_size = file_size
+    if original_size is not None:
+        file.original_size = original_size
+    if codec:
+        file.codec = codec
+        file.codec_level = codec_level
+    if manifest_hash:
+        file.manifest_hash = manifest_hash
+    if content_hash:
+        file.content_hash = content_hash
     if file_name:
         file.file_name = file_name
     if file_path:
@@ -46,10 +65,88 @@ def get_file_info(db: Session, file_id: str) -> FileSchema:
     return db.query(FileModel).filter(FileModel.id == file_id).first()
 
 
+def get_file_access_info(db: Session, file_id: str) -> FileSchema:
+    """
+    Returns a file with its access entries and their users loaded in the same round trip
+    """
+    return (
+        db.query(FileModel)
+        .options(selectinload(FileModel.users).joinedload(UserFileModel.user))
+        .filter(FileModel.id == file_id)
+        .first()
+    )
+
+
+def get_file_user_ids(db: Session, file_id: str) -> List[str]:
+    return [row.user_id for row in db.query(UserFileModel.user_id).filter(UserFileModel.file_id == file_id)]
+
+
 def get_user_files(db: Session, user_id: str) -> UserFileSchema:
     return db.query(UserFileModel).filter(UserFileModel.user_id == user_id).all()
 
 
+def _like_pattern(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Size of the original content, file_size is the stored size and is only left for files stored before it was kept
+CONTENT_SIZE = func.coalesce(FileModel.original_size, FileModel.file_size, 0)
+
+SORT_COLUMNS = {
+    SortKey.name: FileModel.file_name,
+    SortKey.size: CONTENT_SIZE,
+    SortKey.created_at: FileModel.created_at,
+    SortKey.updated_at: FileModel.updated_at,
+}
+
+
+def get_user_files_page(
+    db: Session, user_id: str, listing: FileListing, limit: int, after: Optional[Tuple[Any, str]] = None
+) -> List[UserFileModel]:
+    """
+    Returns up to limit files of a user matching the listing filters in the listing order, with their file loaded
+    in the same query
+
+    Pages are continued from the (sort value, file id) of the last file of the previous page given as after.
+    """
+    query = (
+        db.query(UserFileModel)
+        .join(UserFileModel.file)
+        .options(contains_eager(UserFileModel.file))
+        .filter(UserFileModel.user_id == user_id)
+    )
+    if listing.access_type is not None:
+        query = query.filter(UserFileModel.access_type == listing.access_type)
+    if listing.name:
+        query = query.filter(FileModel.file_name.ilike(f"%{_like_pattern(listing.name)}%", escape="\\"))
+    if listing.name_prefix:
+        query = query.filter(FileModel.file_name.ilike(f"{_like_pattern(listing.name_prefix)}%", escape="\\"))
+    if listing.min_size is not None:
+        query = query.filter(CONTENT_SIZE >= listing.min_size)
+    if listing.max_size is not None:
+        query = query.filter(CONTENT_SIZE <= listing.max_size)
+    if listing.created_after is not None:
+        query = query.filter(FileModel.created_at >= listing.created_after)
+    if listing.created_before is not None:
+        query = query.filter(FileModel.created_at < listing.created_before)
+    if listing.updated_after is not None:
+        query = query.filter(FileModel.updated_at >= listing.updated_after)
+    if listing.updated_before is not None:
+        query = query.filter(FileModel.updated_at < listing.updated_before)
+
+    sort_column = SORT_COLUMNS[listing.sort]
+    sort_key = tuple_(sort_column, UserFileModel.file_id)
+    if listing.order == SortOrder.desc:
+        if after is not None:
+            query = query.filter(sort_key < tuple_(*after))
+        query = query.order_by(sort_column.desc(), UserFileModel.file_id.desc())
+    else:
+        if after is not None:
+            query = query.filter(sort_key > tuple_(*after))
+        query = query.order_by(sort_column, UserFileModel.file_id)
+    return query.limit(limit).all()
+
+
 def get_user_file(db: Session, user_id: str, file_id: str) -> UserFileSchema:
     return db.query(UserFileModel).filter(UserFileModel.user_id == user_id, UserFileModel.file_id == file_id).first()
 
@@ -83,13 +180,48 @@ def remove_file_access(db: Session, user_id: str, file_id: str) -> UserFileSchem
     return user_file
 
 
-def delete_user_file(db: Session, file_id: str) -> UserFileSchema:
-    user_files = db.query(UserFileModel).filter(UserFileModel.file_id == file_id).all()
-    for file in user_files:
-        db.delete(file)
-    db.commit()
+def delete_user_file(db: Session, file_id: str) -> Optional[FileSchema]:
+    """
+    Deletes a file and releases its chunks, returning None if the file no longer exists
+    """
+    file = get_file_info(db, file_id)
+    if file is None:
+        return None
+    db.expunge(file)
+    counts = get_file_chunk_counts(db, file_id)
 
-    file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    db.delete(file)
+    # Access entries and the chunk list of the file are removed by ON DELETE CASCADE
+    db.query(FileModel).filter(FileModel.id == file_id).delete(synchronize_session=False)
+    orphans = release_chunks(db, counts)
     db.commit()
+    remove_orphaned_chunks(db, orphans)
     return file
+
+
+# Async versions of the functions above, for the async routes. Relationships can not be lazily loaded on an
+# async session, so the ones read by the callers are loaded with the query.
+
+
+async def create_user_file_async(db: AsyncSession, user_id: str, file_name: str) -> FileSchema:
+    db_file = FileModel(file_name=file_name)
+    db.add(db_file)
+    await db.flush()
+
+    db.add(UserFileModel(user_id=user_id, file_id=db_file.id, access_type=Permissions.owner))
+    await db.commit()
+    await db.refresh(db_file)
+    return db_file
+
+
+async def get_file_user_ids_async(db: AsyncSession, file_id: str) -> List[str]:
+    result = await db.execute(select(UserFileModel.user_id).where(UserFileModel.file_id == file_id))
+    return result.scalars().all()
+
+
+async def get_user_file_async(db: AsyncSession, user_id: str, file_id: str) -> UserFileSchema:
+    result = await db.execute(
+        select(UserFileModel)
+        .where(UserFileModel.user_id == user_id, UserFileModel.file_id == file_id)
+        .options(selectinload(UserFileModel.file))
+    )
+    return result.scalars().first()
@@ -0,0 +1,67 @@
+import uuid
+from typing import Optional, Dict
+
+from redis import Redis
+
+from src.config import UPLOAD_SESSION_EXPIRE_MINUTES
+
+
+def _session_key(session_id: str) -> str:
+    return f"upload_session:{session_id}"
+
+
+def _commit_lock_key(session_id: str) -> str:
+    return f"upload_session_commit:{session_id}"
+
+
+def create_upload_session(
+    key_store: Redis, user_id: str, file_name: str, file_id: Optional[str] = None, encoding: Optional[str] = None
+) -> str:
+    session_id = str(uuid.uuid4())
+    key = _session_key(session_id)
+    key_store.hset(
+        key, mapping={"user_id": user_id, "file_name": file_name, "file_id": file_id or "", "encoding": encoding or ""}
+    )
+    key_store.expire(key, UPLOAD_SESSION_EXPIRE_MINUTES * 60)
+    return session_id
+
+
+def get_upload_session(key_store: Redis, session_id: str) -> Optional[Dict[str, Optional[str]]]:
+    session = key_store.hgetall(_session_key(session_id))
+    if not session:
+        return None
+    session = {key.decode("utf-8"): value.decode("utf-8") for key, value in session.items()}
+    session["file_id"] = session["file_id"] or None
+    session["encoding"] = session.get("encoding") or None
+    session["committed_file_id"] = session.get("committed_file_id") or None
+    return session
+
+
+def touch_upload_session(key_store: Redis, session_id: str) -> None:
+    key_store.expire(_session_key(session_id), UPLOAD_SESSION_EXPIRE_MINUTES * 60)
+
+
+def remove_upload_session(key_store: Redis, session_id: str) -> None:
+    key_store.delete(_session_key(session_id))
+
+
+def lock_upload_session_commit(key_store: Redis, session_id: str) -> bool:
+    """
+    Returns whether the commit of a session may start, False while another commit of it is running
+
+    The lock expires with the session, in case the server stops while committing.
+    """
+    return bool(key_store.set(_commit_lock_key(session_id), 1, nx=True, ex=UPLOAD_SESSION_EXPIRE_MINUTES * 60))
+
+
+def unlock_upload_session_commit(key_store: Redis, session_id: str) -> None:
+    key_store.delete(_commit_lock_key(session_id))
+
+
+def set_upload_session_committed(key_store: Redis, session_id: str, file_id: str) -> None:
+    """
+    Keeps a committed session with the file it was committed to, so a commit sent again returns that file
+    """
+    key = _session_key(session_id)
+    key_store.hset(key, "committed_file_id", file_id)
+    key_store.expire(key, UPLOAD_SESSION_EXPIRE_MINUTES * 60)
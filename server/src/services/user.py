@@ -1,5 +1,8 @@
 from datetime import datetime
+from typing import List
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.db.models import UserModel
@@ -10,6 +13,10 @@ def get_user(db: Session, user_id: str):
     return db.query(UserModel).filter(UserModel.id == user_id).first()
 
 
+def get_users(db: Session, user_ids: List[str]) -> List[UserModel]:
+    return db.query(UserModel).filter(UserModel.id.in_(user_ids)).all()
+
+
 def get_user_by_username(db: Session, username: str, password: str):
     return db.query(UserModel).filter(UserModel.username == username).first()
 
@@ -29,3 +36,24 @@ def logout_all_users(db: Session, user_id: str):
     db.refresh(user)
 
     return user
+
+
+# Async versions of the functions above, for the async routes
+
+
+async def get_user_async(db: AsyncSession, user_id: str):
+    result = await db.execute(select(UserModel).where(UserModel.id == user_id))
+    return result.scalars().first()
+
+
+async def get_user_by_username_async(db: AsyncSession, username: str, password: str):
+    result = await db.execute(select(UserModel).where(UserModel.username == username))
+    return result.scalars().first()
+
+
+async def create_user_async(db: AsyncSession, user: UserCreateSchema):
+    db_user = UserModel(username=user.username, hashed_password=user.password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
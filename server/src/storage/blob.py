@@ -0,0 +1,334 @@
+import gzip
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from hashlib import sha256
+from os import remove
+from time import perf_counter
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.db.models import FileChunkModel
+from src.middleware.metrics import observe_upload
+from src.schemas.file import FileSchema
+from src.services.chunk import acquire_chunks, release_chunks, remove_orphaned_chunks, set_file_chunks
+from src.services.file import delete_user_file, edit_user_file, get_file_info
+from src.storage.chunk_store import chunk_exists, write_chunk, chunk_stored_size, read_chunk
+from src.storage.chunker import Chunker
+from src.config import COMPRESSION_WORKERS
+from src.storage.codecs import Codec, Compression, get_codec, is_compressed, CODECS
+from src.storage.encoding import GzipMemberReader
+from src.storage.pipeline import run_in_writer_pool
+
+# Number of chunks whose references are acquired in one database round trip
+ACQUIRE_BATCH_SIZE = 8
+# Chunks a single writer may have queued or being compressed, which bounds the memory held per upload
+MAX_IN_FLIGHT_CHUNKS = COMPRESSION_WORKERS * 2
+
+# Shared by all uploads, so compression never uses more than COMPRESSION_WORKERS cores in total.
+# zlib, zstd and lz4 release the GIL while compressing, so threads compress in parallel.
+compression_pool = ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS, thread_name_prefix="compression")
+
+
+def store_chunk(
+    chunk_hash: str, chunk: bytes, codec: Codec, level: Optional[int], timings: Optional[List[float]] = None
+) -> int:
+    """
+    Compresses and writes a chunk unless it is already stored, and returns its stored size
+
+    The time spent compressing is appended to timings when given.
+    """
+    if not chunk_exists(chunk_hash):
+        start = perf_counter()
+        stored = codec.compress(chunk, level)
+        if timings is not None:
+            timings.append(perf_counter() - start)
+        write_chunk(chunk_hash, stored)
+    return chunk_stored_size(chunk_hash)
+
+
+def store_encoded_chunk(chunk_hash: str, stored: bytes) -> int:
+    """
+    Writes a chunk received already compressed unless it is already stored, and returns its stored size
+    """
+    if not chunk_exists(chunk_hash):
+        write_chunk(chunk_hash, stored)
+    return chunk_stored_size(chunk_hash)
+
+
+class ChunkNotFoundError(LookupError):
+    """Raised when a chunk referenced again by a file is no longer stored"""
+
+    pass
+
+
+def copied_chunk_size(chunk_hash: str) -> int:
+    """
+    Returns the stored size of a chunk which is referenced again without being written
+    """
+    if not chunk_exists(chunk_hash):
+        raise ChunkNotFoundError(f"Chunk {chunk_hash} is no longer stored")
+    return chunk_stored_size(chunk_hash)
+
+
+class BlobWriter:
+    """
+    Writes the content of a file into the chunk store
+
+    Content is split into content defined chunks, and only the chunks that are not stored yet are compressed
+    and written. Chunks are compressed concurrently in the compression pool while the next chunks are being
+    split, and their order in the file is kept by the manifest built as chunks are added.
+    Content recognised as already compressed from its first bytes is stored raw.
+    The file switches to the new content on close, and its previous chunks are released.
+
+    Content sent with a gzip content encoding is decompressed as it is written and stored with gzip. Its gzip
+    members which hold exactly one chunk are stored as received, the other chunks are compressed again.
+
+    Stored chunks can be appended with copy_chunk, which only adds a reference to them while the content written
+    so far ends on a chunk boundary.
+
+    A new_file is deleted when writing its first content fails, so files are never listed without content.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        file_id: str,
+        compression: Compression,
+        content_encoding: Optional[str] = None,
+        new_file: bool = False,
+    ) -> None:
+        self.db = db
+        self.file_id = file_id
+        self.new_file = new_file
+        self.codec = compression.codec
+        self.level = compression.level
+        self.decoder = None
+        if content_encoding == "gzip":
+            self.codec, self.level = CODECS["gzip"], None
+            self.decoder = GzipMemberReader()
+        self.chunker = Chunker()
+        # Gzip members received for the content at an offset, by offset, as (length, member)
+        self.members: Dict[int, Tuple[int, bytes]] = {}
+        self.chunked = 0
+        self.received = 0
+        # (hash, length, content, gzip member) of chunks to add, content is None for copied chunks
+        self.pending: List[Tuple[str, int, Optional[bytes], Optional[bytes]]] = []
+        self.acquired: List[str] = []
+        self.manifest: List[Tuple[str, int, int]] = []
+        self.in_flight: Deque[Future] = deque()
+        self.size = 0
+        self.stored_size = 0
+        # Hash of the whole original content, updated as it is written
+        self.content_hash = sha256()
+        # Seconds spent compressing each chunk, appended to by the compression threads
+        self.compression_times: List[float] = []
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+
+    async def __aenter__(self) -> "BlobWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        # Used by async routes, the writer session is only ever touched from the writer pool
+        if exc_type is not None:
+            await run_in_writer_pool(self.abort)
+
+    def write(self, data: bytes) -> None:
+        if self.decoder is None:
+            self.write_member(data)
+            return
+        for content, member in self.decoder.feed(data):
+            self.write_member(content, member)
+
+    def write_member(self, data: bytes, member: Optional[bytes] = None) -> None:
+        """
+        Writes content along with the gzip member it was received as, which is stored as is if it holds a chunk
+        """
+        if member is not None:
+            self.members[self.received] = (len(data), member)
+        self.content_hash.update(data)
+        self.received += len(data)
+        for chunk in self.chunker.feed(data):
+            self._add(chunk)
+
+    def copy_chunk(self, chunk_hash: str, length: int, codec: str) -> None:
+        """
+        Appends a stored chunk, without compressing and writing it again when the content written so far ends on a
+        chunk boundary
+        """
+        try:
+            content = get_codec(codec).decompress(read_chunk(chunk_hash))
+        except FileNotFoundError:
+            raise ChunkNotFoundError(f"Chunk {chunk_hash} is no longer stored")
+        if self.chunker.buffer:
+            # The chunk would not start a new chunk here, so its content is chunked again
+            self.write_member(content)
+            return
+
+        # Only read for the content hash, the chunk is neither compressed nor written again
+        self.content_hash.update(content)
+        self.received += length
+        self.chunked += length
+        self.pending.append((chunk_hash, length, None, None))
+        if len(self.pending) >= ACQUIRE_BATCH_SIZE:
+            self._flush()
+
+    def close(self, **file_fields) -> FileSchema:
+        if self.decoder is not None:
+            for content, member in self.decoder.finish():
+                self.write_member(content, member)
+        for chunk in self.chunker.finish():
+            self._add(chunk)
+        self._flush()
+        while self.in_flight:
+            self.stored_size += self.in_flight.popleft().result()
+
+        file = get_file_info(self.db, self.file_id)
+        legacy_path = file.file_path
+        file.file_path = None
+
+        orphans = set_file_chunks(self.db, self.file_id, self.manifest)
+        file = edit_user_file(
+            self.db,
+            self.file_id,
+            file_size=self.stored_size,
+            original_size=self.size,
+            codec=self.codec.name,
+            codec_level=self.level,
+            manifest_hash=sha256("".join(chunk_hash for chunk_hash, _, _ in self.manifest).encode()).hexdigest(),
+            content_hash=self.content_hash.hexdigest(),
+            **file_fields,
+        )
+        self.acquired = []
+        if orphans:
+            remove_orphaned_chunks(self.db, orphans)
+            self.db.refresh(file)
+        observe_upload(self.codec.name, self.size, self.stored_size, sum(self.compression_times))
+
+        if legacy_path:
+            remove_legacy_blob(legacy_path)
+        return file
+
+    def abort(self) -> None:
+        for future in self.in_flight:
+            future.cancel()
+        wait(self.in_flight)
+        self.in_flight.clear()
+
+        self.db.rollback()
+        orphans = release_chunks(self.db, Counter(self.acquired))
+        self.db.commit()
+        self.acquired = []
+        remove_orphaned_chunks(self.db, orphans)
+        if self.new_file:
+            delete_user_file(self.db, self.file_id)
+
+    def _add(self, chunk: bytes) -> None:
+        if not self.manifest and not self.pending and is_compressed(chunk[:16]):
+            self.codec = CODECS["none"]
+            self.level = None
+
+        # Members are only kept until the content they cover is chunked
+        length, member = self.members.pop(self.chunked, (None, None))
+        self.chunked += len(chunk)
+        for offset in [offset for offset in self.members if offset < self.chunked]:
+            del self.members[offset]
+        self.pending.append((sha256(chunk).hexdigest(), len(chunk), chunk, member if length == len(chunk) else None))
+        if len(self.pending) >= ACQUIRE_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.pending:
+            return
+
+        codecs = acquire_chunks(
+            self.db, [(chunk_hash, length) for chunk_hash, length, _, _ in self.pending], self.codec.name
+        )
+        self.acquired.extend(chunk_hash for chunk_hash, _, _, _ in self.pending)
+
+        for chunk_hash, length, chunk, member in self.pending:
+            if chunk is None:
+                # Copied chunks are only referenced again, but they must still be stored
+                future = compression_pool.submit(copied_chunk_size, chunk_hash)
+            elif member is not None and codecs[chunk_hash] == "gzip":
+                # Received as a gzip member holding exactly this chunk
+                future = compression_pool.submit(store_encoded_chunk, chunk_hash, member)
+            else:
+                if codecs[chunk_hash] == self.codec.name:
+                    codec, level = self.codec, self.level
+                else:
+                    # The chunk is already known with another codec, and the stored form has to match it
+                    codec, level = get_codec(codecs[chunk_hash]), None
+                future = compression_pool.submit(store_chunk, chunk_hash, chunk, codec, level, self.compression_times)
+            self.in_flight.append(future)
+            self.manifest.append((chunk_hash, self.size, length))
+            self.size += length
+
+            while len(self.in_flight) > MAX_IN_FLIGHT_CHUNKS:
+                self.stored_size += self.in_flight.popleft().result()
+        self.pending = []
+
+
+def iter_blob(chunks: List[FileChunkModel], start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields the content of the chunks, trimmed to the inclusive start and end positions of the file
+
+    Every chunk is compressed on its own, so only the chunks overlapping the range are read and decompressed.
+    """
+    for file_chunk in chunks:
+        content = get_codec(file_chunk.chunk.codec).decompress(read_chunk(file_chunk.chunk_hash))
+        first = max(start - file_chunk.offset, 0)
+        last = file_chunk.length if end is None else min(end + 1 - file_chunk.offset, file_chunk.length)
+        if first == 0 and last == file_chunk.length:
+            yield content
+        else:
+            yield content[first:last]
+
+
+def iter_stored_blob(chunks: List[FileChunkModel]) -> Iterator[bytes]:
+    """
+    Yields the chunks as they are stored, without decompressing them
+
+    Every gzip chunk is a complete gzip member, and consecutive gzip members form a valid gzip stream, so the
+    stored bytes of a file made of gzip chunks can be sent as is with a gzip content encoding.
+    """
+    for file_chunk in chunks:
+        yield read_chunk(file_chunk.chunk_hash)
+
+
+def stored_blob_size(chunks: List[FileChunkModel]) -> int:
+    return sum(chunk_stored_size(file_chunk.chunk_hash) for file_chunk in chunks)
+
+
+def iter_legacy_blob(file_path: str, read_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Reads files stored as a single gzip file, before the chunk store was introduced
+    """
+    with gzip.open(file_path, mode="rb") as file_like:
+        while True:
+            chunk = file_like.read(read_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_stored_legacy_blob(file_path: str, read_size: int = 1024 * 1024) -> Iterator[bytes]:
+    with open(file_path, "rb") as file_like:
+        while True:
+            chunk = file_like.read(read_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def remove_legacy_blob(file_path: str) -> None:
+    try:
+        remove(file_path)
+    except FileNotFoundError:
+        pass
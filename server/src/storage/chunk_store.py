@@ -0,0 +1,43 @@
+from os import path, makedirs, remove, replace, fsync
+from tempfile import NamedTemporaryFile
+
+from src.config import FILE_BASE_PATH
+
+CHUNK_BASE_PATH = path.join(FILE_BASE_PATH, "chunks")
+
+
+def chunk_path(chunk_hash: str) -> str:
+    return path.join(CHUNK_BASE_PATH, chunk_hash[:2], chunk_hash)
+
+
+def chunk_exists(chunk_hash: str) -> bool:
+    return path.isfile(chunk_path(chunk_hash))
+
+
+def write_chunk(chunk_hash: str, data: bytes) -> None:
+    """
+    Writes the stored form of a chunk, the chunk only becomes visible once it is fully written and synced to disk
+    """
+    target = chunk_path(chunk_hash)
+    makedirs(path.dirname(target), exist_ok=True)
+    with NamedTemporaryFile(dir=path.dirname(target), prefix=".tmp-", delete=False) as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        fsync(temp_file.fileno())
+    replace(temp_file.name, target)
+
+
+def read_chunk(chunk_hash: str) -> bytes:
+    with open(chunk_path(chunk_hash), "rb") as chunk_file:
+        return chunk_file.read()
+
+
+def chunk_stored_size(chunk_hash: str) -> int:
+    return path.getsize(chunk_path(chunk_hash))
+
+
+def remove_chunk(chunk_hash: str) -> None:
+    try:
+        remove(chunk_path(chunk_hash))
+    except FileNotFoundError:
+        pass
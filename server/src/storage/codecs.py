@@ -0,0 +1,133 @@
+import gzip
+from typing import Dict, NamedTuple, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+class Codec:
+    """Base class for the compression codecs chunks are stored with"""
+
+    name: str = None
+    levels: range = range(0)
+    default_level: Optional[int] = None
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class NoneCodec(Codec):
+    """Stores chunks as they are, used for content which is already compressed"""
+
+    name = "none"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+    levels = range(1, 10)
+    default_level = 6
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return gzip.compress(data, compresslevel=level or self.default_level, mtime=0)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    levels = range(1, 23)
+    default_level = 3
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return zstandard.ZstdCompressor(level=level or self.default_level).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+class Lz4Codec(Codec):
+    name = "lz4"
+    levels = range(0, 17)
+    default_level = 0
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return lz4.frame.compress(data, compression_level=level if level is not None else self.default_level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    CODECS[codec.name] = codec
+
+
+register_codec(NoneCodec())
+register_codec(GzipCodec())
+# zstd and lz4 are only available when their packages are installed
+if zstandard is not None:
+    register_codec(ZstdCodec())
+if lz4 is not None:
+    register_codec(Lz4Codec())
+
+
+def get_codec(name: str) -> Codec:
+    return CODECS[name]
+
+
+# Leading bytes of formats that are already compressed and gain nothing from another compression pass
+_COMPRESSED_SIGNATURES = (
+    b"\xff\xd8\xff",  # jpeg
+    b"\x89PNG\r\n\x1a\n",  # png
+    b"GIF87a",
+    b"GIF89a",
+    b"PK\x03\x04",  # zip, docx, xlsx, jar, apk
+    b"\x1f\x8b",  # gzip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\x04\x22\x4d\x18",  # lz4
+    b"BZh",  # bzip2
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf\x27\x1c",  # 7z
+    b"Rar!\x1a\x07",  # rar
+    b"\x1a\x45\xdf\xa3",  # mkv, webm
+    b"OggS",  # ogg
+    b"ID3",  # mp3
+    b"fLaC",  # flac
+)
+
+
+def is_compressed(head: bytes) -> bool:
+    """
+    Detects already compressed content from the first bytes of a file
+    """
+    if head.startswith(_COMPRESSED_SIGNATURES):
+        return True
+    # mp4, mov, heic and other iso base media files start with a box size followed by "ftyp"
+    if head[4:8] == b"ftyp":
+        return True
+    # webp, avi
+    return head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"AVI ")
+
+
+class Compression(NamedTuple):
+    codec: Codec
+    level: Optional[int]
@@ -0,0 +1,101 @@
+import zlib
+from typing import Dict, List, Tuple
+
+from src.storage.blob import BlobWriter
+from src.storage.chunker import MAX_CHUNK_SIZE
+
+# A delta is a sequence of operations building the new content of a file in order:
+#   C + 32 byte sha256 digest             copies a chunk of the current version of the file
+#   D + 4 byte big endian length + data   appends data
+#   G + 4 byte big endian length + member appends the data of a gzip member, stored as is if it holds one chunk
+OP_COPY = b"C"
+OP_DATA = b"D"
+OP_GZIP = b"G"
+HASH_SIZE = 32
+LENGTH_SIZE = 4
+# Largest data or gzip member of a single operation, which bounds the memory a delta needs
+MAX_OP_SIZE = MAX_CHUNK_SIZE + 64 * 1024
+
+
+class InvalidDeltaError(ValueError):
+    """Raised for malformed deltas and deltas copying chunks the file does not have"""
+
+    pass
+
+
+class DeltaReader:
+    """
+    Parses a delta fed in arbitrary pieces into (op, payload) operations
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[bytes, bytes]]:
+        self.buffer += data
+        ops = []
+        position = 0
+        while position < len(self.buffer):
+            op = bytes(self.buffer[position : position + 1])
+            if op == OP_COPY:
+                header, size = 1, HASH_SIZE
+            elif op in (OP_DATA, OP_GZIP):
+                if len(self.buffer) < position + 1 + LENGTH_SIZE:
+                    break
+                header = 1 + LENGTH_SIZE
+                size = int.from_bytes(self.buffer[position + 1 : position + header], "big")
+                if size > MAX_OP_SIZE:
+                    raise InvalidDeltaError("Delta operation too large")
+            else:
+                raise InvalidDeltaError("Unknown delta operation")
+
+            if len(self.buffer) < position + header + size:
+                break
+            ops.append((op, bytes(self.buffer[position + header : position + header + size])))
+            position += header + size
+        del self.buffer[:position]
+        return ops
+
+    def finish(self) -> None:
+        if self.buffer:
+            raise InvalidDeltaError("Truncated delta")
+
+
+def _decompress_member(member: bytes) -> bytes:
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        content = decompressor.decompress(member, MAX_CHUNK_SIZE + 1)
+    except zlib.error as error:
+        raise InvalidDeltaError(f"Invalid gzip member: {error}")
+    if not decompressor.eof or decompressor.unused_data or len(content) > MAX_CHUNK_SIZE:
+        raise InvalidDeltaError("Gzip operations must hold a single member of at most one chunk")
+    return content
+
+
+class DeltaWriter:
+    """
+    Applies a delta on top of the current version of a file, writing the new version with a BlobWriter
+
+    base_chunks maps the hashes of the chunks of the current version to their (length, codec), only those chunks
+    can be copied.
+    """
+
+    def __init__(self, writer: BlobWriter, base_chunks: Dict[str, Tuple[int, str]]) -> None:
+        self.writer = writer
+        self.base_chunks = base_chunks
+        self.reader = DeltaReader()
+
+    def write(self, data: bytes) -> None:
+        for op, payload in self.reader.feed(data):
+            if op == OP_COPY:
+                chunk_hash = payload.hex()
+                if chunk_hash not in self.base_chunks:
+                    raise InvalidDeltaError("Copied chunk is not part of the file")
+                self.writer.copy_chunk(chunk_hash, *self.base_chunks[chunk_hash])
+            elif op == OP_DATA:
+                self.writer.write_member(payload)
+            else:
+                self.writer.write_member(_decompress_member(payload), payload)
+
+    def finish(self) -> None:
+        self.reader.finish()
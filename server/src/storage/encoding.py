@@ -0,0 +1,84 @@
+import zlib
+from typing import List, Optional, Tuple
+
+from src.storage.chunker import MAX_CHUNK_SIZE
+
+# Content codings uploads can be sent with
+CONTENT_ENCODINGS = ("gzip",)
+
+# Largest piece of decompressed data produced at once, which bounds the memory a small highly compressed input
+# can expand to
+MAX_OUTPUT_SIZE = 1024 * 1024
+
+
+class InvalidEncodingError(ValueError):
+    """Raised for content which is not valid for its content coding"""
+
+    pass
+
+
+class GzipMemberReader:
+    """
+    Decompresses a gzip stream incrementally, member by member
+
+    feed and finish return (data, member) pairs of decompressed data. A gzip member no larger than a chunk is
+    returned whole once complete, with member holding its compressed bytes, so content compressed one chunk per
+    member can be stored without compressing it again. Data of larger members is returned as it is decompressed,
+    with member set to None. Decompression checks the CRC and length of every member.
+    """
+
+    def __init__(self, max_member_size: int = MAX_CHUNK_SIZE) -> None:
+        self.max_member_size = max_member_size
+        self.decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        self.started = False
+        self.whole = True
+        self.data = bytearray()
+        self.member = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[bytes, Optional[bytes]]]:
+        pieces = []
+        while True:
+            try:
+                output = self.decompressor.decompress(data, MAX_OUTPUT_SIZE)
+            except zlib.error as error:
+                raise InvalidEncodingError(str(error))
+
+            rest = self.decompressor.unused_data if self.decompressor.eof else self.decompressor.unconsumed_tail
+            consumed = data[: len(data) - len(rest)]
+            self.started = self.started or bool(consumed)
+            self._add(output, consumed, pieces)
+
+            if self.decompressor.eof:
+                pieces.extend(self._end_member())
+            data = rest
+            # Output may still be pending in the decompressor once all input is consumed
+            if not data and len(output) < MAX_OUTPUT_SIZE:
+                return pieces
+
+    def finish(self) -> List[Tuple[bytes, Optional[bytes]]]:
+        if self.started:
+            raise InvalidEncodingError("Truncated gzip content")
+        return []
+
+    def _add(self, output: bytes, consumed: bytes, pieces: List[Tuple[bytes, Optional[bytes]]]) -> None:
+        if self.whole:
+            self.data += output
+            self.member += consumed
+            if len(self.data) <= self.max_member_size:
+                return
+            # Too large to be a single chunk, the data held so far is passed on
+            self.whole = False
+            output = bytes(self.data)
+            self.data = bytearray()
+            self.member = bytearray()
+        if output:
+            pieces.append((output, None))
+
+    def _end_member(self) -> List[Tuple[bytes, Optional[bytes]]]:
+        pieces = [(bytes(self.data), bytes(self.member))] if self.whole and self.data else []
+        self.decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        self.started = False
+        self.whole = True
+        self.data = bytearray()
+        self.member = bytearray()
+        return pieces
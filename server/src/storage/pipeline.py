@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from src.config import UPLOAD_WRITER_THREADS, UPLOAD_QUEUE_SIZE
+
+writer_pool = ThreadPoolExecutor(max_workers=UPLOAD_WRITER_THREADS, thread_name_prefix="upload-writer")
+
+
+async def run_in_writer_pool(function: Callable, *args, **kwargs) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(writer_pool, partial(function, *args, **kwargs))
+
+
+class BackgroundWriter:
+    """
+    Hands data received on the event loop to a blocking write function running in the writer pool
+
+    Data goes through a bounded queue, so write waits (without blocking the event loop) once the writes fall behind,
+    which stops reading the request until they catch up. Every queued piece is written by its own job in the writer
+    pool, started by a task on the event loop once the previous one is done, so a pool thread is only held while
+    data is actually being written and never while waiting on the network. Leaving the context waits for all queued
+    data to be written and raises the error of the write function if it failed.
+    """
+
+    def __init__(self, write: Callable[[bytes], None], queue_size: int = UPLOAD_QUEUE_SIZE) -> None:
+        self.write_function = write
+        self.queue_size = queue_size
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+
+    async def __aenter__(self) -> "BackgroundWriter":
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            # Whatever is still queued is skipped, so make room for the end marker
+            self.cancelled = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            await asyncio.wait({self.task})
+            return
+
+        await self.queue.put(None)
+        await self.task
+        if self.error is not None:
+            raise self.error
+
+    async def write(self, data: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        await self.queue.put(data)
+
+    async def _run(self) -> None:
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                return
+            if self.error is None and not self.cancelled:
+                try:
+                    await run_in_writer_pool(self.write_function, data)
+                except Exception as error:
+                    # Keep consuming the queue so the request side never waits on a dead writer
+                    self.error = error
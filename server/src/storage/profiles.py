@@ -0,0 +1,63 @@
+import json
+from os import path, makedirs, listdir, remove, replace
+from typing import Dict, List, Optional
+
+from src.config import FILE_BASE_PATH, PROFILE_KEEP
+
+PROFILE_BASE_PATH = path.join(FILE_BASE_PATH, "profiles")
+
+
+def _profile_path(profile_id: str, extension: str) -> str:
+    return path.join(PROFILE_BASE_PATH, f"{profile_id}.{extension}")
+
+
+def _write(file_path: str, content: str) -> None:
+    with open(file_path + ".tmp", "w") as profile_file:
+        profile_file.write(content)
+    replace(file_path + ".tmp", file_path)
+
+
+def save_profile(info: Dict, stacks: str) -> None:
+    """
+    Stores the collapsed stacks of a profile along with its info, and removes the oldest profiles over PROFILE_KEEP
+
+    The info is written last, so listed profiles always have their stacks.
+    """
+    makedirs(PROFILE_BASE_PATH, exist_ok=True)
+    _write(_profile_path(info["id"], "folded"), stacks)
+    _write(_profile_path(info["id"], "json"), json.dumps(info))
+
+    for old_info in list_profiles()[PROFILE_KEEP:]:
+        for extension in ("json", "folded"):
+            try:
+                remove(_profile_path(old_info["id"], extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """
+    Returns the info of the stored profiles, newest first
+    """
+    if not path.isdir(PROFILE_BASE_PATH):
+        return []
+
+    profiles = []
+    for file_name in listdir(PROFILE_BASE_PATH):
+        if not file_name.endswith(".json"):
+            continue
+        try:
+            with open(path.join(PROFILE_BASE_PATH, file_name)) as info_file:
+                profiles.append(json.load(info_file))
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            # Removed or replaced by another worker meanwhile
+            continue
+    return sorted(profiles, key=lambda info: info["created_at"], reverse=True)
+
+
+def profile_stacks_path(profile_id: str) -> Optional[str]:
+    # Ids are generated hex strings, anything else can not name a stored profile
+    if not profile_id.isalnum():
+        return None
+    file_path = _profile_path(profile_id, "folded")
+    return file_path if path.isfile(file_path) else None
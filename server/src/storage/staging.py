@@ -0,0 +1,83 @@
+import shutil
+import time
+from os import path, makedirs, listdir, replace, remove, fsync
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO, Iterator, List
+
+from src.config import FILE_BASE_PATH
+
+STAGING_BASE_PATH = path.join(FILE_BASE_PATH, "uploads")
+
+
+def session_path(session_id: str) -> str:
+    return path.join(STAGING_BASE_PATH, session_id)
+
+
+def part_path(session_id: str, part_number: int) -> str:
+    return path.join(session_path(session_id), f"{part_number:08d}")
+
+
+def create_staging(session_id: str) -> None:
+    makedirs(session_path(session_id), exist_ok=True)
+
+
+def open_part(session_id: str) -> BinaryIO:
+    """
+    Opens a temporary file for a part, which is published under its number with publish_part once complete
+    """
+    return NamedTemporaryFile(dir=session_path(session_id), prefix=".tmp-", delete=False)
+
+
+def sync_part(part_file: BinaryIO) -> None:
+    part_file.flush()
+    fsync(part_file.fileno())
+
+
+def publish_part(session_id: str, part_number: int, temp_path: str) -> None:
+    replace(temp_path, part_path(session_id, part_number))
+
+
+def discard_part(temp_path: str) -> None:
+    try:
+        remove(temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def list_parts(session_id: str) -> List[int]:
+    try:
+        names = listdir(session_path(session_id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def iter_parts(session_id: str, part_count: int, read_size: int = 1024 * 1024) -> Iterator[bytes]:
+    for part_number in range(part_count):
+        with open(part_path(session_id, part_number), "rb") as part_file:
+            while True:
+                data = part_file.read(read_size)
+                if not data:
+                    break
+                yield data
+
+
+def remove_staging(session_id: str) -> None:
+    shutil.rmtree(session_path(session_id), ignore_errors=True)
+
+
+def remove_stale_staging(max_age_seconds: int) -> None:
+    """
+    Removes staged parts of sessions which expired without being committed
+    """
+    try:
+        session_ids = listdir(STAGING_BASE_PATH)
+    except FileNotFoundError:
+        return
+    expired_before = time.time() - max_age_seconds
+    for session_id in session_ids:
+        try:
+            if path.getmtime(session_path(session_id)) < expired_before:
+                remove_staging(session_id)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,24 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error
+from typing import Any, List
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque cursor for the next page
+    """
+    return urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    """
+    Decodes a cursor made by encode_cursor, raising ValueError for cursors which are not a sort key of length values
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+    if type(values) != list or len(values) != length:
+        raise ValueError("Invalid cursor")
+    return values
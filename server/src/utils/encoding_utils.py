@@ -0,0 +1,27 @@
+from typing import Optional
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+    Checks whether an Accept-Encoding header allows a content coding, honouring q=0 exclusions and wildcards
+    """
+    if not accept_encoding:
+        return False
+
+    wildcard = False
+    for entry in accept_encoding.split(","):
+        name, _, parameters = entry.strip().partition(";")
+        quality = 1.0
+        parameter, _, value = parameters.strip().partition("=")
+        if parameter.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+
+        name = name.strip().lower()
+        if name == encoding:
+            return quality > 0
+        if name == "*":
+            wildcard = quality > 0
+    return wildcard
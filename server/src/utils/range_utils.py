@@ -0,0 +1,68 @@
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+
+RE_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Returns the inclusive (start, end) byte positions requested by a single byte range header
+
+    Returns None when the header should be ignored and the whole content sent, which includes multiple ranges,
+    and raises ValueError when the range can not be satisfied.
+    """
+    match = RE_BYTE_RANGE.match(range_header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+
+    if first == "":
+        # Suffix range, the last n bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = size - 1 if last == "" else min(int(last), size - 1)
+    if start >= size or start > end:
+        raise ValueError("Range outside of content")
+    return start, end
+
+
+def http_date(utc_time: datetime) -> str:
+    return format_datetime(utc_time.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def if_range_matches(if_range: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """
+    Checks an If-Range validator against the current entity tag or modification date
+    """
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    return last_modified is not None and if_range == last_modified
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
+    """
+    Checks an If-None-Match header against the entity tags of the current content, with weak comparison
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {_opaque_tag(etag) for etag in if_none_match.split(",")}
+    return any(_opaque_tag(etag) in candidates for etag in etags)
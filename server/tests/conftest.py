@@ -0,0 +1,109 @@
+"""
+Runs the application against a temporary SQLite database, fakeredis and a temporary file storage
+
+Requests are sent through the FastAPI TestClient as the user of the user fixture, the database, Redis, the file
+storage and the in-process caches are emptied before every test.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# The configuration is read on import, so the environment is set before the application is imported
+FILE_BASE_PATH = tempfile.mkdtemp(prefix="blob-test-")
+atexit.register(shutil.rmtree, FILE_BASE_PATH, ignore_errors=True)
+DATABASE_PATH = os.path.join(FILE_BASE_PATH, "test.db")
+os.environ.update(
+    {
+        "FILE_BASE_PATH": os.path.join(FILE_BASE_PATH, "files"),
+        "DATABASE_URL": f"sqlite:///{DATABASE_PATH}",
+        "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{DATABASE_PATH}",
+    }
+)
+for key, value in {
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_DB": "0",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_NAME": "test",
+    "DATABASE_USER": "test",
+    "DATABASE_PASSWORD": "test",
+    "ACCESS_TOKEN_SECRET": "test-access",
+    "REFRESH_TOKEN_SECRET": "test-refresh",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_MINUTES": "600",
+}.items():
+    os.environ.setdefault(key, value)
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from loadtest.serve import _sqlite_pragmas  # noqa: E402
+from src.cache.auth_cache import token_cache, user_cache  # noqa: E402
+from src.cache.cache_client import get_connection  # noqa: E402
+from src.cache.permission_cache import invalidated_versions, permission_cache  # noqa: E402
+from src.db.database import Base, SessionLocal, async_engine, engine  # noqa: E402
+from src.db.models import UserModel  # noqa: E402
+from src.main import app  # noqa: E402
+from src.middleware.auth import verify_access_token, verify_access_token_async  # noqa: E402
+from src.schemas.user import UserSchema  # noqa: E402
+
+event.listen(engine, "connect", _sqlite_pragmas)
+event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture
+def db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def user(db) -> UserSchema:
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    shutil.rmtree(os.environ["FILE_BASE_PATH"], ignore_errors=True)
+    for cache in (token_cache, user_cache, permission_cache, invalidated_versions):
+        cache.clear()
+
+    db.add(UserModel(id="user", username="user", hashed_password=""))
+    db.commit()
+    return UserSchema.from_orm(db.query(UserModel).get("user"))
+
+
+@pytest.fixture
+def client(user):
+    async def verify_user_async() -> UserSchema:
+        return user
+
+    key_store = fakeredis.FakeRedis()
+    app.dependency_overrides.update(
+        {
+            get_connection: lambda: key_store,
+            verify_access_token: lambda: user,
+            verify_access_token_async: verify_user_async,
+        }
+    )
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def upload(client):
+    def upload(file_name: str, content: bytes) -> dict:
+        response = client.post("/file/stream", params={"file_name": file_name}, data=content)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return upload
@@ -0,0 +1,63 @@
+import random
+
+from src.db.models import ChunkModel, FileChunkModel, FileModel
+from src.storage.chunk_store import chunk_exists
+
+
+def ref_counts(db) -> dict:
+    db.expire_all()
+    return {chunk.hash: chunk.ref_count for chunk in db.query(ChunkModel)}
+
+
+def test_identical_uploads_share_chunks(client, upload, db):
+    content = random.Random(0).randbytes(8 * 1024 * 1024)
+    first = upload("first.bin", content)
+    chunks = ref_counts(db)
+    assert len(chunks) > 1
+    assert set(chunks.values()) == {1}
+
+    second = upload("second.bin", content)
+    assert second["content_hash"] == first["content_hash"]
+    assert ref_counts(db) == {chunk_hash: 2 for chunk_hash in chunks}
+    assert all(chunk_exists(chunk_hash) for chunk_hash in chunks)
+
+    assert client.delete(f"/file/{first['id']}").status_code == 200
+    assert ref_counts(db) == {chunk_hash: 1 for chunk_hash in chunks}
+    assert all(chunk_exists(chunk_hash) for chunk_hash in chunks)
+    assert client.get(f"/file/download/{second['id']}").content == content
+
+    assert client.delete(f"/file/{second['id']}").status_code == 200
+    assert ref_counts(db) == {}
+    assert not any(chunk_exists(chunk_hash) for chunk_hash in chunks)
+    assert db.query(FileModel).count() == 0
+    assert db.query(FileChunkModel).count() == 0
+
+
+def test_repeated_chunks_of_a_file_are_counted(upload, db):
+    content = random.Random(1).randbytes(6 * 1024 * 1024)
+    file = upload("twice.bin", content + content)
+
+    chunks = db.query(FileChunkModel).filter(FileChunkModel.file_id == file["id"]).all()
+    assert len(chunks) > len({chunk.chunk_hash for chunk in chunks})
+    counts = ref_counts(db)
+    for chunk_hash in counts:
+        assert counts[chunk_hash] == sum(chunk.chunk_hash == chunk_hash for chunk in chunks)
+
+
+def test_edit_releases_replaced_chunks(client, upload, db):
+    old = upload("file.bin", random.Random(2).randbytes(2 * 1024 * 1024))
+    old_chunks = set(ref_counts(db))
+
+    new_content = random.Random(3).randbytes(2 * 1024 * 1024)
+    response = client.put(f"/file/stream/{old['id']}", params={"file_name": "file.bin"}, data=new_content)
+    assert response.status_code == 200, response.text
+
+    new_chunks = ref_counts(db)
+    assert not old_chunks & set(new_chunks)
+    assert set(new_chunks.values()) == {1}
+    assert not any(chunk_exists(chunk_hash) for chunk_hash in old_chunks)
+    assert client.get(f"/file/download/{old['id']}").content == new_content
+
+
+def test_deleting_a_missing_file(client):
+    assert client.delete("/file/missing").status_code == 404
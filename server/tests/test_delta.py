@@ -0,0 +1,120 @@
+import gzip
+import random
+
+import pytest
+
+from src.db.models import ChunkModel
+from src.storage.delta import OP_COPY, OP_DATA, OP_GZIP
+
+CONTENT = random.Random(0).randbytes(6 * 1024 * 1024)
+
+
+def copy_op(chunk_hash: str) -> bytes:
+    return OP_COPY + bytes.fromhex(chunk_hash)
+
+
+def data_op(op: bytes, payload: bytes) -> bytes:
+    return op + len(payload).to_bytes(4, "big") + payload
+
+
+@pytest.fixture
+def file(upload) -> dict:
+    return upload("file.bin", CONTENT)
+
+
+@pytest.fixture
+def signature(client, file) -> dict:
+    response = client.get(f"/file/signature/{file['id']}")
+    assert response.status_code == 200
+    return response.json()
+
+
+def send_delta(client, file: dict, delta: bytes, file_name: str = "file.bin"):
+    return client.put(f"/file/delta/{file['id']}", params={"file_name": file_name}, data=delta)
+
+
+def test_signature(client, file, signature):
+    response = client.get(f"/file/download/{file['id']}", headers={"Accept-Encoding": "identity"})
+    assert response.headers["ETag"] == f'"{signature["manifest_hash"]}"'
+    assert signature["size"] == len(CONTENT)
+    chunks = signature["chunks"]
+    assert len(chunks) > 2
+    assert b"".join(CONTENT[chunk["offset"] : chunk["offset"] + chunk["length"]] for chunk in chunks) == CONTENT
+
+
+def test_copy_data_and_gzip_ops(client, file, signature, db):
+    first, second, *rest = signature["chunks"]
+    delta = (
+        copy_op(second["hash"])
+        + copy_op(first["hash"])
+        + copy_op(second["hash"])
+        + data_op(OP_DATA, b"inserted data")
+        + data_op(OP_GZIP, gzip.compress(b"compressed data"))
+    )
+    response = send_delta(client, file, delta, "renamed.bin")
+    assert response.status_code == 200, response.text
+    assert response.json()["file_name"] == "renamed.bin"
+
+    first_content = CONTENT[: first["length"]]
+    second_content = CONTENT[second["offset"] : second["offset"] + second["length"]]
+    expected = second_content + first_content + second_content + b"inserted data" + b"compressed data"
+    assert response.json()["original_size"] == len(expected)
+    assert client.get(f"/file/download/{file['id']}").content == expected
+
+    # Copies starting on a chunk boundary reuse the stored chunks, the chunks which were not copied are released
+    ref_counts = {chunk.hash: chunk.ref_count for chunk in db.query(ChunkModel)}
+    assert ref_counts[first["hash"]] == 1
+    assert ref_counts[second["hash"]] == 2
+    assert not {chunk["hash"] for chunk in rest} & set(ref_counts)
+
+
+def test_copy_after_data(client, file, signature):
+    first, second, *_ = signature["chunks"]
+    delta = data_op(OP_DATA, b"prefix") + copy_op(first["hash"]) + data_op(OP_GZIP, gzip.compress(b"infix"))
+    delta += copy_op(second["hash"])
+    response = send_delta(client, file, delta)
+    assert response.status_code == 200, response.text
+
+    # Copies which do not start a chunk are chunked again along with the data before them
+    second_content = CONTENT[second["offset"] : second["offset"] + second["length"]]
+    expected = b"prefix" + CONTENT[: first["length"]] + b"infix" + second_content
+    assert client.get(f"/file/download/{file['id']}").content == expected
+
+
+def test_delta_sent_in_small_pieces(client, file, signature):
+    chunks = signature["chunks"]
+    delta = b"".join(copy_op(chunk["hash"]) for chunk in chunks) + data_op(OP_DATA, b"appended")
+
+    def pieces():
+        for position in range(0, len(delta), 7):
+            yield delta[position : position + 7]
+
+    response = send_delta(client, file, pieces())
+    assert response.status_code == 200, response.text
+    assert client.get(f"/file/download/{file['id']}").content == CONTENT + b"appended"
+
+
+@pytest.mark.parametrize(
+    "delta",
+    [
+        copy_op("00" * 32),
+        b"X",
+        data_op(OP_DATA, b"truncated")[:-1],
+        data_op(OP_GZIP, b"not gzip"),
+        data_op(OP_GZIP, gzip.compress(b"first") + gzip.compress(b"second")),
+        OP_DATA + (1 << 31).to_bytes(4, "big"),
+    ],
+    ids=["unknown chunk", "unknown op", "truncated", "invalid gzip", "several gzip members", "oversized op"],
+)
+def test_invalid_delta(client, file, signature, delta):
+    response = send_delta(client, file, copy_op(signature["chunks"][0]["hash"]) + delta)
+    assert response.status_code == 400
+    assert response.json()["detail"]["error_info"].startswith("Invalid delta")
+
+    # The file is left as it was
+    assert client.get(f"/file/signature/{file['id']}").json() == signature
+    assert client.get(f"/file/download/{file['id']}").content == CONTENT
+
+
+def test_delta_of_missing_file(client):
+    assert send_delta(client, {"id": "missing"}, b"").status_code == 404
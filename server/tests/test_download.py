@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+CONTENT = random.Random(0).randbytes(3 * 1024 * 1024)
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+def file(upload) -> dict:
+    return upload("file.bin", CONTENT)
+
+
+def download(client, file: dict, **headers):
+    return client.get(f"/file/download/{file['id']}", headers={**IDENTITY, **headers})
+
+
+def test_whole_file(client, file):
+    response = download(client, file)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Length"] == str(len(CONTENT))
+
+
+@pytest.mark.parametrize(
+    "range_header, start, end",
+    [
+        ("bytes=0-99", 0, 99),
+        # Spans the boundaries of several chunks
+        ("bytes=1000000-2500000", 1000000, 2500000),
+        ("bytes=3000000-", 3000000, len(CONTENT) - 1),
+        ("bytes=-100", len(CONTENT) - 100, len(CONTENT) - 1),
+        ("bytes=3145000-9999999", 3145000, len(CONTENT) - 1),
+    ],
+)
+def test_range(client, file, range_header, start, end):
+    response = download(client, file, Range=range_header)
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["Content-Length"] == str(end - start + 1)
+    assert response.content == CONTENT[start : end + 1]
+
+
+@pytest.mark.parametrize("range_header", [f"bytes={len(CONTENT)}-", "bytes=10-5", "bytes=-0"])
+def test_range_not_satisfiable(client, file, range_header):
+    response = download(client, file, Range=range_header)
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("range_header", ["bytes=0-9,20-29", "items=0-9", "bytes=-"])
+def test_unsupported_range_sends_whole_file(client, file, range_header):
+    response = download(client, file, Range=range_header)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_range(client, file):
+    validators = download(client, file, Range="bytes=0-0").headers
+
+    for if_range in (validators["ETag"], validators["Last-Modified"]):
+        response = download(client, file, Range="bytes=10-19", **{"If-Range": if_range})
+        assert response.status_code == 206
+        assert response.content == CONTENT[10:20]
+
+    # Stale and weak validators send the whole file instead of a range of another version
+    for if_range in ('"stale"', f"W/{validators['ETag']}", "Thu, 01 Jan 1970 00:00:00 GMT"):
+        response = download(client, file, Range="bytes=10-19", **{"If-Range": if_range})
+        assert response.status_code == 200
+        assert response.content == CONTENT
+
+    # A range of another version is never refused, the whole current file is sent
+    response = download(client, file, Range=f"bytes={len(CONTENT)}-", **{"If-Range": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_if_range_after_edit(client, file):
+    etag = download(client, file, Range="bytes=0-0").headers["ETag"]
+    edited = CONTENT[::-1]
+    response = client.put(f"/file/stream/{file['id']}", params={"file_name": "file.bin"}, data=edited)
+    assert response.status_code == 200
+
+    response = download(client, file, Range="bytes=10-19", **{"If-Range": etag})
+    assert response.status_code == 200
+    assert response.content == edited
+
+
+def test_if_none_match(client, file):
+    etag = download(client, file).headers["ETag"]
+    response = download(client, file, **{"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_empty_file_ignores_ranges(client, upload):
+    empty = upload("empty.bin", b"")
+    response = download(client, empty, Range="bytes=0-99")
+    assert response.status_code == 200
+    assert response.content == b""
+
+
+def test_gzip_encoded_download(client, upload):
+    content = b"compressible text " * 100000
+    file = upload("text.txt", content)
+    response = client.get(f"/file/download/{file['id']}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"].endswith('-gzip"')
+    assert response.content == content
+
+
+def test_missing_file(client):
+    assert download(client, {"id": "missing"}).status_code == 404
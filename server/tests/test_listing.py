@@ -0,0 +1,88 @@
+import pytest
+
+NAMES = ["delta", "alpha", "echo", "bravo", "alpha", "charlie", "foxtrot"]
+
+
+@pytest.fixture
+def files(upload) -> list:
+    # Sizes repeat as well, so every order has ties broken by the file id
+    return [upload(name, b"x" * (index % 3)) for index, name in enumerate(NAMES)]
+
+
+def list_page(client, cursor=None, **params):
+    if cursor is not None:
+        params["cursor"] = cursor
+    response = client.get("/file/", params=params)
+    assert response.status_code == 200, response.text
+    return response.json(), response.headers.get("X-Next-Cursor")
+
+
+def list_pages(client, **params) -> list:
+    entries, cursor = list_page(client, **params)
+    while cursor is not None:
+        page, cursor = list_page(client, cursor, **params)
+        entries += page
+    return entries
+
+
+def sort_value(entry: dict, sort: str):
+    file = entry["file"]
+    return {"name": file["file_name"], "size": file["original_size"]}.get(sort, file.get(sort))
+
+
+@pytest.mark.parametrize("sort", ["name", "size", "created_at", "updated_at"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_the_listing_once(client, files, sort, order):
+    entries = list_pages(client, limit=2, sort=sort, order=order)
+
+    assert sorted(entry["file_id"] for entry in entries) == sorted(file["id"] for file in files)
+    keys = [(sort_value(entry, sort), entry["file_id"]) for entry in entries]
+    assert keys == sorted(keys, reverse=order == "desc")
+    assert entries == list_page(client, limit=len(files), sort=sort, order=order)[0]
+
+
+def test_cursor_is_stable_across_changes(client, files, upload):
+    first_page, cursor = list_page(client, limit=3)
+    seen = [entry["file_id"] for entry in first_page]
+    remaining = [entry["file_id"] for entry in list_page(client, limit=len(files))[0][3:]]
+
+    # Files added before the cursor and files removed after it do not shift the following pages
+    upload("aardvark", b"")
+    assert client.delete(f"/file/{remaining[0]}").status_code == 200
+    added = upload("zulu", b"")
+
+    rest, cursor = list_page(client, cursor, limit=3)
+    while cursor is not None:
+        page, cursor = list_page(client, cursor, limit=3)
+        rest += page
+    assert [entry["file_id"] for entry in rest] == remaining[1:] + [added["id"]]
+    assert not set(seen) & {entry["file_id"] for entry in rest}
+
+
+def test_renamed_file_moves_within_the_listing(client, files):
+    first_page, cursor = list_page(client, limit=3)
+    assert client.patch(f"/file/{first_page[0]['file_id']}", params={"file_name": "zz"}).status_code == 200
+
+    rest, _ = list_page(client, cursor, limit=len(files))
+    assert rest[-1]["file_id"] == first_page[0]["file_id"]
+
+
+def test_cursor_of_another_order(client, files):
+    _, cursor = list_page(client, limit=2, sort="name")
+    for params in ({"sort": "size"}, {"sort": "name", "order": "desc"}):
+        response = client.get("/file/", params={"cursor": cursor, **params})
+        assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "", "e30"])
+def test_invalid_cursor(client, files, cursor):
+    assert client.get("/file/", params={"cursor": cursor}).status_code == 400
+
+
+def test_not_modified_until_files_change(client, files, upload):
+    response = client.get("/file/", params={"limit": 2})
+    etag = response.headers["ETag"]
+    assert client.get("/file/", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 304
+
+    upload("golf", b"")
+    assert client.get("/file/", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200